@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+
+def get_cache_dir() -> str:
+    """Return the per user cache directory of CoStick. The directory is created if it does not exist."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    path = os.path.join(base, "costick")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_data_dir() -> str:
+    """Return the per user data directory of CoStick for data that is not recreated when deleted. The directory is created if it does not exist."""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share"))
+    path = os.path.join(base, "costick")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_runtime_dir() -> str:
+    """Return the per user directory for sockets of running CoStick processes."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", None)
+    if runtime_dir:
+        return runtime_dir
+    path = os.path.join(tempfile.gettempdir(), f"costick-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
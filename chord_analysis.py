@@ -0,0 +1,65 @@
+from typing import Iterable
+from compiled_config import CompiledConfig, mask_to_button_names
+
+
+class ChordAnalysis:
+    """
+    Superset relationships among the chords registered in a mode.
+
+    A chord is instant if no other registered chord contains all of its buttons. Once exactly its
+    buttons are held, pressing more buttons can not lead to another chord, so it can fire without
+    waiting for multi_click_duration.
+    """
+
+    def __init__(self, chord_masks: Iterable[int]):
+        self.chord_masks = list(dict.fromkeys(chord_masks))
+        self.supersets: dict[int, list[int]] = {
+            mask: [
+                other_mask
+                for other_mask in self.chord_masks
+                if other_mask != mask and other_mask & mask == mask
+            ]
+            for mask in self.chord_masks
+        }
+        """Chords containing all buttons of the chord"""
+        self.instant_chords = frozenset(
+            mask for mask, supersets in self.supersets.items() if not supersets
+        )
+
+    def is_instant(self, mask: int) -> bool:
+        """Return True if the chord with the given button mask is registered and can fire immediately."""
+        return mask in self.instant_chords
+
+    def get_report_lines(self) -> list[str]:
+        lines = []
+        for mask in self.chord_masks:
+            buttons = "+".join(mask_to_button_names(mask))
+            if self.is_instant(mask):
+                lines.append(f"  instant  {buttons}")
+            else:
+                supersets = self.supersets[mask]
+                smallest_superset = min(supersets, key=lambda m: m.bit_count())
+                lines.append(
+                    f"  wait     {buttons}  ({len(supersets)} larger chords, e.g. {'+'.join(mask_to_button_names(smallest_superset))})"
+                )
+        return lines
+
+
+def get_chord_report(compiled_config: CompiledConfig) -> str:
+    """Return a report listing which chords of each mode are instant and which have to wait."""
+    lines = []
+    for mode in compiled_config.modes:
+        analysis = ChordAnalysis(mode.chord_masks)
+        if not analysis.chord_masks:
+            continue
+        lines.append(
+            f"Mode {mode.name}: {len(analysis.instant_chords)} of {len(analysis.chord_masks)} chords are instant"
+        )
+        lines.extend(analysis.get_report_lines())
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from compiled_config import load_compiled_config
+
+    print(get_chord_report(load_compiled_config()))
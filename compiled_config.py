@@ -0,0 +1,475 @@
+"""
+Compiles a validated Config into a compact runtime representation.
+
+Actions are lowered to integer opcodes with interned string operands, and each mode is stored as flat
+arrays of instruction ranges indexed by button, event and chord mask. The compiled config can be saved
+to and loaded from a binary file without importing pydantic.
+"""
+
+import hashlib
+import json
+import os
+import struct
+from array import array
+from enum import IntEnum
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, BinaryIO
+from app_dirs import get_cache_dir
+from config_types import (
+    BUTTON_EVENT_NAMES,
+    BUTTON_NAMES,
+    CONFIG_SCHEMA_VERSION,
+    STICK_EVENT_NAMES,
+    STICK_NAMES,
+    ControllerButtonEventName,
+    ControllerButtonName,
+    ControllerStickEventName,
+    ControllerStickName,
+)
+
+if TYPE_CHECKING:
+    from config import Config
+
+COMPILED_FORMAT_VERSION = 3
+"""Has to be increased whenever the binary format or the compilation changes."""
+FILE_MAGIC = b"CSTKCFG\0"
+FILE_HEADER = struct.Struct("<8sI32sI")
+"""magic, format version, source key, length of the json metadata"""
+ARRAY_HEADER = struct.Struct("<cI")
+"""typecode, number of items"""
+
+
+class Opcode(IntEnum):
+    SWITCH_MODE = 0
+    KEY_DOWN = 1
+    KEY_UP = 2
+    KEY_PRESS = 3
+    MOUSE_DOWN = 4
+    MOUSE_UP = 5
+    TYPE = 6
+    MOUSE_MOVE = 7
+    SCROLL = 8
+
+
+ACTION_OPCODES: dict[str, Opcode] = {
+    "switch_mode": Opcode.SWITCH_MODE,
+    "key_down": Opcode.KEY_DOWN,
+    "key_up": Opcode.KEY_UP,
+    "key_press": Opcode.KEY_PRESS,
+    "mouse_down": Opcode.MOUSE_DOWN,
+    "mouse_up": Opcode.MOUSE_UP,
+    "type": Opcode.TYPE,
+    "mouse_move": Opcode.MOUSE_MOVE,
+    "scroll": Opcode.SCROLL,
+}
+"""Opcode of each action type of the config"""
+NAVIGATION_OPCODES = (Opcode.MOUSE_MOVE, Opcode.SCROLL)
+"""Opcodes of continuous actions which are executed every frame instead of on an event"""
+REQUIRED_MODE_NAMES = ["global", "default"]
+"""Modes every config needs: the actions of global are part of every mode, default is used when a mode is missing"""
+
+
+class CompiledMode:
+    """
+    Instruction ranges of a single mode, with the actions of the global mode already inserted.
+    Each range is stored as two ints (start, end) into the instruction arrays of the CompiledConfig.
+    """
+
+    __slots__ = ("name", "button_ranges", "stick_ranges", "chord_masks", "chord_ranges")
+
+    def __init__(
+        self,
+        name: str,
+        button_ranges: array,
+        stick_ranges: array,
+        chord_masks: array,
+        chord_ranges: array,
+    ):
+        self.name = name
+        self.button_ranges = button_ranges
+        """Indexed by (button * len(BUTTON_EVENT_NAMES) + event) * 2"""
+        self.stick_ranges = stick_ranges
+        """Indexed by (stick * len(STICK_EVENT_NAMES) + event) * 2"""
+        self.chord_masks = chord_masks
+        """Button mask of each chord, bit i is BUTTON_NAMES[i]"""
+        self.chord_ranges = chord_ranges
+        """Indexed by (chord * len(BUTTON_EVENT_NAMES) + event) * 2"""
+
+    def get_button_range(
+        self, button: int, event: int, events: int = len(BUTTON_EVENT_NAMES)
+    ) -> tuple[int, int]:
+        offset = (button * events + event) * 2
+        return self.button_ranges[offset], self.button_ranges[offset + 1]
+
+    def get_stick_range(
+        self, stick: int, event: int, events: int = len(STICK_EVENT_NAMES)
+    ) -> tuple[int, int]:
+        offset = (stick * events + event) * 2
+        return self.stick_ranges[offset], self.stick_ranges[offset + 1]
+
+    def get_chord_range(
+        self, chord: int, event: int, events: int = len(BUTTON_EVENT_NAMES)
+    ) -> tuple[int, int]:
+        offset = (chord * events + event) * 2
+        return self.chord_ranges[offset], self.chord_ranges[offset + 1]
+
+
+def mask_to_button_names(mask: int) -> list[ControllerButtonName]:
+    return [name for i, name in enumerate(BUTTON_NAMES) if mask & (1 << i)]
+
+
+def button_names_to_mask(button_names: list[ControllerButtonName]) -> int:
+    mask = 0
+    for button_name in button_names:
+        mask |= 1 << BUTTON_NAMES.index(button_name)
+    return mask
+
+
+def to_namespace(value):
+    """Convert nested dicts to nested namespaces, so settings are accessed like the config models."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(v) for key, v in value.items()})
+    return value
+
+
+class CompiledConfig:
+    """Compact runtime representation of a validated Config. Does not depend on pydantic."""
+
+    def __init__(
+        self,
+        source_key: bytes,
+        settings: dict,
+        button_mapping: dict,
+        stick_mapping: dict,
+        strings: list[str],
+        opcodes: array,
+        operands: array,
+        repeat_delays: array,
+        repeat_intervals: array,
+        modes: list[CompiledMode],
+    ):
+        self.source_key = source_key
+        """Key of the config file content this config was compiled from"""
+        self.settings_dict = settings
+        self.settings = to_namespace(settings)
+        """Settings with the same attributes as config.Settings"""
+        self.button_mapping: dict[ControllerButtonName, int | str] = button_mapping
+        self.stick_mapping: dict[ControllerStickName, tuple[int, int]] = {
+            name: tuple(axes) for name, axes in stick_mapping.items()
+        }
+        self.strings = strings
+        """Interned mode names, keys, mouse buttons and texts referenced by the instruction operands"""
+        self.opcodes = opcodes
+        self.operands = operands
+        self.repeat_delays = repeat_delays
+        """Delay in seconds before each instruction is repeated while its trigger is held"""
+        self.repeat_intervals = repeat_intervals
+        """Seconds between two repeats of each instruction, 0 if the instruction is not repeated"""
+        self.modes = modes
+        self.mode_indices = {mode.name: i for i, mode in enumerate(modes)}
+        self.operand_values = [
+            self.get_operand_value(instruction) for instruction in range(len(opcodes))
+        ]
+        """Resolved operand of each instruction, so executing an instruction needs no lookup into strings"""
+
+    def get_mode_index(self, mode_name: str) -> int | None:
+        return self.mode_indices.get(mode_name, None)
+
+    def get_operand_value(self, instruction: int) -> str | None:
+        """Return the mode name, key, mouse button or text an instruction refers to."""
+        if self.opcodes[instruction] in NAVIGATION_OPCODES:
+            return None
+        return self.strings[self.operands[instruction]]
+
+    def get_repeats(self, start: int, end: int) -> list[tuple[int, float, float]]:
+        """Return (instruction, delay, interval) of the repeated instructions in the range [start, end)."""
+        return [
+            (instruction, self.repeat_delays[instruction], interval)
+            for instruction in range(start, end)
+            if (interval := self.repeat_intervals[instruction]) > 0
+        ]
+
+    def describe_range(self, start: int, end: int) -> tuple:
+        """Return the instructions of a range with resolved operands, used to compare ranges of different configs."""
+        return tuple(
+            (
+                Opcode(self.opcodes[i]),
+                self.get_operand_value(i),
+                self.repeat_delays[i],
+                self.repeat_intervals[i],
+            )
+            for i in range(start, end)
+        )
+
+    def describe_mode(self, mode_index: int) -> tuple:
+        """Return a comparable description of everything a mode does."""
+        mode = self.modes[mode_index]
+        buttons = tuple(
+            self.describe_range(*mode.get_button_range(button, event))
+            for button in range(len(BUTTON_NAMES))
+            for event in range(len(BUTTON_EVENT_NAMES))
+        )
+        sticks = tuple(
+            self.describe_range(*mode.get_stick_range(stick, event))
+            for stick in range(len(STICK_NAMES))
+            for event in range(len(STICK_EVENT_NAMES))
+        )
+        chords = tuple(
+            (
+                mask,
+                tuple(
+                    self.describe_range(*mode.get_chord_range(chord, event))
+                    for event in range(len(BUTTON_EVENT_NAMES))
+                ),
+            )
+            for chord, mask in enumerate(mode.chord_masks)
+        )
+        return buttons, sticks, chords
+
+    def save(self, path: str):
+        metadata = json.dumps(
+            {
+                "settings": self.settings_dict,
+                "button_mapping": self.button_mapping,
+                "stick_mapping": self.stick_mapping,
+                "strings": self.strings,
+                "modes": [mode.name for mode in self.modes],
+            }
+        ).encode()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(
+                FILE_HEADER.pack(
+                    FILE_MAGIC, COMPILED_FORMAT_VERSION, self.source_key, len(metadata)
+                )
+            )
+            f.write(metadata)
+            write_array(f, self.opcodes)
+            write_array(f, self.operands)
+            write_array(f, self.repeat_delays)
+            write_array(f, self.repeat_intervals)
+            for mode in self.modes:
+                write_array(f, mode.button_ranges)
+                write_array(f, mode.stick_ranges)
+                write_array(f, mode.chord_masks)
+                write_array(f, mode.chord_ranges)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(
+        cls, path: str, source_key: bytes | None = None
+    ) -> "CompiledConfig | None":
+        """Load a compiled config. Returns None if the file is missing, outdated or was compiled from a different source."""
+        try:
+            with open(path, "rb") as f:
+                magic, version, file_source_key, metadata_length = FILE_HEADER.unpack(
+                    f.read(FILE_HEADER.size)
+                )
+                if magic != FILE_MAGIC or version != COMPILED_FORMAT_VERSION:
+                    return None
+                if source_key is not None and file_source_key != source_key:
+                    return None
+                metadata = json.loads(f.read(metadata_length))
+                opcodes = read_array(f)
+                operands = read_array(f)
+                repeat_delays = read_array(f)
+                repeat_intervals = read_array(f)
+                modes = [
+                    CompiledMode(
+                        mode_name,
+                        read_array(f),
+                        read_array(f),
+                        read_array(f),
+                        read_array(f),
+                    )
+                    for mode_name in metadata["modes"]
+                ]
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+        return cls(
+            file_source_key,
+            metadata["settings"],
+            metadata["button_mapping"],
+            metadata["stick_mapping"],
+            metadata["strings"],
+            opcodes,
+            operands,
+            repeat_delays,
+            repeat_intervals,
+            modes,
+        )
+
+
+def write_array(f: BinaryIO, values: array):
+    f.write(ARRAY_HEADER.pack(values.typecode.encode(), len(values)))
+    f.write(values.tobytes())
+
+
+def read_array(f: BinaryIO) -> array:
+    typecode, length = ARRAY_HEADER.unpack(f.read(ARRAY_HEADER.size))
+    values = array(typecode.decode())
+    data = f.read(length * values.itemsize)
+    if len(data) != length * values.itemsize:
+        raise ValueError("Compiled config is truncated")
+    values.frombytes(data)
+    return values
+
+
+def compile_config(config: "Config", source_key: bytes = b"\0" * 32) -> CompiledConfig:
+    """Lower a validated config into a CompiledConfig. Raises ValueError if a required mode is missing."""
+    strings: list[str] = []
+    string_indices: dict[str, int] = {}
+    opcodes = array("B")
+    operands = array("i")
+    repeat_delays = array("d")
+    repeat_intervals = array("d")
+
+    def intern(string: str) -> int:
+        if string not in string_indices:
+            string_indices[string] = len(strings)
+            strings.append(string)
+        return string_indices[string]
+
+    def emit(actions) -> tuple[int, int]:
+        """Append the instructions of the actions and return their range."""
+        start = len(opcodes)
+        for action in actions:
+            opcode = ACTION_OPCODES[action.action]
+            if opcode == Opcode.SWITCH_MODE:
+                operand = intern(action.mode)
+            elif opcode in (Opcode.KEY_DOWN, Opcode.KEY_UP, Opcode.KEY_PRESS):
+                operand = intern(action.key)
+            elif opcode in (Opcode.MOUSE_DOWN, Opcode.MOUSE_UP):
+                operand = intern(action.button)
+            elif opcode == Opcode.TYPE:
+                operand = intern(action.text)
+            else:
+                operand = 0
+            opcodes.append(opcode)
+            operands.append(operand)
+            repeat_delay = getattr(action, "repeat_delay", None)
+            if repeat_delay is None:
+                repeat_delays.append(0)
+                repeat_intervals.append(0)
+            else:
+                repeat_delays.append(repeat_delay)
+                repeat_intervals.append(1 / action.repeat_rate)
+        return start, len(opcodes)
+
+    def as_list(actions) -> list:
+        return actions if isinstance(actions, list) else [actions]
+
+    for required_mode_name in REQUIRED_MODE_NAMES:
+        if required_mode_name not in config.modes:
+            raise ValueError(f"Config has no {required_mode_name} mode")
+    global_mode = config.modes["global"]
+    modes: list[CompiledMode] = []
+    for mode_name, mode in config.modes.items():
+        # insert all actions from global mode which are not defined in the current mode
+        button_actions = dict(mode.button_actions or {})
+        stick_actions = dict(mode.stick_actions or {})
+        for controller_button_name, action_details in (
+            global_mode.button_actions or {}
+        ).items():
+            button_actions.setdefault(controller_button_name, action_details)
+        for controller_stick_name, action_details in (
+            global_mode.stick_actions or {}
+        ).items():
+            stick_actions.setdefault(controller_stick_name, action_details)
+
+        button_ranges = array(
+            "i", [0] * (len(BUTTON_NAMES) * len(BUTTON_EVENT_NAMES) * 2)
+        )
+        for controller_button_name, action_details in button_actions.items():
+            button = BUTTON_NAMES.index(controller_button_name)
+            for controller_button_event_name, actions in action_details.items():
+                event = BUTTON_EVENT_NAMES.index(controller_button_event_name)
+                offset = (button * len(BUTTON_EVENT_NAMES) + event) * 2
+                button_ranges[offset : offset + 2] = array("i", emit(as_list(actions)))
+
+        stick_ranges = array("i", [0] * (len(STICK_NAMES) * len(STICK_EVENT_NAMES) * 2))
+        for controller_stick_name, action_details in stick_actions.items():
+            stick = STICK_NAMES.index(controller_stick_name)
+            for controller_stick_event_name, actions in action_details.items():
+                event = STICK_EVENT_NAMES.index(controller_stick_event_name)
+                offset = (stick * len(STICK_EVENT_NAMES) + event) * 2
+                stick_ranges[offset : offset + 2] = array("i", emit(as_list(actions)))
+
+        # Actions of multi button actions with the same buttons are merged into one chord
+        chord_actions: dict[int, dict[ControllerButtonEventName, list]] = {}
+        for multi_button_action in mode.multi_button_actions or []:
+            mask = button_names_to_mask(multi_button_action.buttons)
+            chord = chord_actions.setdefault(mask, {})
+            for (
+                controller_button_event_name,
+                actions,
+            ) in multi_button_action.actions.items():
+                chord.setdefault(controller_button_event_name, []).extend(
+                    as_list(actions)
+                )
+        chord_masks = array("I", chord_actions.keys())
+        chord_ranges = array(
+            "i", [0] * (len(chord_masks) * len(BUTTON_EVENT_NAMES) * 2)
+        )
+        for chord, actions_by_event in enumerate(chord_actions.values()):
+            for controller_button_event_name, actions in actions_by_event.items():
+                event = BUTTON_EVENT_NAMES.index(controller_button_event_name)
+                offset = (chord * len(BUTTON_EVENT_NAMES) + event) * 2
+                chord_ranges[offset : offset + 2] = array("i", emit(actions))
+
+        modes.append(
+            CompiledMode(
+                mode_name, button_ranges, stick_ranges, chord_masks, chord_ranges
+            )
+        )
+
+    return CompiledConfig(
+        source_key,
+        config.settings.model_dump(),
+        dict(config.button_mapping),
+        {name: list(axes) for name, axes in config.stick_mapping.items()},
+        strings,
+        opcodes,
+        operands,
+        repeat_delays,
+        repeat_intervals,
+        modes,
+    )
+
+
+def get_source_key(content: bytes) -> bytes:
+    """Key of a config file content, the config schema version and the compiled format version."""
+    source_hash = hashlib.sha256(content)
+    source_hash.update(f"{CONFIG_SCHEMA_VERSION}:{COMPILED_FORMAT_VERSION}".encode())
+    return source_hash.digest()
+
+
+def get_compiled_config_path() -> str:
+    return os.path.join(get_cache_dir(), "config_compiled.bin")
+
+
+def load_compiled_config(path: str = "config.json") -> CompiledConfig:
+    """
+    Load the compiled config for the config file at the given path.
+    The compiled config is cached, so pydantic is only imported and the config only validated and compiled when the file changed.
+    """
+    if not os.path.exists(path):
+        from config import Config
+
+        return compile_config(Config.load_config(path))
+    with open(path, "rb") as f:
+        content = f.read()
+    source_key = get_source_key(content)
+    compiled_config = CompiledConfig.load(get_compiled_config_path(), source_key)
+    if compiled_config is not None:
+        print(f"Compiled config loaded for {path}.")
+        return compiled_config
+
+    from config import Config
+
+    compiled_config = compile_config(Config.load_config(path), source_key)
+    try:
+        compiled_config.save(get_compiled_config_path())
+    except OSError as e:
+        print(f"Could not cache compiled config: {e}")
+    return compiled_config
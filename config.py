@@ -1,49 +1,19 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveFloat, VERSION as PYDANTIC_VERSION
 from typing import Literal
+import hashlib
 import os
+import pickle
+from app_dirs import get_cache_dir
 from costick_input import KeyboardKey, MouseButtonName
-
-ModeName = Literal["default", "global"] | str
-"""Name of a mode."""
-
-"""A mouse button."""
-ControllerButtonName = Literal[
-    "dpad_up",
-    "dpad_down",
-    "dpad_left",
-    "dpad_right",
-    "face_up",
-    "face_down",
-    "face_left",
-    "face_right",
-    "shoulder_l",
-    "shoulder_r",
-    "shoulder_zl",
-    "shoulder_zr",
-    "stick_left",
-    "stick_right",
-    "minus",
-    "plus",
-    "home",
-    "capture",
-]
-"""A button on the controller."""
-ControllerStickName = Literal["stick_left", "stick_right"]
-"""A stick on the controller."""
-ControllerButtonEventName = Literal[
-    "down",
-    "up",
-    "click",
-    "long_press",
-    "double_click",
-    "tripple_click",
-]
-"""An event name for a button of the controller being pressed or released."""
-ControllerStickEventName = Literal["move"]
-"""An event name for a stick of the controller being moved."""
-
-ControllerButtonIndex = int | Literal["dpad-y", "dpad+y", "dpad-x", "dpad+x"]
-"""Index of a button on the controller or the direction of the dpad buttons."""
+from config_types import (
+    CONFIG_SCHEMA_VERSION,
+    ControllerButtonEventName,
+    ControllerButtonIndex,
+    ControllerButtonName,
+    ControllerStickEventName,
+    ControllerStickName,
+    ModeName,
+)
 
 
 class ControllerSettings(BaseModel):
@@ -57,6 +27,19 @@ class ControllerSettings(BaseModel):
     """Delay in seconds between the release of the last single_click and the new press of the same button on the controller to be registered as a double click."""
     multi_click_duration: float
     """Maximum time in seconds starting from the first press of any button during which more button presses are added to the multi-click event before firing the event."""
+    hold_repeat_interval: float | None = None
+    """Interval in seconds between the hold_repeat events fired while a button is held after its hold event. No hold_repeat events are fired if None."""
+    instant_chords: bool = True
+    """Fire a multi button event immediately, without waiting for multi_click_duration, if no other registered multi button event contains all of its buttons."""
+    chord_overlap_policy: Literal["wait_for_release", "rollover", "shared"] = (
+        "wait_for_release"
+    )
+    """
+    How button presses are handled while the buttons of a previous multi button event are still being released.
+    wait_for_release: presses are ignored until all buttons of the previous multi button event are released.
+    rollover: new presses start the next multi button event, buttons of the previous one which are still held are not part of it.
+    shared: new presses start the next multi button event, buttons of the previous one which are still held are part of it.
+    """
 
 
 class CursorSettings(BaseModel):
@@ -74,15 +57,44 @@ class CursorSettings(BaseModel):
     """Speed of scrolling"""
 
 
+class OutputSettings(BaseModel):
+    """Settings for the keyboard and mouse output."""
+
+    backend: Literal["pynput", "uinput"] = "pynput"
+    """Backend used to send keyboard and mouse input to the computer. uinput is only available on Linux."""
+    uinput_device_path: str = "/dev/uinput"
+    """Path of the uinput device node used by the uinput backend."""
+
+
+class OverlaySettings(BaseModel):
+    """Settings for the controller overlay."""
+
+    max_fps: PositiveFloat = 60
+    """Maximum number of frames per second the overlay is redrawn with. The overlay is not redrawn while nothing changes."""
+    show_hud: bool = False
+    """Show event rates, chord wait, queue depth and CPU usage below the controller, read when the overlay starts"""
+
+
 class Settings(BaseModel):
     """Settings for the application."""
 
     controller_settings: ControllerSettings
     cursor_settings: CursorSettings
+    output_settings: OutputSettings = OutputSettings()
+    overlay_settings: OverlaySettings = OverlaySettings()
+
+
+class RepeatableAction(BaseModel):
+    """Base class of actions which can be repeated while the button or buttons that triggered them are held."""
+
+    repeat_delay: float | None = None
+    """Delay in seconds before the action is repeated for the first time. The action is not repeated if None."""
+    repeat_rate: PositiveFloat = 30
+    """Number of repeats per second after repeat_delay."""
 
 
-class ComputerKeyDownAction(BaseModel):
-    """Action to press a key on the computer."""
+class ComputerKeyDownAction(RepeatableAction):
+    """Action to press a key on the computer. Repeating it sends repeated presses of the held key."""
 
     action: Literal["key_down"] = "key_down"
     key: KeyboardKey
@@ -95,7 +107,7 @@ class ComputerKeyUpAction(BaseModel):
     key: KeyboardKey
 
 
-class ComputerKeyPressAction(BaseModel):
+class ComputerKeyPressAction(RepeatableAction):
     """Action to press and release a key on the computer."""
 
     action: Literal["key_press"] = "key_press"
@@ -135,7 +147,7 @@ class SwitchModeAction(BaseModel):
     mode: ModeName
 
 
-class ComputerTypeAction(BaseModel):
+class ComputerTypeAction(RepeatableAction):
     """Action to type text on the computer."""
 
     action: Literal["type"] = "type"
@@ -212,818 +224,950 @@ class Config(BaseModel):
 
     @classmethod
     def load_config(cls, path: str = "config.json") -> "Config":
+        """
+        Load and validate the config from the given path.
+        A snapshot of the validated config is cached, so validation is skipped as long as neither the file content nor the schema changed.
+        """
         if not os.path.exists(path):
             print(f"Config file not found at {path}. Using default config.")
-            return default_config
-        with open(path, "r") as f:
-            config = cls.model_validate_json(f.read())
-            print(f"Config loaded from {path}.")
+            return get_default_config()
+        with open(path, "rb") as f:
+            content = f.read()
+        cache_key = get_config_cache_key(content)
+        config = load_config_snapshot(cache_key)
+        if config is not None:
+            print(f"Config loaded from {path} (cached).")
             return config
+        config = cls.model_validate_json(content)
+        save_config_snapshot(cache_key, config)
+        print(f"Config loaded from {path}.")
+        return config
 
     def save_config(self, path: str = "config.json"):
         with open(path, "w") as f:
             f.write(self.model_dump_json(indent=4))
 
 
-default_config = Config(
-    settings=Settings(
-        controller_settings=ControllerSettings(
-            deadzone=0.1,
-            single_click_duration=0.6,
-            double_click_duration=0.2,
-            multi_click_duration=0.2,
-        ),
-        cursor_settings=CursorSettings(
-            cursor_speed=500,
-            cursor_boost_speed=10,
-            cursor_boost_acceleration_delay=0.1,
-            cursor_boost_acceleration_time=0.5,
-            scroll_speed=0.5,
-        ),
-    ),
-    button_mapping={
-        "dpad_up": "dpad-y",
-        "dpad_down": "dpad+y",
-        "dpad_left": "dpad-x",
-        "dpad_right": "dpad+x",
-        "face_down": 0,
-        "face_right": 1,
-        "face_up": 2,
-        "face_left": 3,
-        "shoulder_l": 5,
-        "shoulder_r": 6,
-        "shoulder_zl": 7,
-        "shoulder_zr": 8,
-        "stick_left": 12,
-        "stick_right": 13,
-        "capture": 4,
-        "minus": 9,
-        "plus": 10,
-        "home": 11,
-    },
-    stick_mapping={
-        "stick_left": (0, 1),
-        "stick_right": (2, 3),
-    },
-    modes={
-        "global": Mode(
-            button_actions={
-                "home": {
-                    "down": SwitchModeAction(mode="default"),
-                },
-                "capture": {
-                    "down": ComputerKeyDownAction(key="esc"),
-                    "up": ComputerKeyUpAction(key="esc"),
-                },
-                "minus": {
-                    "down": [
-                        ComputerKeyDownAction(key="ctrl"),
-                        ComputerKeyDownAction(key="c"),
-                    ],  # TODO create actions types for copy, paste, cut, ...
-                    "up": [
-                        ComputerKeyUpAction(key="ctrl"),
-                        ComputerKeyUpAction(key="c"),
-                    ],
-                },
-                "plus": {
-                    "down": [
-                        ComputerKeyDownAction(key="ctrl"),
-                        ComputerKeyDownAction(key="v"),
-                    ],
-                    "up": [
-                        ComputerKeyUpAction(key="ctrl"),
-                        ComputerKeyUpAction(key="v"),
-                    ],
-                },
-            }
-        ),
-        "default": Mode(
-            button_actions={
-                "dpad_up": {
-                    "down": [
-                        SwitchModeAction(mode="selection"),
-                    ],
-                },
-                "dpad_down": {
-                    "down": [
-                        SwitchModeAction(mode="selection"),
-                    ],
-                },
-                "dpad_left": {
-                    "down": [
-                        SwitchModeAction(mode="selection"),
-                    ],
-                },
-                "dpad_right": {
-                    "down": [
-                        SwitchModeAction(mode="selection"),
-                    ],
-                },
-                "face_right": {
-                    "down": ComputerMouseDownAction(button="left"),
-                    "up": ComputerMouseUpAction(button="left"),
-                },
-                "face_down": {
-                    "down": ComputerMouseDownAction(button="right"),
-                    "up": ComputerMouseUpAction(button="right"),
-                },
-                "face_up": {
-                    "down": ComputerMouseDownAction(button="middle"),
-                    "up": ComputerMouseUpAction(button="middle"),
-                },
-                "stick_right": {
-                    "down": ComputerMouseDownAction(button="middle"),
-                    "up": ComputerMouseUpAction(button="middle"),
-                },
-                "shoulder_l": {
-                    "click": SwitchModeAction(mode="typing"),
-                },
-                "shoulder_r": {
-                    "down": ComputerKeyDownAction(key="alt"),
-                    "up": ComputerKeyUpAction(key="alt"),
-                },
-                "shoulder_zr": {
-                    "down": ComputerKeyDownAction(key="ctrl"),
-                    "up": ComputerKeyUpAction(key="ctrl"),
-                },
-                "shoulder_zl": {
-                    "down": ComputerKeyDownAction(key="shift"),
-                    "up": ComputerKeyUpAction(key="shift"),
-                },
-            },
-            stick_actions={
-                "stick_left": {
-                    "move": ComputerMouseMoveAction(),
-                },
-                "stick_right": {
-                    "move": ComputerScrollAction(),
-                },
-            },
-        ),
-        "selection": Mode(
-            button_actions={
-                "dpad_up": {
-                    "down": ComputerKeyDownAction(key="up"),
-                    "up": ComputerKeyUpAction(key="up"),
-                },
-                "dpad_right": {
-                    "down": ComputerKeyDownAction(key="right"),
-                    "up": ComputerKeyUpAction(key="right"),
-                },
-                "dpad_down": {
-                    "down": ComputerKeyDownAction(key="down"),
-                    "up": ComputerKeyUpAction(key="down"),
-                },
-                "dpad_left": {
-                    "down": ComputerKeyDownAction(key="left"),
-                    "up": ComputerKeyUpAction(key="left"),
-                },
-                "face_up": {
-                    "down": ComputerKeyDownAction(key="shift"),
-                    "up": ComputerKeyUpAction(key="shift"),
-                },
-                "face_right": {
-                    "down": ComputerKeyDownAction(key="cmd"),
-                    "up": ComputerKeyUpAction(key="cmd"),
-                },
-                "face_down": {
-                    "down": ComputerKeyDownAction(key="alt"),
-                    "up": ComputerKeyUpAction(key="alt"),
-                },
-                "stick_left": {
-                    "down": ComputerKeyDownAction(key="ctrl"),
-                    "up": ComputerKeyUpAction(key="ctrl"),
-                },
-                "shoulder_l": {
-                    "click": SwitchModeAction(mode="typing"),
-                },
-                "shoulder_r": {
-                    "click": SwitchModeAction(mode="typing"),
-                },
-                "shoulder_zl": {
-                    "down": ComputerKeyDownAction(key="pos1"),
-                    "up": ComputerKeyUpAction(key="pos1"),
-                },
-                "shoulder_zr": {
-                    "down": ComputerKeyDownAction(key="end"),
-                    "up": ComputerKeyUpAction(key="end"),
-                },
-            },
-            stick_actions={
-                "stick_right": {
-                    "move": SwitchModeAction(mode="default"),
-                },
-                "stick_left": {
-                    "move": SwitchModeAction(mode="default"),
-                },
-            },
+def get_config_cache_key(content: bytes) -> str:
+    """Hash of the config file content, the config schema version and the pydantic version."""
+    content_hash = hashlib.sha256(content)
+    content_hash.update(f"{CONFIG_SCHEMA_VERSION}:{PYDANTIC_VERSION}".encode())
+    return content_hash.hexdigest()
+
+
+def get_config_snapshot_path() -> str:
+    return os.path.join(get_cache_dir(), "config_snapshot.pickle")
+
+
+def load_config_snapshot(cache_key: str) -> Config | None:
+    """Load the cached validated config. Returns None if there is no snapshot for the given cache key."""
+    try:
+        with open(get_config_snapshot_path(), "rb") as f:
+            if pickle.load(f) != cache_key:
+                return None
+            config = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(config, Config):
+        return None
+    return config
+
+
+def save_config_snapshot(cache_key: str, config: Config):
+    """Cache the validated config. The cache key is stored first so outdated snapshots are never unpickled."""
+    path = get_config_snapshot_path()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            pickle.dump(cache_key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not cache config: {e}")
+
+
+def create_default_config() -> Config:
+    """Build the default config. Use get_default_config to reuse an already built instance."""
+    return Config(
+        settings=Settings(
+            controller_settings=ControllerSettings(
+                deadzone=0.1,
+                single_click_duration=0.6,
+                double_click_duration=0.2,
+                multi_click_duration=0.2,
+            ),
+            cursor_settings=CursorSettings(
+                cursor_speed=500,
+                cursor_boost_speed=10,
+                cursor_boost_acceleration_delay=0.1,
+                cursor_boost_acceleration_time=0.5,
+                scroll_speed=0.5,
+            ),
         ),
-        "typing": Mode(
-            button_actions={
-                "dpad_up": {
-                    "down": ComputerKeyDownAction(key="shift"),
-                    "up": ComputerKeyUpAction(key="shift"),
-                },
-                "dpad_right": {
-                    "down": ComputerKeyDownAction(key="cmd"),
-                    "up": ComputerKeyUpAction(key="cmd"),
-                },
-                "dpad_down": {
-                    "down": ComputerKeyDownAction(key="alt"),
-                    "up": ComputerKeyUpAction(key="alt"),
-                },
-                "dpad_left": {
-                    "down": ComputerKeyDownAction(key="ctrl"),
-                    "up": ComputerKeyUpAction(key="ctrl"),
-                },
-            },
-            stick_actions={
-                "stick_left": {
-                    "move": SwitchModeAction(mode="default"),
-                },
-                "stick_right": {
-                    "move": ComputerScrollAction(),
-                },
-            },
-            multi_button_actions=[
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_right"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="g"),
-                        "up": ComputerKeyUpAction(key="g"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="i"),
-                        "up": ComputerKeyUpAction(key="i"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_l", "shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="w"),
-                        "up": ComputerKeyUpAction(key="w"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr", "face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="u"),
-                        "up": ComputerKeyUpAction(key="u"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_up", "shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="m"),
-                        "up": ComputerKeyUpAction(key="m"),
+        button_mapping={
+            "dpad_up": "dpad-y",
+            "dpad_down": "dpad+y",
+            "dpad_left": "dpad-x",
+            "dpad_right": "dpad+x",
+            "face_down": 0,
+            "face_right": 1,
+            "face_up": 2,
+            "face_left": 3,
+            "shoulder_l": 5,
+            "shoulder_r": 6,
+            "shoulder_zl": 7,
+            "shoulder_zr": 8,
+            "stick_left": 12,
+            "stick_right": 13,
+            "capture": 4,
+            "minus": 9,
+            "plus": 10,
+            "home": 11,
+        },
+        stick_mapping={
+            "stick_left": (0, 1),
+            "stick_right": (2, 3),
+        },
+        modes={
+            "global": Mode(
+                button_actions={
+                    "home": {
+                        "down": SwitchModeAction(mode="default"),
+                    },
+                    "capture": {
+                        "down": ComputerKeyDownAction(key="esc"),
+                        "up": ComputerKeyUpAction(key="esc"),
+                    },
+                    "minus": {
+                        "down": [
+                            ComputerKeyDownAction(key="ctrl"),
+                            ComputerKeyDownAction(key="c"),
+                        ],  # TODO create actions types for copy, paste, cut, ...
+                        "up": [
+                            ComputerKeyUpAction(key="ctrl"),
+                            ComputerKeyUpAction(key="c"),
+                        ],
+                    },
+                    "plus": {
+                        "down": [
+                            ComputerKeyDownAction(key="ctrl"),
+                            ComputerKeyDownAction(key="v"),
+                        ],
+                        "up": [
+                            ComputerKeyUpAction(key="ctrl"),
+                            ComputerKeyUpAction(key="v"),
+                        ],
+                    },
+                }
+            ),
+            "default": Mode(
+                button_actions={
+                    "dpad_up": {
+                        "down": [
+                            SwitchModeAction(mode="selection"),
+                        ],
+                    },
+                    "dpad_down": {
+                        "down": [
+                            SwitchModeAction(mode="selection"),
+                        ],
+                    },
+                    "dpad_left": {
+                        "down": [
+                            SwitchModeAction(mode="selection"),
+                        ],
+                    },
+                    "dpad_right": {
+                        "down": [
+                            SwitchModeAction(mode="selection"),
+                        ],
+                    },
+                    "face_right": {
+                        "down": ComputerMouseDownAction(button="left"),
+                        "up": ComputerMouseUpAction(button="left"),
+                    },
+                    "face_down": {
+                        "down": ComputerMouseDownAction(button="right"),
+                        "up": ComputerMouseUpAction(button="right"),
+                    },
+                    "face_up": {
+                        "down": ComputerMouseDownAction(button="middle"),
+                        "up": ComputerMouseUpAction(button="middle"),
+                    },
+                    "stick_right": {
+                        "down": ComputerMouseDownAction(button="middle"),
+                        "up": ComputerMouseUpAction(button="middle"),
+                    },
+                    "shoulder_l": {
+                        "click": SwitchModeAction(mode="typing"),
+                    },
+                    "shoulder_r": {
+                        "down": ComputerKeyDownAction(key="alt"),
+                        "up": ComputerKeyUpAction(key="alt"),
+                    },
+                    "shoulder_zr": {
+                        "down": ComputerKeyDownAction(key="ctrl"),
+                        "up": ComputerKeyUpAction(key="ctrl"),
+                    },
+                    "shoulder_zl": {
+                        "down": ComputerKeyDownAction(key="shift"),
+                        "up": ComputerKeyUpAction(key="shift"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr", "face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="j"),
-                        "up": ComputerKeyUpAction(key="j"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="o"),
-                        "up": ComputerKeyUpAction(key="o"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="/"),
-                        "up": ComputerKeyUpAction(key="/"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "shoulder_l", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="ü"),
-                        "up": ComputerKeyUpAction(key="ü"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_r", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="2"),
-                        "up": ComputerKeyUpAction(key="2"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="#"),
-                        "up": ComputerKeyUpAction(key="#"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_right"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="e"),
-                        "up": ComputerKeyUpAction(key="e"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_r", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="!"),
-                        "up": ComputerKeyUpAction(key="!"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key=">"),
-                        "up": ComputerKeyUpAction(key=">"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_l", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="k"),
-                        "up": ComputerKeyUpAction(key="k"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="p"),
-                        "up": ComputerKeyUpAction(key="p"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key=","),
-                        "up": ComputerKeyUpAction(key=","),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="€"),
-                        "up": ComputerKeyUpAction(key="€"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key=":"),
-                        "up": ComputerKeyUpAction(key=":"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_r", "shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="?"),
-                        "up": ComputerKeyUpAction(key="?"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="v"),
-                        "up": ComputerKeyUpAction(key="v"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key=";"),
-                        "up": ComputerKeyUpAction(key=";"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="."),
-                        "up": ComputerKeyUpAction(key="."),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr", "face_up", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="+"),
-                        "up": ComputerKeyUpAction(key="+"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_r"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="y"),
-                        "up": ComputerKeyUpAction(key="y"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr", "face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="}"),
-                        "up": ComputerKeyUpAction(key="}"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="="),
-                        "up": ComputerKeyUpAction(key="="),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_right", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="h"),
-                        "up": ComputerKeyUpAction(key="h"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_l", "shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="["),
-                        "up": ComputerKeyUpAction(key="["),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "face_up", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="~"),
-                        "up": ComputerKeyUpAction(key="~"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_l", "face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="'"),
-                        "up": ComputerKeyUpAction(key="'"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_down", "shoulder_zr", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="]"),
-                        "up": ComputerKeyUpAction(key="]"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_down", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="3"),
-                        "up": ComputerKeyUpAction(key="3"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr", "face_right"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="n"),
-                        "up": ComputerKeyUpAction(key="n"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_up", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="`"),
-                        "up": ComputerKeyUpAction(key="`"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_right", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="\\"),
-                        "up": ComputerKeyUpAction(key="\\"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="c"),
-                        "up": ComputerKeyUpAction(key="c"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="5"),
-                        "up": ComputerKeyUpAction(key="5"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="*"),
-                        "up": ComputerKeyUpAction(key="*"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="0"),
-                        "up": ComputerKeyUpAction(key="0"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "face_right", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="ä"),
-                        "up": ComputerKeyUpAction(key="ä"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_r", "face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="z"),
-                        "up": ComputerKeyUpAction(key="z"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_down", "shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="@"),
-                        "up": ComputerKeyUpAction(key="@"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_r", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="q"),
-                        "up": ComputerKeyUpAction(key="q"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_down", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key=")"),
-                        "up": ComputerKeyUpAction(key=")"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="6"),
-                        "up": ComputerKeyUpAction(key="6"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_down", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="$"),
-                        "up": ComputerKeyUpAction(key="$"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "face_right"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="x"),
-                        "up": ComputerKeyUpAction(key="x"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_r", "shoulder_zr", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="ß"),
-                        "up": ComputerKeyUpAction(key="ß"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_r", "face_up", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="4"),
-                        "up": ComputerKeyUpAction(key="4"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "face_right"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="t"),
-                        "up": ComputerKeyUpAction(key="t"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="("),
-                        "up": ComputerKeyUpAction(key="("),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "face_up", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="1"),
-                        "up": ComputerKeyUpAction(key="1"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_up", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="b"),
-                        "up": ComputerKeyUpAction(key="b"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="|"),
-                        "up": ComputerKeyUpAction(key="|"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=[
-                        "shoulder_zr",
-                        "shoulder_zl",
-                        "face_down",
-                        "shoulder_r",
-                        "shoulder_l",
-                    ],
-                    actions={
-                        "down": ComputerKeyDownAction(key="7"),
-                        "up": ComputerKeyUpAction(key="7"),
-                    },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="d"),
-                        "up": ComputerKeyUpAction(key="d"),
+                },
+                stick_actions={
+                    "stick_left": {
+                        "move": ComputerMouseMoveAction(),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=[
-                        "shoulder_zr",
-                        "face_right",
-                        "shoulder_zl",
-                        "shoulder_r",
-                        "shoulder_l",
-                    ],
-                    actions={
-                        "down": ComputerKeyDownAction(key="8"),
-                        "up": ComputerKeyUpAction(key="8"),
+                    "stick_right": {
+                        "move": ComputerScrollAction(),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=[
-                        "shoulder_zr",
-                        "shoulder_zl",
-                        "shoulder_r",
-                        "face_left",
-                        "shoulder_l",
-                    ],
-                    actions={
-                        "down": ComputerKeyDownAction(key="^"),
-                        "up": ComputerKeyUpAction(key="^"),
+                },
+            ),
+            "selection": Mode(
+                button_actions={
+                    "dpad_up": {
+                        "down": ComputerKeyDownAction(key="up", repeat_delay=0.4),
+                        "up": ComputerKeyUpAction(key="up"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_left", "shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="_"),
-                        "up": ComputerKeyUpAction(key="_"),
+                    "dpad_right": {
+                        "down": ComputerKeyDownAction(key="right", repeat_delay=0.4),
+                        "up": ComputerKeyUpAction(key="right"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="&"),
-                        "up": ComputerKeyUpAction(key="&"),
+                    "dpad_down": {
+                        "down": ComputerKeyDownAction(key="down", repeat_delay=0.4),
+                        "up": ComputerKeyUpAction(key="down"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_up", "shoulder_zr", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="<"),
-                        "up": ComputerKeyUpAction(key="<"),
+                    "dpad_left": {
+                        "down": ComputerKeyDownAction(key="left", repeat_delay=0.4),
+                        "up": ComputerKeyUpAction(key="left"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zr", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="f"),
-                        "up": ComputerKeyUpAction(key="f"),
+                    "face_up": {
+                        "down": ComputerKeyDownAction(key="shift"),
+                        "up": ComputerKeyUpAction(key="shift"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="l"),
-                        "up": ComputerKeyUpAction(key="l"),
+                    "face_right": {
+                        "down": ComputerKeyDownAction(key="cmd"),
+                        "up": ComputerKeyUpAction(key="cmd"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="a"),
-                        "up": ComputerKeyUpAction(key="a"),
+                    "face_down": {
+                        "down": ComputerKeyDownAction(key="alt"),
+                        "up": ComputerKeyUpAction(key="alt"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zr", "face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="%"),
-                        "up": ComputerKeyUpAction(key="%"),
+                    "stick_left": {
+                        "down": ComputerKeyDownAction(key="ctrl"),
+                        "up": ComputerKeyUpAction(key="ctrl"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=[
-                        "face_up",
-                        "shoulder_zr",
-                        "shoulder_zl",
-                        "shoulder_r",
-                        "shoulder_l",
-                    ],
-                    actions={
-                        "down": ComputerKeyDownAction(key="9"),
-                        "up": ComputerKeyUpAction(key="9"),
+                    "shoulder_l": {
+                        "click": SwitchModeAction(mode="typing"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr", "face_right"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="s"),
-                        "up": ComputerKeyUpAction(key="s"),
+                    "shoulder_r": {
+                        "click": SwitchModeAction(mode="typing"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="-"),
-                        "up": ComputerKeyUpAction(key="-"),
+                    "shoulder_zl": {
+                        "down": ComputerKeyDownAction(key="pos1"),
+                        "up": ComputerKeyUpAction(key="pos1"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_down", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="{"),
-                        "up": ComputerKeyUpAction(key="{"),
+                    "shoulder_zr": {
+                        "down": ComputerKeyDownAction(key="end"),
+                        "up": ComputerKeyUpAction(key="end"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr", "shoulder_r", "face_down", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="°"),
-                        "up": ComputerKeyUpAction(key="°"),
+                },
+                stick_actions={
+                    "stick_right": {
+                        "move": SwitchModeAction(mode="default"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["face_down"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="r"),
-                        "up": ComputerKeyUpAction(key="r"),
+                    "stick_left": {
+                        "move": SwitchModeAction(mode="default"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l", "shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key='"'),
-                        "up": ComputerKeyUpAction(key='"'),
+                },
+            ),
+            "typing": Mode(
+                button_actions={
+                    "dpad_up": {
+                        "down": ComputerKeyDownAction(key="shift"),
+                        "up": ComputerKeyUpAction(key="shift"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr", "shoulder_l", "shoulder_r", "face_up"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="ö"),
-                        "up": ComputerKeyUpAction(key="ö"),
+                    "dpad_right": {
+                        "down": ComputerKeyDownAction(key="cmd"),
+                        "up": ComputerKeyUpAction(key="cmd"),
                     },
-                ),
-                # ----------------------
-                MultiControllerButtonAction(
-                    buttons=["shoulder_l"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="backspace"),
-                        "up": ComputerKeyUpAction(key="backspace"),
+                    "dpad_down": {
+                        "down": ComputerKeyDownAction(key="alt"),
+                        "up": ComputerKeyUpAction(key="alt"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_r"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="space"),
-                        "up": ComputerKeyUpAction(key="space"),
+                    "dpad_left": {
+                        "down": ComputerKeyDownAction(key="ctrl"),
+                        "up": ComputerKeyUpAction(key="ctrl"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zr"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="enter"),
-                        "up": ComputerKeyUpAction(key="enter"),
+                },
+                stick_actions={
+                    "stick_left": {
+                        "move": SwitchModeAction(mode="default"),
                     },
-                ),
-                MultiControllerButtonAction(
-                    buttons=["shoulder_zl"],
-                    actions={
-                        "down": ComputerKeyDownAction(key="tab"),
-                        "up": ComputerKeyUpAction(key="tab"),
+                    "stick_right": {
+                        "move": ComputerScrollAction(),
                     },
-                ),
-            ],
-        ),
-    },
-)
+                },
+                multi_button_actions=[
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_right"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="g"),
+                            "up": ComputerKeyUpAction(key="g"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="i"),
+                            "up": ComputerKeyUpAction(key="i"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_l", "shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="w"),
+                            "up": ComputerKeyUpAction(key="w"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zr", "face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="u"),
+                            "up": ComputerKeyUpAction(key="u"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_up", "shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="m"),
+                            "up": ComputerKeyUpAction(key="m"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zr", "face_right", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="j"),
+                            "up": ComputerKeyUpAction(key="j"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="o"),
+                            "up": ComputerKeyUpAction(key="o"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zr", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="/"),
+                            "up": ComputerKeyUpAction(key="/"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_r",
+                            "shoulder_zr",
+                            "shoulder_l",
+                            "face_down",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="ü"),
+                            "up": ComputerKeyUpAction(key="ü"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "face_left",
+                            "shoulder_r",
+                            "shoulder_l",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="2"),
+                            "up": ComputerKeyUpAction(key="2"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr", "shoulder_l"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="#"),
+                            "up": ComputerKeyUpAction(key="#"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_right"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="e"),
+                            "up": ComputerKeyUpAction(key="e"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_r", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="!"),
+                            "up": ComputerKeyUpAction(key="!"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key=">"),
+                            "up": ComputerKeyUpAction(key=">"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_l", "face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="k"),
+                            "up": ComputerKeyUpAction(key="k"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="p"),
+                            "up": ComputerKeyUpAction(key="p"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "face_right", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key=","),
+                            "up": ComputerKeyUpAction(key=","),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_r",
+                            "shoulder_zr",
+                            "face_right",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="€"),
+                            "up": ComputerKeyUpAction(key="€"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_l", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key=":"),
+                            "up": ComputerKeyUpAction(key=":"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_r", "shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="?"),
+                            "up": ComputerKeyUpAction(key="?"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="v"),
+                            "up": ComputerKeyUpAction(key="v"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zr", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key=";"),
+                            "up": ComputerKeyUpAction(key=";"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_right", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="."),
+                            "up": ComputerKeyUpAction(key="."),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zr", "face_up", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="+"),
+                            "up": ComputerKeyUpAction(key="+"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_r"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="y"),
+                            "up": ComputerKeyUpAction(key="y"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_l",
+                            "shoulder_zr",
+                            "face_right",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="}"),
+                            "up": ComputerKeyUpAction(key="}"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="="),
+                            "up": ComputerKeyUpAction(key="="),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_right", "shoulder_l"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="h"),
+                            "up": ComputerKeyUpAction(key="h"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "face_left",
+                            "shoulder_l",
+                            "shoulder_zr",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="["),
+                            "up": ComputerKeyUpAction(key="["),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr", "face_up", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="~"),
+                            "up": ComputerKeyUpAction(key="~"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_r",
+                            "shoulder_l",
+                            "face_right",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="'"),
+                            "up": ComputerKeyUpAction(key="'"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "face_down",
+                            "shoulder_zr",
+                            "shoulder_l",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="]"),
+                            "up": ComputerKeyUpAction(key="]"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_r",
+                            "face_down",
+                            "shoulder_l",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="3"),
+                            "up": ComputerKeyUpAction(key="3"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zr", "face_right"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="n"),
+                            "up": ComputerKeyUpAction(key="n"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_up", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="`"),
+                            "up": ComputerKeyUpAction(key="`"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_right", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="\\"),
+                            "up": ComputerKeyUpAction(key="\\"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_l"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="c"),
+                            "up": ComputerKeyUpAction(key="c"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="5"),
+                            "up": ComputerKeyUpAction(key="5"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_zr", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="*"),
+                            "up": ComputerKeyUpAction(key="*"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_l", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="0"),
+                            "up": ComputerKeyUpAction(key="0"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_r",
+                            "shoulder_zr",
+                            "face_right",
+                            "shoulder_l",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="ä"),
+                            "up": ComputerKeyUpAction(key="ä"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_r", "face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="z"),
+                            "up": ComputerKeyUpAction(key="z"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_down", "shoulder_zr", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="@"),
+                            "up": ComputerKeyUpAction(key="@"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_r", "shoulder_l"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="q"),
+                            "up": ComputerKeyUpAction(key="q"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_down", "shoulder_l", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key=")"),
+                            "up": ComputerKeyUpAction(key=")"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_r",
+                            "shoulder_zr",
+                            "shoulder_l",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="6"),
+                            "up": ComputerKeyUpAction(key="6"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_down", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="$"),
+                            "up": ComputerKeyUpAction(key="$"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr", "face_right"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="x"),
+                            "up": ComputerKeyUpAction(key="x"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "face_left",
+                            "shoulder_r",
+                            "shoulder_zr",
+                            "shoulder_l",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="ß"),
+                            "up": ComputerKeyUpAction(key="ß"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_r", "face_up", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="4"),
+                            "up": ComputerKeyUpAction(key="4"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "face_right"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="t"),
+                            "up": ComputerKeyUpAction(key="t"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="("),
+                            "up": ComputerKeyUpAction(key="("),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "face_up", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="1"),
+                            "up": ComputerKeyUpAction(key="1"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_up", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="b"),
+                            "up": ComputerKeyUpAction(key="b"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr", "face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="|"),
+                            "up": ComputerKeyUpAction(key="|"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_zr",
+                            "shoulder_zl",
+                            "face_down",
+                            "shoulder_r",
+                            "shoulder_l",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="7"),
+                            "up": ComputerKeyUpAction(key="7"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zr", "face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="d"),
+                            "up": ComputerKeyUpAction(key="d"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_zr",
+                            "face_right",
+                            "shoulder_zl",
+                            "shoulder_r",
+                            "shoulder_l",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="8"),
+                            "up": ComputerKeyUpAction(key="8"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_zr",
+                            "shoulder_zl",
+                            "shoulder_r",
+                            "face_left",
+                            "shoulder_l",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="^"),
+                            "up": ComputerKeyUpAction(key="^"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_left", "shoulder_l"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="_"),
+                            "up": ComputerKeyUpAction(key="_"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="&"),
+                            "up": ComputerKeyUpAction(key="&"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_up", "shoulder_zr", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="<"),
+                            "up": ComputerKeyUpAction(key="<"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zr", "face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="f"),
+                            "up": ComputerKeyUpAction(key="f"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="l"),
+                            "up": ComputerKeyUpAction(key="l"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="a"),
+                            "up": ComputerKeyUpAction(key="a"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zr", "face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="%"),
+                            "up": ComputerKeyUpAction(key="%"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "face_up",
+                            "shoulder_zr",
+                            "shoulder_zl",
+                            "shoulder_r",
+                            "shoulder_l",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="9"),
+                            "up": ComputerKeyUpAction(key="9"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zr", "face_right"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="s"),
+                            "up": ComputerKeyUpAction(key="s"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="-"),
+                            "up": ComputerKeyUpAction(key="-"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_down", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="{"),
+                            "up": ComputerKeyUpAction(key="{"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=[
+                            "shoulder_zr",
+                            "shoulder_r",
+                            "face_down",
+                            "shoulder_zl",
+                        ],
+                        actions={
+                            "down": ComputerKeyDownAction(key="°"),
+                            "up": ComputerKeyUpAction(key="°"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["face_down"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="r"),
+                            "up": ComputerKeyUpAction(key="r"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l", "shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key='"'),
+                            "up": ComputerKeyUpAction(key='"'),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zr", "shoulder_l", "shoulder_r", "face_up"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="ö"),
+                            "up": ComputerKeyUpAction(key="ö"),
+                        },
+                    ),
+                    # ----------------------
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_l"],
+                        actions={
+                            "down": ComputerKeyDownAction(
+                                key="backspace", repeat_delay=0.4
+                            ),
+                            "up": ComputerKeyUpAction(key="backspace"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_r"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="space"),
+                            "up": ComputerKeyUpAction(key="space"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zr"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="enter"),
+                            "up": ComputerKeyUpAction(key="enter"),
+                        },
+                    ),
+                    MultiControllerButtonAction(
+                        buttons=["shoulder_zl"],
+                        actions={
+                            "down": ComputerKeyDownAction(key="tab"),
+                            "up": ComputerKeyUpAction(key="tab"),
+                        },
+                    ),
+                ],
+            ),
+        },
+    )
+
+
+_default_config: Config | None = None
+
+
+def get_default_config() -> Config:
+    """Return the default config, building it on first use."""
+    global _default_config
+    if _default_config is None:
+        _default_config = create_default_config()
+    return _default_config
+
+
+def __getattr__(name: str):
+    # default_config is built lazily to keep importing this module cheap
+    if name == "default_config":
+        return get_default_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    default_config = get_default_config()
     default_config_string = default_config.model_dump_json(indent=4)
     new_config = Config.model_validate_json(default_config_string)
     assert (
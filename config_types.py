@@ -0,0 +1,65 @@
+"""
+Type definitions shared by the config and the runtime.
+This module does not depend on pydantic, so it can be imported without loading the config models.
+"""
+
+from typing import Literal, get_args
+
+CONFIG_SCHEMA_VERSION = 7
+"""Has to be increased whenever the config models change. Invalidates all cached config snapshots."""
+
+ModeName = Literal["default", "global"] | str
+"""Name of a mode."""
+
+ControllerButtonName = Literal[
+    "dpad_up",
+    "dpad_down",
+    "dpad_left",
+    "dpad_right",
+    "face_up",
+    "face_down",
+    "face_left",
+    "face_right",
+    "shoulder_l",
+    "shoulder_r",
+    "shoulder_zl",
+    "shoulder_zr",
+    "stick_left",
+    "stick_right",
+    "minus",
+    "plus",
+    "home",
+    "capture",
+]
+"""A button on the controller."""
+ControllerStickName = Literal["stick_left", "stick_right"]
+"""A stick on the controller."""
+ControllerButtonEventName = Literal[
+    "down",
+    "up",
+    "click",
+    "long_press",
+    "double_click",
+    "tripple_click",
+    "hold",
+    "hold_repeat",
+]
+"""An event name for a button of the controller being pressed or released."""
+ControllerStickEventName = Literal["move"]
+"""An event name for a stick of the controller being moved."""
+
+ControllerButtonIndex = int | Literal["dpad-y", "dpad+y", "dpad-x", "dpad+x"]
+"""Index of a button on the controller or the direction of the dpad buttons."""
+
+BUTTON_NAMES: tuple[ControllerButtonName, ...] = get_args(ControllerButtonName)
+"""All controller button names. The position of a button is its bit in button masks."""
+STICK_NAMES: tuple[ControllerStickName, ...] = get_args(ControllerStickName)
+"""All controller stick names."""
+BUTTON_EVENT_NAMES: tuple[ControllerButtonEventName, ...] = get_args(
+    ControllerButtonEventName
+)
+"""All button event names."""
+STICK_EVENT_NAMES: tuple[ControllerStickEventName, ...] = get_args(
+    ControllerStickEventName
+)
+"""All stick event names."""
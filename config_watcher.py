@@ -0,0 +1,153 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable
+from compiled_config import CompiledConfig, load_compiled_config
+import log
+
+# inotify constants from linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+"""struct inotify_event without the name: wd, mask, cookie, len"""
+
+
+class ConfigWatcher:
+    """
+    Watches the config file and validates and compiles it in a background thread whenever it changes.
+    Uses inotify on Linux and falls back to polling the modification time.
+    """
+
+    poll_interval = 1.0
+    """Interval in seconds to check the config file when inotify is not available"""
+    settle_time = 0.1
+    """Time in seconds to wait after a change for the editor to finish writing the file"""
+
+    def __init__(self, path: str, on_config_changed: Callable[[CompiledConfig], None]):
+        self.path = os.path.abspath(path)
+        self.on_config_changed = on_config_changed
+        self.running = False
+        self.thread: threading.Thread | None = None
+        self.last_file_state = self.get_file_state()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def get_file_state(self) -> tuple[int, int] | None:
+        """Modification time and size of the config file or None if it does not exist."""
+        try:
+            stat_result = os.stat(self.path)
+        except OSError:
+            return None
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    def check(self):
+        """Load the config if the file changed since the last check."""
+        file_state = self.get_file_state()
+        if file_state is None or file_state == self.last_file_state:
+            return
+        self.last_file_state = file_state
+        try:
+            config = load_compiled_config(self.path)
+        except ValueError as e:
+            # pydantic's ValidationError and missing required modes are ValueErrors
+            log.error(
+                "config",
+                "Config is invalid and was not reloaded",
+                path=self.path,
+                error=e,
+            )
+            return
+        except OSError as e:
+            # The file was deleted or replaced after it was checked, the next check loads it again
+            self.last_file_state = None
+            log.error(
+                "config",
+                "Config could not be read and was not reloaded",
+                path=self.path,
+                error=e,
+            )
+            return
+        except Exception as e:
+            # The old config stays active and the watcher keeps running
+            log.error(
+                "config",
+                "Config could not be compiled and was not reloaded",
+                path=self.path,
+                error=repr(e),
+            )
+            return
+        self.on_config_changed(config)
+
+    def run(self):
+        inotify_fd = self.init_inotify()
+        if inotify_fd is None:
+            self.run_polling()
+        else:
+            try:
+                self.run_inotify(inotify_fd)
+            finally:
+                os.close(inotify_fd)
+
+    def init_inotify(self) -> int | None:
+        """Create an inotify instance watching the directory of the config file. Returns None if inotify is not available."""
+        if sys.platform != "linux":
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if inotify_fd < 0:
+            return None
+        # Editors often replace the file instead of writing to it, so the directory is watched
+        watch_descriptor = libc.inotify_add_watch(
+            inotify_fd,
+            os.path.dirname(self.path).encode(),
+            IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE,
+        )
+        if watch_descriptor < 0:
+            os.close(inotify_fd)
+            return None
+        return inotify_fd
+
+    def run_inotify(self, inotify_fd: int):
+        file_name = os.path.basename(self.path).encode()
+        while self.running:
+            readable, _, _ = select.select([inotify_fd], [], [], self.poll_interval)
+            if not readable:
+                continue
+            is_config_changed = False
+            try:
+                data = os.read(inotify_fd, 4096)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset : offset + name_length].rstrip(b"\0")
+                offset += name_length
+                if name == file_name:
+                    is_config_changed = True
+            if is_config_changed:
+                time.sleep(self.settle_time)
+                self.check()
+
+    def run_polling(self):
+        while self.running:
+            time.sleep(self.poll_interval)
+            self.check()
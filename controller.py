@@ -1,24 +1,135 @@
-import pygame
-from pygame.locals import *
-from typing import Callable
-import time
-from config import *
+from array import array
+from collections import deque
+from typing import Callable, Iterable, NamedTuple, Sequence, TYPE_CHECKING
+import os
 import threading
+import time
+import traceback
+from config_types import (
+    BUTTON_NAMES,
+    STICK_NAMES,
+    ControllerButtonEventName,
+    ControllerButtonIndex,
+    ControllerButtonName,
+    ControllerStickEventName,
+    ControllerStickName,
+)
+from chord_analysis import ChordAnalysis
+from compiled_config import button_names_to_mask
 from event_listener import EventListener
+from perf_counters import perf_counters
+import log
+from scheduler import RepeatingCall, ScheduledCall, Scheduler
+
+if TYPE_CHECKING:
+    from config import Config, ControllerSettings
+    from compiled_config import CompiledConfig
+    from controller_process import ControllerProcess
+    from event_bus import EventBusPublisher
+
+pygame = None
+"""The pygame module. Imported by load_pygame on first use, since importing it is slow and prints a banner."""
+
+
+def load_pygame():
+    """
+    Import pygame and initialize the subsystems needed to receive joystick events.
+    The display subsystem holds the event queue and is only initialized when called on the main thread, since SDL
+    only supports that on macOS and Windows. Joysticks can be enumerated from any thread.
+    """
+    global pygame
+    if pygame is None:
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame as pygame_module
+
+        pygame = pygame_module
+    if threading.current_thread() is threading.main_thread():
+        # No window is created
+        pygame.display.init()
+    pygame.joystick.init()
+    return pygame
+
+
+class ControllerState:
+    """
+    Packed state of all buttons and sticks, updated incrementally by the buttons and sticks.
+    Bit i of pressed_mask is BUTTON_NAMES[i]. The x and y value of STICK_NAMES[i] are stored in axes at 2 * i and 2 * i + 1.
+    """
+
+    __slots__ = ("pressed_mask", "axes")
+
+    def __init__(self):
+        self.pressed_mask = 0
+        self.axes = array("d", [0.0] * (2 * len(STICK_NAMES)))
+
+
+class ControllerSnapshot(NamedTuple):
+    """Immutable state of the controller at one point in time."""
+
+    pressed_mask: int
+    """Bit i is set if BUTTON_NAMES[i] is pressed"""
+    axes: tuple[float, ...]
+    """x and y of each stick in the order of STICK_NAMES"""
+    time: float
+    """time.monotonic() when the snapshot was taken"""
+
+
+def schedule_hold_events(
+    scheduler: Scheduler,
+    settings: "ControllerSettings",
+    fire: Callable[[ControllerButtonEventName], None],
+) -> RepeatingCall:
+    """Schedule the hold event single_click_duration after now and, if configured, hold_repeat events every hold_repeat_interval after that."""
+    return scheduler.call_repeating(
+        time.monotonic() + settings.single_click_duration,
+        settings.hold_repeat_interval,
+        lambda repeat: fire("hold" if repeat == 0 else "hold_repeat"),
+    )
 
 
 class Button(EventListener[ControllerButtonEventName, "Button"]):
+    __slots__ = (
+        "name",
+        "index",
+        "settings",
+        "scheduler",
+        "state",
+        "bit",
+        "pressed",
+        "hold_call",
+        "repeat_calls",
+        "pressed_time_start",
+        "pressed_time_end",
+        "last_click_time",
+        "last_double_click_time",
+    )
+
     def __init__(
-        self, name: str, index: ControllerButtonIndex, settings: ControllerSettings
+        self,
+        name: str,
+        index: ControllerButtonIndex,
+        settings: "ControllerSettings",
+        scheduler: Scheduler | None = None,
+        state: ControllerState | None = None,
     ):
         super().__init__()
 
         self.name = name
         self.index: ControllerButtonIndex = index
         self.settings = settings
+        self.scheduler = scheduler
+        """Scheduler used to fire the hold events. Without a scheduler, no hold events are fired."""
+        self.state = ControllerState() if state is None else state
+        """Controller state the button updates when it is pressed or released"""
+        self.bit = 1 << BUTTON_NAMES.index(name)
+        """Bit of the button in button masks"""
 
         # State
         self.pressed = False
+        self.hold_call: ScheduledCall | None = None
+        """Scheduled hold or hold_repeat event of the current press"""
+        self.repeat_calls: list[RepeatingCall] = []
+        """Actions repeated while the button is held, see start_repeat"""
 
         # Time tracking
         self.pressed_time_start = 0
@@ -33,8 +144,15 @@ class Button(EventListener[ControllerButtonEventName, "Button"]):
     def _down(self):
         """Has to be called when the button is pressed down"""
         self.pressed = True
+        self.state.pressed_mask |= self.bit
         self.pressed_time_start = time.time()
         self.call_event_listeners("down")
+        if self.scheduler is not None:
+            self.hold_call = schedule_hold_events(
+                self.scheduler,
+                self.settings,
+                self.call_event_listeners,
+            )
 
         if (
             self.pressed_time_start - self.last_double_click_time
@@ -53,7 +171,12 @@ class Button(EventListener[ControllerButtonEventName, "Button"]):
     def _up(self):
         """Has to be called when the button is released"""
         self.pressed = False
+        self.state.pressed_mask &= ~self.bit
         self.pressed_time_end = time.time()
+        if self.hold_call is not None:
+            self.hold_call.cancel()
+            self.hold_call = None
+        self.cancel_repeats()
 
         self.call_event_listeners("up")
 
@@ -65,17 +188,54 @@ class Button(EventListener[ControllerButtonEventName, "Button"]):
             self.call_event_listeners("click")
             self.last_click_time = self.pressed_time_end
 
+    def start_repeat(
+        self, delay: float, interval: float, callback: Callable[[], None]
+    ) -> RepeatingCall | None:
+        """
+        Run the callback delay seconds after now and then every interval seconds until the button is released or its listeners are removed.
+        Returns None if the button is not pressed or has no scheduler.
+        """
+        if self.scheduler is None or not self.pressed:
+            return None
+        repeat_call = self.scheduler.call_repeating(
+            time.monotonic() + delay, interval, lambda repeat: callback()
+        )
+        self.repeat_calls.append(repeat_call)
+        return repeat_call
+
+    def cancel_repeats(self):
+        for repeat_call in self.repeat_calls:
+            repeat_call.cancel()
+        self.repeat_calls.clear()
+
+    def remove_all_event_listeners(self) -> None:
+        """Remove all event listeners and stop repeating their actions."""
+        self.cancel_repeats()
+        super().remove_all_event_listeners()
+
     def __str__(self):
         return self.name
 
 
 class Stick(EventListener[ControllerStickEventName, "Stick"]):
+    __slots__ = (
+        "name",
+        "axis_x_index",
+        "axis_y_index",
+        "settings",
+        "state",
+        "axis_offset",
+        "x",
+        "y",
+    )
+
     def __init__(
         self,
         name: str,
         axis_x_index: int,
         axis_y_index: int,
-        settings: ControllerSettings,
+        settings: "ControllerSettings",
+        state: ControllerState | None = None,
     ):
         super().__init__()
 
@@ -83,6 +243,10 @@ class Stick(EventListener[ControllerStickEventName, "Stick"]):
         self.axis_x_index = axis_x_index
         self.axis_y_index = axis_y_index
         self.settings = settings
+        self.state = ControllerState() if state is None else state
+        """Controller state the stick updates when it moves"""
+        self.axis_offset = 2 * STICK_NAMES.index(name)
+        """Index of the x value of the stick in the axes of the state"""
 
         # State
         self.x = 0
@@ -98,6 +262,7 @@ class Stick(EventListener[ControllerStickEventName, "Stick"]):
             else:
                 return
         self.x = new_x
+        self.state.axes[self.axis_offset] = new_x
         self.call_event_listeners("move")
 
     def _move_y(self, value):
@@ -110,6 +275,7 @@ class Stick(EventListener[ControllerStickEventName, "Stick"]):
             else:
                 return
         self.y = new_y
+        self.state.axes[self.axis_offset + 1] = new_y
         self.call_event_listeners("move")
 
     def __str__(self):
@@ -118,26 +284,34 @@ class Stick(EventListener[ControllerStickEventName, "Stick"]):
 
 class MultiButtonEvents(
     EventListener[
-        tuple[ControllerButtonEventName, list[ControllerButtonName]], list[Button]
+        tuple[ControllerButtonEventName, list[ControllerButtonName]],
+        Sequence[Button],
     ]
 ):
-    def get_event_listeners(self, event_trigger):
-        event_name, event_button_names = event_trigger
-        return [
-            listener
-            for (e_name, button_names), listener in self._event_listeners.values()
-            if e_name == event_name and set(button_names) == set(event_button_names)
-        ]
+    __slots__ = ("scheduler", "repeat_calls")
+
+    def __init__(self, scheduler: Scheduler | None = None):
+        super().__init__()
+        self.scheduler = scheduler
+        """Scheduler used to repeat actions. Without a scheduler, no actions are repeated."""
+        self.repeat_calls: list[tuple[frozenset[str], RepeatingCall]] = []
+        """Actions repeated while the buttons of a multi button event are held, with the names of these buttons"""
+
+    def _get_index_key(self, event_trigger):
+        """Listeners are found by the event name and the set of button names, the order of the buttons does not matter."""
+        event_name, button_names = event_trigger
+        return event_name, frozenset(button_names)
 
     def add_event_listener(
         self,
         controller_button_event_name: ControllerButtonEventName,
         controller_button_names: list[ControllerButtonName],
-        listener: Callable[[list[Button]], None],
+        listener: Callable[[Sequence[Button]], None],
+        origin: str | None = None,
     ):
         """Add a listener for the multi button event."""
         return super().add_event_listener(
-            (controller_button_event_name, controller_button_names), listener
+            (controller_button_event_name, controller_button_names), listener, origin
         )
 
     def get_multi_button_event_listeners(
@@ -156,12 +330,112 @@ class MultiButtonEvents(
     def call_event_listeners(
         self,
         controller_button_event_name: ControllerButtonEventName,
-        buttons: list[Button],
+        buttons: Sequence[Button],
+        button_names: frozenset[ControllerButtonName] | None = None,
     ):
-        """Call all listeners for the given event in the order they were added."""
+        """
+        Call all listeners for the given event in the order they were added.
+        Callers firing several events for the same buttons can pass the precomputed button_names.
+        """
+        if button_names is None:
+            button_names = frozenset(button.name for button in buttons)
         return super().call_event_listeners(
-            (controller_button_event_name, [button.name for button in buttons]),
-            buttons,
+            (controller_button_event_name, button_names), buttons
+        )
+
+    def start_repeat(
+        self,
+        buttons: Sequence[Button],
+        delay: float,
+        interval: float,
+        callback: Callable[[], None],
+    ) -> RepeatingCall | None:
+        """
+        Run the callback delay seconds after now and then every interval seconds until one of the buttons is released or the listeners are removed.
+        Returns None if one of the buttons is not pressed or there is no scheduler.
+        """
+        if self.scheduler is None or not all(button.pressed for button in buttons):
+            return None
+        repeat_call = self.scheduler.call_repeating(
+            time.monotonic() + delay, interval, lambda repeat: callback()
+        )
+        self.repeat_calls.append(
+            (frozenset(button.name for button in buttons), repeat_call)
+        )
+        return repeat_call
+
+    def cancel_repeats(self, button_names: Iterable[str] | None = None):
+        """Stop the repeats of multi button events containing any of the given buttons or all repeats if None."""
+        if button_names is None:
+            cancelled_calls = self.repeat_calls
+            self.repeat_calls = []
+        else:
+            cancelled_calls = [
+                repeat
+                for repeat in self.repeat_calls
+                if not repeat[0].isdisjoint(button_names)
+            ]
+            self.repeat_calls = [
+                repeat
+                for repeat in self.repeat_calls
+                if repeat[0].isdisjoint(button_names)
+            ]
+        for _, repeat_call in cancelled_calls:
+            repeat_call.cancel()
+
+    def remove_all_event_listeners(self) -> None:
+        """Remove all event listeners and stop repeating their actions."""
+        self.cancel_repeats()
+        super().remove_all_event_listeners()
+
+
+class Chord:
+    """
+    A multi button event which has fired its down event and waits for all of its buttons to be released.
+    Chords are preallocated records reused by the controller, see Controller.acquire_chord. Listeners receive the
+    buttons of the chord as an immutable tuple shared by all chords of the same buttons, so batch listeners can keep it.
+    """
+
+    __slots__ = (
+        "multi_button_events",
+        "buttons",
+        "button_names",
+        "mask",
+        "pressed_time_start",
+        "hold_call",
+        "fire_event",
+    )
+
+    def __init__(self, multi_button_events: MultiButtonEvents):
+        self.multi_button_events = multi_button_events
+        self.buttons: tuple[Button, ...] = ()
+        self.button_names: frozenset[ControllerButtonName] = frozenset()
+        """Passed to every event of the chord"""
+        self.mask = 0
+        """Button mask of the chord"""
+        self.pressed_time_start = 0.0
+        """Time when the down event was fired in seconds"""
+        self.hold_call: RepeatingCall | None = None
+        """Scheduled hold or hold_repeat event of the chord"""
+        self.fire_event = self._fire_event
+        """Bound once, so scheduling the hold events of a chord does not create a callback per press"""
+
+    def reset(
+        self,
+        buttons: tuple[Button, ...],
+        button_names: frozenset[ControllerButtonName],
+        mask: int,
+        pressed_time_start: float,
+    ):
+        self.buttons = buttons
+        self.button_names = button_names
+        self.mask = mask
+        self.pressed_time_start = pressed_time_start
+        self.hold_call = None
+
+    def _fire_event(self, event_name: ControllerButtonEventName):
+        self.multi_button_events.call_event_listeners(
+            event_name, self.buttons, self.button_names
         )
 
 
@@ -169,29 +443,52 @@ class Controller:
     Stick = Stick
     Button = Button
 
-    def __init__(self, config: Config):
+    def __init__(self, config: "Config | CompiledConfig"):
         super().__init__()
 
-        # Initialize Pygame
-        pygame.init()
-
         self.config = config
+        self.scheduler = Scheduler()
+        """Runs timed events on the controller thread"""
+        self.state = ControllerState()
+        """Pressed buttons and stick values, updated by the buttons and sticks"""
 
         self.initialize_buttons()
         self.initialize_sticks()
-        self.multi_button_events = MultiButtonEvents()
+        self.multi_button_events = MultiButtonEvents(self.scheduler)
+        self.chord_analysis: ChordAnalysis | None = None
+        """Analysis of the registered chords, see get_chord_analysis"""
+        self.chord_analysis_version = -1
+        """Version of the multi button listeners the chord analysis was computed for"""
+        self.multi_button_mask = 0
+        """Mask of all buttons which are part of any multi button event, computed with the chord analysis"""
 
         self.pygame_controller = None
+        self.controller_process: "ControllerProcess | None" = None
+        """Child process polling the controller, set by run"""
+        self.pending_calls: deque[Callable[[], None]] = deque()
+        """Callbacks to run on the controller thread, see call_soon"""
+        self.event_bus: "EventBusPublisher | None" = None
+        """Publishes the controller events to other processes, see start_event_bus"""
 
         # State
-        self.multi_button_event_timer: threading.Timer | None = None
+        self.multi_button_event_timer: ScheduledCall | None = None
         """Timer is used to fire the multi button event after a certain time without any new button press"""
-        self.is_multi_buttons_pressed = False
-        """Is True after a down event has been fired as long as at least one button from a multi button event is still pressed"""
+        self.active_chords: list[Chord] = []
+        """Multi button events which have fired their down event and of which at least one button is still pressed"""
         self.multi_button_event_buttons: list[Button] = []
-        """List of buttons that are part of the current multi button event"""
-        self.last_multi_button_event_buttons: list[Button] = []
-        """List of buttons that were part of the last multi button event, used to identify a double click"""
+        """List of buttons that are part of the current multi button event which has not fired its down event yet"""
+        self.multi_button_event_start_time = 0.0
+        """time.monotonic() of the first button press of the current multi button event"""
+        self.last_chord: Chord | None = None
+        """Last released multi button event, used to identify a double click"""
+        self.free_chords: list[Chord] = [
+            Chord(self.multi_button_events) for _ in range(4)
+        ]
+        """Preallocated chord records which are neither active nor the last chord"""
+        self.chord_members: dict[
+            int, tuple[tuple[Button, ...], frozenset[ControllerButtonName]]
+        ] = {}
+        """Buttons and button names of each chord mask, so a chord pressed again reuses them"""
 
         # Time tracking
         self.multi_button_pressed_time_start = 0
@@ -210,6 +507,18 @@ class Controller:
             stick.remove_all_event_listeners()
         self.multi_button_events.remove_all_event_listeners()
 
+    def flush_event_batches(self):
+        """Deliver the events collected for batch listeners. Called once per cycle of the run loop."""
+        now = time.monotonic()
+        for button in self.buttons.values():
+            if button._event_batches:
+                button.flush_event_batches(now)
+        for stick in self.sticks.values():
+            if stick._event_batches:
+                stick.flush_event_batches(now)
+        if self.multi_button_events._event_batches:
+            self.multi_button_events.flush_event_batches(now)
+
     def initialize_buttons(self):
         self.buttons: dict[ControllerButtonName, Button] = {}
         for (
@@ -220,6 +529,8 @@ class Controller:
                 name=controller_button_name,
                 index=controller_button_index,
                 settings=self.config.settings.controller_settings,
+                scheduler=self.scheduler,
+                state=self.state,
             )
             self.buttons |= {controller_button_name: button}
 
@@ -234,37 +545,184 @@ class Controller:
                 axis_x_index=axis_x_index,
                 axis_y_index=axis_y_index,
                 settings=self.config.settings.controller_settings,
+                state=self.state,
             )
             self.sticks |= {controller_stick_name: stick}
 
+    def apply_config(self, config: "Config | CompiledConfig"):
+        """
+        Apply a changed button mapping, stick mapping and settings.
+        Buttons and sticks which still exist keep their state and listeners.
+        """
+        self.config = config
+        settings = config.settings.controller_settings
+        # Cached chords may contain removed buttons
+        self.chord_members = {}
+        for controller_button_name in list(self.buttons):
+            if controller_button_name not in config.button_mapping:
+                self.state.pressed_mask &= ~self.buttons[controller_button_name].bit
+                del self.buttons[controller_button_name]
+        for (
+            controller_button_name,
+            controller_button_index,
+        ) in config.button_mapping.items():
+            button = self.buttons.get(controller_button_name, None)
+            if button is None:
+                self.buttons[controller_button_name] = Button(
+                    name=controller_button_name,
+                    index=controller_button_index,
+                    settings=settings,
+                    scheduler=self.scheduler,
+                    state=self.state,
+                )
+            else:
+                button.index = controller_button_index
+                button.settings = settings
+        for controller_stick_name in list(self.sticks):
+            if controller_stick_name not in config.stick_mapping:
+                del self.sticks[controller_stick_name]
+        for controller_stick_name, (
+            axis_x_index,
+            axis_y_index,
+        ) in config.stick_mapping.items():
+            stick = self.sticks.get(controller_stick_name, None)
+            if stick is None:
+                self.sticks[controller_stick_name] = Stick(
+                    name=controller_stick_name,
+                    axis_x_index=axis_x_index,
+                    axis_y_index=axis_y_index,
+                    settings=settings,
+                    state=self.state,
+                )
+            else:
+                stick.axis_x_index = axis_x_index
+                stick.axis_y_index = axis_y_index
+                stick.settings = settings
+        if self.event_bus is not None:
+            # New buttons and sticks are published too
+            self.event_bus.attach(self)
+
+    def start_event_bus(self, path: str | None = None) -> "EventBusPublisher":
+        """Publish all button, chord and stick events on a Unix domain socket, see event_bus.py."""
+        if self.event_bus is None:
+            from event_bus import EventBusPublisher
+
+            self.event_bus = EventBusPublisher(path)
+            self.event_bus.start()
+            self.event_bus.attach(self)
+        return self.event_bus
+
+    def stop_event_bus(self):
+        if self.event_bus is None:
+            return
+        for button in self.buttons.values():
+            button.event_tap = None
+        for stick in self.sticks.values():
+            stick.event_tap = None
+        self.multi_button_events.event_tap = None
+        self.event_bus.stop()
+        self.event_bus = None
+
+    def call_soon(self, callback: Callable[[], None]):
+        """
+        Run the callback on the controller thread before the next controller events are handled.
+        Can be called from any thread. Callbacks therefore never run concurrently to event listeners.
+        """
+        self.pending_calls.append(callback)
+
     def get_buttons_allowed_for_multi_button_event(self) -> list[Button]:
         """Return a list of all buttons that are part of any multi button event."""
-        allowed_button_names = []
-        for (_, button_names), _ in self.multi_button_events._event_listeners.values():
-            for button_name in button_names:
-                if button_name not in allowed_button_names:
-                    allowed_button_names.append(button_name)
-        return [self.buttons[button_name] for button_name in allowed_button_names]
+        multi_button_mask = self.get_multi_button_mask()
+        return [
+            button for button in self.buttons.values() if button.bit & multi_button_mask
+        ]
+
+    def get_chord_analysis(self) -> ChordAnalysis:
+        """Return the analysis of the registered chords. It is recomputed whenever the multi button listeners changed."""
+        if self.chord_analysis_version != self.multi_button_events.version:
+            self.chord_analysis_version = self.multi_button_events.version
+            self.chord_analysis = ChordAnalysis(
+                button_names_to_mask(button_names)
+                for (
+                    _,
+                    button_names,
+                ), _ in self.multi_button_events._event_listeners.values()
+            )
+            multi_button_mask = 0
+            for mask in self.chord_analysis.chord_masks:
+                multi_button_mask |= mask
+            self.multi_button_mask = multi_button_mask
+        return self.chord_analysis
+
+    def get_multi_button_mask(self) -> int:
+        """Return the mask of all buttons which are part of any multi button event."""
+        self.get_chord_analysis()
+        return self.multi_button_mask
+
+    def get_pressed_mask(self) -> int:
+        """Return the mask of all pressed buttons, bit i is BUTTON_NAMES[i]."""
+        return self.state.pressed_mask
+
+    def is_pressed(self, mask: int) -> bool:
+        """Return True if all buttons of the mask are pressed."""
+        return self.state.pressed_mask & mask == mask
+
+    def get_pressed_chord(self) -> int | None:
+        """Return the mask of the registered multi button event whose buttons are exactly the pressed multi buttons or None."""
+        pressed_mask = self.state.pressed_mask & self.get_multi_button_mask()
+        if pressed_mask in self.chord_analysis.supersets:
+            return pressed_mask
+        return None
+
+    def get_snapshot(self) -> ControllerSnapshot:
+        """Return the current state of all buttons and sticks."""
+        return ControllerSnapshot(
+            self.state.pressed_mask, tuple(self.state.axes), time.monotonic()
+        )
 
     def get_pressed_multi_buttons(self) -> list[Button]:
         """Return a list of all buttons that are pressed and part of any multi button event."""
-        return [
-            button
-            for button in self.get_buttons_allowed_for_multi_button_event()
-            if button.pressed
-        ]
+        pressed_mask = self.state.pressed_mask & self.get_multi_button_mask()
+        return [button for button in self.buttons.values() if button.bit & pressed_mask]
 
-    def on_multi_button_down(self):
-        """Has to be called when the multi button down event was triggerd."""
-        self.is_multi_buttons_pressed = True
-        self.multi_button_pressed_time_start = time.time()
-        self.multi_button_events.call_event_listeners(
-            "down", self.multi_button_event_buttons
+    def acquire_chord(self, buttons: list[Button], pressed_time_start: float) -> Chord:
+        """Reset a free chord record for the buttons. A new record is only created if all records are in use."""
+        mask = 0
+        for button in buttons:
+            mask |= button.bit
+        members = self.chord_members.get(mask, None)
+        if members is None:
+            members = (tuple(buttons), frozenset(button.name for button in buttons))
+            self.chord_members[mask] = members
+        chord = (
+            self.free_chords.pop()
+            if self.free_chords
+            else Chord(self.multi_button_events)
         )
+        chord.reset(members[0], members[1], mask, pressed_time_start)
+        return chord
+
+    def on_multi_button_down(self) -> "Chord":
+        """Has to be called when the multi button down event was triggerd. Fires the down event of the current multi button event."""
+        chord = self.acquire_chord(self.multi_button_event_buttons, time.time())
+        self.multi_button_event_buttons.clear()
         self.multi_button_event_timer = None
-        is_same_buttons_as_last_time = set(
-            [button.name for button in self.multi_button_event_buttons]
-        ) == set([button.name for button in self.last_multi_button_event_buttons])
+        self.active_chords.append(chord)
+        perf_counters.chords += 1
+        perf_counters.chord_wait_time += (
+            time.monotonic() - self.multi_button_event_start_time
+        )
+        self.multi_button_pressed_time_start = chord.pressed_time_start
+        self.multi_button_events.call_event_listeners(
+            "down", chord.buttons, chord.button_names
+        )
+        chord.hold_call = schedule_hold_events(
+            self.scheduler, self.config.settings.controller_settings, chord.fire_event
+        )
+        last_chord = self.last_chord
+        is_same_buttons_as_last_time = (
+            last_chord is not None and chord.button_names == last_chord.button_names
+        )
         if (
             self.multi_button_pressed_time_start
             - self.multi_button_last_double_click_time
@@ -272,7 +730,7 @@ class Controller:
             and is_same_buttons_as_last_time
         ):
             self.multi_button_events.call_event_listeners(
-                "tripple_click", self.last_multi_button_event_buttons
+                "tripple_click", last_chord.buttons, last_chord.button_names
             )
             self.multi_button_last_double_click_time = 0
             self.multi_button_last_click_time = 0
@@ -282,108 +740,155 @@ class Controller:
             and is_same_buttons_as_last_time
         ):
             self.multi_button_events.call_event_listeners(
-                "double_click", self.last_multi_button_event_buttons
+                "double_click", last_chord.buttons, last_chord.button_names
             )
             self.multi_button_last_double_click_time = (
                 self.multi_button_pressed_time_start
             )
+        return chord
 
-    def on_multi_button_up(self):
-        """Has to be called when the multi button up event was triggerd."""
-        self.is_multi_buttons_pressed = False
+    def on_multi_button_up(self, chord: "Chord"):
+        """Has to be called when all buttons of a multi button event were released."""
+        self.active_chords.remove(chord)
         self.multi_button_pressed_time_end = time.time()
+        if chord.hold_call is not None:
+            chord.hold_call.cancel()
+        self.multi_button_events.cancel_repeats(chord.button_names)
 
         self.multi_button_events.call_event_listeners(
-            "up", self.multi_button_event_buttons
+            "up", chord.buttons, chord.button_names
         )
-        self.last_multi_button_event_buttons = self.multi_button_event_buttons
+        if self.last_chord is not None:
+            self.free_chords.append(self.last_chord)
+        self.last_chord = chord
 
-        press_duration = (
-            self.multi_button_pressed_time_end - self.multi_button_pressed_time_start
-        )
+        press_duration = self.multi_button_pressed_time_end - chord.pressed_time_start
 
         if (
             press_duration
             > self.config.settings.controller_settings.single_click_duration
         ):
             self.multi_button_events.call_event_listeners(
-                "long_press", self.multi_button_event_buttons
+                "long_press", chord.buttons, chord.button_names
             )
         else:
             self.multi_button_events.call_event_listeners(
-                "click", self.multi_button_event_buttons
+                "click", chord.buttons, chord.button_names
             )
             self.multi_button_last_click_time = self.multi_button_pressed_time_end
-        self.multi_button_event_buttons = []
 
     def handle_multi_button_down(self, button: Button):
         """Has to be called when a button is pressed down."""
-        if self.is_multi_buttons_pressed:
-            return
+        if not self.multi_button_event_buttons:
+            self.multi_button_event_start_time = time.monotonic()
+        if self.active_chords:
+            overlap_policy = (
+                self.config.settings.controller_settings.chord_overlap_policy
+            )
+            if overlap_policy == "wait_for_release":
+                return
+            if overlap_policy == "shared" and not self.multi_button_event_buttons:
+                # Buttons of previous multi button events which are still held are part of the new one
+                for chord in self.active_chords:
+                    for chord_button in chord.buttons:
+                        if (
+                            chord_button.pressed
+                            and chord_button not in self.multi_button_event_buttons
+                        ):
+                            self.multi_button_event_buttons.append(chord_button)
         self.multi_button_event_buttons.append(button)
         if self.multi_button_event_timer is not None:
             self.multi_button_event_timer.cancel()
-        self.multi_button_event_timer = threading.Timer(
+            self.multi_button_event_timer = None
+        if (
+            self.config.settings.controller_settings.instant_chords
+            and self.get_chord_analysis().is_instant(
+                sum(button.bit for button in self.multi_button_event_buttons)
+            )
+        ):
+            # No registered chord contains the held buttons, waiting can not change the result
+            self.on_multi_button_down()
+            return
+        self.multi_button_event_timer = self.scheduler.call_later(
             self.config.settings.controller_settings.multi_click_duration,
             self.on_multi_button_down,
         )
-        self.multi_button_event_timer.start()
 
     def handle_multi_button_up(self, button: Button):
         """Has to be called when a button is released."""
-        if any(button.pressed for button in self.multi_button_event_buttons):
+        self.multi_button_events.cancel_repeats([button.name])
+        pressed_mask = self.state.pressed_mask
+        for chord in list(self.active_chords):
+            if chord.mask & button.bit and not chord.mask & pressed_mask:
+                self.on_multi_button_up(chord)
+        if button not in self.multi_button_event_buttons:
             return
-        if self.is_multi_buttons_pressed:
-            self.on_multi_button_up()
-        else:
-            # timer has not run out yet, call multi button down events and cancel the timer
-            if self.multi_button_event_timer is not None:
-                self.multi_button_event_timer.cancel()
-                self.multi_button_event_timer = None
-            self.on_multi_button_down()
-            self.on_multi_button_up()
+        pending_mask = 0
+        for pending_button in self.multi_button_event_buttons:
+            pending_mask |= pending_button.bit
+        if pending_mask & pressed_mask:
+            return
+        # timer has not run out yet, call multi button down events and cancel the timer
+        if self.multi_button_event_timer is not None:
+            self.multi_button_event_timer.cancel()
+            self.multi_button_event_timer = None
+        chord = self.on_multi_button_down()
+        self.on_multi_button_up(chord)
 
     def handle_joy_disconnect(self):
-        print("Controller disconnected")
+        log.info("controller", "Controller disconnected")
         self.pygame_controller = None
 
     def handle_joy_connect(self):
         if not self.pygame_controller:
             self.pygame_controller = self.get_connected_controller()
             if self.pygame_controller:
-                print(f"controller connected: {self.pygame_controller.get_name()}")
+                log.info(
+                    "controller",
+                    "Controller connected",
+                    name=self.pygame_controller.get_name(),
+                )
+
+    def handle_joy_axis_motion(self, event: "pygame.event.Event"):
+        assert event.type == pygame.JOYAXISMOTION
+        self._handle_axis(event.axis, event.value)
 
-    def handle_joy_axis_motion(self, event: pygame.event.Event):
-        assert event.type == JOYAXISMOTION
-        axis: int = event.axis
-        value: float = event.value
+    def handle_joy_button_down(self, event: "pygame.event.Event"):
+        assert event.type == pygame.JOYBUTTONDOWN
+        self._handle_button(event.button, True)
+
+    def handle_joy_button_up(self, event: "pygame.event.Event"):
+        assert event.type == pygame.JOYBUTTONUP
+        self._handle_button(event.button, False)
+
+    def handle_joy_hat_motion(self, event: "pygame.event.Event"):
+        assert event.type == pygame.JOYHATMOTION
+        self._handle_hat(*event.value)
+
+    def _handle_axis(self, axis: int, value: float):
+        """Handle a new value of a raw axis. Does not depend on pygame, see ControllerProcess."""
         for stick in self.sticks.values():
             if axis == stick.axis_x_index:
                 stick._move_x(value)
             elif axis == stick.axis_y_index:
                 stick._move_y(value)
 
-    def handle_joy_button_down(self, event: pygame.event.Event):
-        assert event.type == JOYBUTTONDOWN
-        button_index: int = event.button
-        for button in self.buttons.values():
-            if button.index == button_index:
-                button._down()
-                if button in self.get_buttons_allowed_for_multi_button_event():
-                    self.handle_multi_button_down(button)
-
-    def handle_joy_button_up(self, event: pygame.event.Event):
-        assert event.type == JOYBUTTONUP
-        button_index: int = event.button
+    def _handle_button(self, button_index: int, pressed: bool):
+        """Handle a raw button being pressed or released. Does not depend on pygame, see ControllerProcess."""
         for button in self.buttons.values():
             if button.index == button_index:
-                button._up()
-                if button in self.get_buttons_allowed_for_multi_button_event():
-                    self.handle_multi_button_up(button)
+                if pressed:
+                    button._down()
+                    if button.bit & self.get_multi_button_mask():
+                        self.handle_multi_button_down(button)
+                else:
+                    button._up()
+                    if button.bit & self.get_multi_button_mask():
+                        self.handle_multi_button_up(button)
 
-    def handle_joy_hat_motion(self, event: pygame.event.Event):
-        assert event.type == JOYHATMOTION
-        value: tuple[int, int] = event.value
+    def _handle_hat(self, x: int, y: int):
+        """Handle a new position of the dpad hat. Does not depend on pygame, see ControllerProcess."""
+        value = (x, y)
         for button in self.buttons.values():
             if button.index == "dpad+x" and value[0] == 1 and not button.pressed:
                 button._down()
@@ -402,40 +907,106 @@ class Controller:
             if button.index == "dpad-y" and value[1] == 0 and button.pressed:
                 button._up()
 
-    def run(self) -> None:
-        # Initialize the controller
-        pygame.joystick.init()
-        self.handle_joy_connect()
+    @staticmethod
+    def init_pygame() -> int:
+        """
+        Import and initialize pygame. Can be called ahead of run from another thread to speed up the startup.
+        If run is called from another thread than the main thread, init_pygame has to be called on the main thread first.
+        Returns the number of connected joysticks.
+        """
+        return load_pygame().joystick.get_count()
+
+    def handle_events(self, events: list["pygame.event.Event"]):
+        """
+        Handle a batch of queued pygame events.
+        Button, hat and device events are handled first, in the order they were queued. Axis events are
+        handled afterwards and collapsed to the latest value of each axis, so a backlog of stale stick
+        motion can not delay a button press.
+        """
+        perf_counters.controller_events += len(events)
+        latest_axis_events: dict[int, "pygame.event.Event"] = {}
+        for event in events:
+            if event.type == pygame.JOYAXISMOTION:
+                if event.axis in latest_axis_events:
+                    perf_counters.collapsed_axis_events += 1
+                latest_axis_events[event.axis] = event
+            elif event.type == pygame.JOYBUTTONDOWN:
+                self.handle_joy_button_down(event)
+            elif event.type == pygame.JOYBUTTONUP:
+                self.handle_joy_button_up(event)
+            elif event.type == pygame.JOYHATMOTION:
+                self.handle_joy_hat_motion(event)
+            elif event.type == pygame.JOYDEVICEREMOVED:
+                self.handle_joy_disconnect()
+            elif event.type == pygame.JOYDEVICEADDED:
+                self.handle_joy_connect()
+            elif event.type == pygame.QUIT:
+                self.running = False
+        for event in latest_axis_events.values():
+            self.handle_joy_axis_motion(event)
+
+    def is_connected(self) -> bool:
+        if self.controller_process is not None:
+            return self.controller_process.is_connected()
+        return self.pygame_controller is not None
+
+    def run(self, controller_process: "ControllerProcess | None" = None) -> None:
+        """
+        Poll the controller and run the event listeners until running is set to False.
+        With a controller_process, pygame is polled in a child process instead of this thread, see controller_process.py.
+        """
+        self.controller_process = controller_process
+        if controller_process is not None:
+            controller_process.start()
+        else:
+            # Initialize the controller
+            self.init_pygame()
+            if not pygame.display.get_init():
+                log.warning(
+                    "controller",
+                    "Controller.init_pygame was not called on the main thread, initializing the display on the controller thread",
+                )
+                pygame.display.init()
+            self.handle_joy_connect()
 
         self.last_joy_connection_check = time.time()
         self.running = True
-        while self.running:
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    self.running = False
-                elif event.type == JOYAXISMOTION:
-                    self.handle_joy_axis_motion(event)
-                elif event.type == JOYBUTTONDOWN:
-                    self.handle_joy_button_down(event)
-                elif event.type == JOYBUTTONUP:
-                    self.handle_joy_button_up(event)
-                elif event.type == JOYHATMOTION:
-                    self.handle_joy_hat_motion(event)
-                elif event.type == JOYDEVICEREMOVED:
-                    self.handle_joy_disconnect()
-                elif event.type == JOYDEVICEADDED:
+        try:
+            while self.running:
+                while self.pending_calls:
+                    try:
+                        self.pending_calls.popleft()()
+                    except Exception as e:
+                        # A failing call must not stop the input handling
+                        log.error(
+                            "controller",
+                            "Pending call failed",
+                            error=repr(e),
+                            traceback=traceback.format_exc().strip(),
+                        )
+                self.scheduler.run_due()
+                if controller_process is not None:
+                    controller_process.handle_records(self)
+                    self.flush_event_batches()
+                    time.sleep(0)
+                    continue
+                self.handle_events(pygame.event.get())
+                self.flush_event_batches()
+                if (
+                    not self.pygame_controller
+                    and time.time() - self.last_joy_connection_check > 1
+                ):
                     self.handle_joy_connect()
-            if (
-                not self.pygame_controller
-                and time.time() - self.last_joy_connection_check > 1
-            ):
-                self.handle_joy_connect()
-                continue
-            time.sleep(0)
-        # Quit Pygame
-        pygame.quit()
+                    continue
+                time.sleep(0)
+        finally:
+            if controller_process is not None:
+                controller_process.stop()
+            else:
+                # Quit Pygame
+                pygame.quit()
 
-    def get_connected_controller(self) -> pygame.joystick.JoystickType | None:
+    def get_connected_controller(self) -> "pygame.joystick.JoystickType | None":
         # Check for controller
         if pygame.joystick.get_count() == 0:
             return None
@@ -458,6 +1029,8 @@ if __name__ == "__main__":
             "long_press",
             "double_click",
             "tripple_click",
+            "hold",
+            "hold_repeat",
         ]:
             button.add_event_listener(
                 event_type,
@@ -476,6 +1049,8 @@ if __name__ == "__main__":
         "long_press",
         "double_click",
         "tripple_click",
+        "hold",
+        "hold_repeat",
     ]:
         controller.multi_button_events.add_event_listener(
             event_type,
@@ -1,110 +1,53 @@
+import threading
+import time
+import uuid
+from typing import Literal, NamedTuple
 from PySide6.QtWidgets import QWidget
-from PySide6.QtGui import QPainter, QPolygonF
-from PySide6.QtCore import Qt, QPointF
-from PySide6.QtGui import QMouseEvent, QPaintEvent, QImage
-from controller import Controller, ControllerButtonName
-
+from PySide6.QtGui import QPainter, QPolygonF, QPixmap
+from PySide6.QtCore import Qt, QPointF, QRect, QTimer, Signal
+from PySide6.QtGui import QImage, QMouseEvent, QPaintEvent, QRegion
+from controller import Controller, ControllerSnapshot, Stick
+from config_types import BUTTON_NAMES, STICK_NAMES, ControllerButtonName
+from perf_counters import PerfSampler
 
 button_pressed_color = Qt.GlobalColor.gray
 button_default_color = Qt.GlobalColor.white
 button_highlight_color = Qt.GlobalColor.yellow
 
+joystick_scale_factor = 10
+"""Pixels a joystick is drawn away from its resting position when the stick is pushed to the edge"""
 
-class ButtonWidget(QWidget):
-    pressed = False
-    highlighted = False
-    name: ControllerButtonName
-
-    def set_color(self, color):
-        self.color = color
-        self.update()
-
-    def set_pressed(self, pressed):
-        self.pressed = pressed
-        self.update()
-
-    def set_highlighted(self, highlighted):
-        self.highlighted = highlighted
-        self.update()
+hud_background_color = Qt.GlobalColor.black
+hud_text_color = Qt.GlobalColor.green
+hud_height = 54
+hud_update_interval = 500
+"""Milliseconds between two samples shown in the performance HUD"""
 
-    def get_button_painter(self):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        if self.pressed:
-            color = button_pressed_color
-        elif self.highlighted:
-            color = button_highlight_color
-        else:
-            color = button_default_color
-        painter.setBrush(color)
-        painter.setPen(color)
-        return painter
-
-
-class JoystickWidget(ButtonWidget):
-    def __init__(self, position, diameter, name: ControllerButtonName, parent=None):
-        super().__init__(parent)
-        self.position = position
-        self.diameter = diameter
-        self.name = name
-        self.color = button_default_color
-        self.setGeometry(position[0], position[1], diameter, diameter)
-
-    def move_to(self, x, y):
-        """
-        Move the joystick relative to its original position to the given x, y coordinates
-        """
-        scale_factor = 10
-        self.move(
-            self.position[0] + x * scale_factor, self.position[1] + y * scale_factor
-        )
 
-    def paintEvent(self, event: QPaintEvent):
-        painter = self.get_button_painter()
-        painter.drawEllipse(0, 0, self.diameter, self.diameter)
+class ButtonShape(NamedTuple):
+    """Geometry of a button drawn by the overlay."""
 
-
-class FaceButtonWidget(ButtonWidget):
-    def __init__(self, position, diameter, name: ControllerButtonName, parent=None):
-        super().__init__(parent)
-        self.position = position
-        self.diameter = diameter
-        self.name = name
-        self.setGeometry(position[0], position[1], diameter, diameter)
-
-    def paintEvent(self, event: QPaintEvent):
-        painter = self.get_button_painter()
-        painter.drawEllipse(0, 0, self.diameter, self.diameter)
-
-
-class DpadButtonWidget(ButtonWidget):
-    def __init__(self, position, size, name: ControllerButtonName, parent=None):
-        super().__init__(parent)
-        self.position = position
-        self.size = size
-        self.name = name
-        self.setGeometry(position[0], position[1], size, size)
-
-    def paintEvent(self, event: QPaintEvent):
-        painter = self.get_button_painter()
-        painter.drawRect(0, 0, self.size, self.size)
+    name: ControllerButtonName
+    kind: Literal["ellipse", "rect", "polygon"]
+    rect: QRect
+    """Bounding rectangle of the button at its resting position"""
+    outline: QPolygonF | None = None
+    """Outline of polygon buttons"""
 
 
-class ShoulderButtonWidget(ButtonWidget):
-    def __init__(self, outline, name: ControllerButtonName, parent=None):
-        super().__init__(parent)
-        self.outline = outline
-        max_x = max(x for x, y in outline)
-        self.name = name
-        max_y = max(y for x, y in outline)
-        self.setGeometry(0, 0, max_x, max_y)
+class ControllerOverlay(QWidget):
+    """
+    Draws the controller image with the state of its buttons and joysticks.
+    The whole overlay is a single widget. The background is decoded once and only the rectangles of buttons
+    whose state changed are repainted.
 
-    def paintEvent(self, event: QPaintEvent):
-        painter = self.get_button_painter()
-        painter.drawPolygon(QPolygonF([QPointF(*point) for point in self.outline]))
+    State changes may come from any thread. They only record the changed state and its dirty area,
+    the overlay then repaints at most max_fps times per second with the latest state and stays idle while nothing changes.
+    """
 
+    frame_requested = Signal()
+    """Emitted when the state changes while no frame is scheduled, wakes the frame timer on the GUI thread"""
 
-class ControllerOverlay(QWidget):
     controller_size = (330, 220)
     controller_image = "Controller.png"
 
@@ -129,7 +72,7 @@ class ControllerOverlay(QWidget):
         (330 - x, y) for x, y in button_shoulder_bottom_left_outline
     ]
 
-    def __init__(self):
+    def __init__(self, max_fps: float = 60):
         super().__init__()
         self.setWindowFlags(
             Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint
@@ -138,30 +81,114 @@ class ControllerOverlay(QWidget):
         self.resize(*self.controller_size)
         self.old_pos = None
 
-        # fmt: off
-        self.buttons: dict[ControllerButtonName, ButtonWidget] = {
-            "face_up":     FaceButtonWidget(self.button_face_up_position, self.button_diameter, "face_up", self),
-            "face_right":  FaceButtonWidget(self.button_face_right_position, self.button_diameter, "face_right", self),
-            "face_down":   FaceButtonWidget(self.button_face_down_position, self.button_diameter, "face_down", self),
-            "face_left":   FaceButtonWidget(self.button_face_left_position, self.button_diameter, "face_left", self),
-
-            "dpad_up":     DpadButtonWidget((self.dpad_position[0] + self.dpad_arrow_diameter, self.dpad_position[1]), self.dpad_arrow_diameter, "dpad_up", self),
-            "dpad_right":  DpadButtonWidget((self.dpad_position[0] + 2 * self.dpad_arrow_diameter, self.dpad_position[1] + self.dpad_arrow_diameter), self.dpad_arrow_diameter, "dpad_right", self),
-            "dpad_down":   DpadButtonWidget((self.dpad_position[0] + self.dpad_arrow_diameter, self.dpad_position[1] + 2 * self.dpad_arrow_diameter), self.dpad_arrow_diameter, "dpad_down", self),
-            "dpad_left":   DpadButtonWidget((self.dpad_position[0], self.dpad_position[1] + self.dpad_arrow_diameter), self.dpad_arrow_diameter, "dpad_left", self),
-
-            "shoulder_l":  ShoulderButtonWidget(self.button_shoulder_left_outline, "shoulder_l", self),
-            "shoulder_r":  ShoulderButtonWidget(self.button_shoulder_right_outline, "shoulder_r", self),
-            "shoulder_zl": ShoulderButtonWidget(self.button_shoulder_bottom_left_outline, "shoulder_zl", self),
-            "shoulder_zr": ShoulderButtonWidget(self.button_shoulder_bottom_right_outline, "shoulder_zr", self),
-
-            "stick_left":  JoystickWidget(self.joystick_left_position, self.joystick_diameter, "stick_left", self),
-            "stick_right": JoystickWidget(self.joystick_right_position, self.joystick_diameter, "stick_right", self),
+        self.background = QPixmap(self.controller_image)
+        """Controller image, decoded once"""
+        self.shapes = self.get_button_shapes()
+        """Buttons in the order they are drawn"""
+        self.shapes_by_name = {shape.name: shape for shape in self.shapes}
+
+        # State
+        self.pressed_buttons: set[ControllerButtonName] = set()
+        self.highlighted_buttons: set[ControllerButtonName] = set()
+        self.joystick_offsets: dict[ControllerButtonName, tuple[float, float]] = {
+            shape.name: (0, 0)
+            for shape in self.shapes
+            if shape.name.startswith("stick")
+        }
+        """Offset of each joystick from its resting position in pixels"""
+        self.painted_joystick_rects = {
+            joystick_name: self.get_shape_rect(self.shapes_by_name[joystick_name])
+            for joystick_name in self.joystick_offsets
         }
-        self.joystick_left: JoystickWidget = self.buttons["stick_left"]
-        self.joystick_right: JoystickWidget = self.buttons["stick_right"]
+        """Area of each joystick in the last frame"""
+        self.joystick_batch_listeners: list[tuple[Stick, uuid.UUID]] = []
+        """Batch listeners of the joysticks, kept by remove_all_event_listeners and replaced when the listeners are initialized again"""
+
+        # Frame scheduling
+        self.frame_interval = 1 / max_fps
+        """Minimum time in seconds between two frames"""
+        self.dirty_lock = threading.Lock()
+        self.dirty_region = QRegion()
+        """Areas changed since the last frame, kept apart so distant changes do not repaint the space between them"""
+        self.is_frame_requested = False
+        self.last_frame_time = 0.0
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.frame_timer.timeout.connect(self.render_frame)
+        self.frame_requested.connect(self.schedule_frame)
+
+        # Performance HUD, see enable_hud
+        self.hud_sampler: PerfSampler | None = None
+        self.hud_lines: list[str] = []
+        self.hud_rect = QRect(
+            0, self.controller_size[1], self.controller_size[0], hud_height
+        )
+        self.hud_timer = QTimer(self)
+        self.hud_timer.timeout.connect(self.update_hud)
+
+    def set_max_fps(self, max_fps: float):
+        self.frame_interval = 1 / max_fps
+
+    def enable_hud(self, controller: Controller | None = None):
+        """Show the rates of the input pipeline below the controller, updated every hud_update_interval milliseconds."""
+        if self.hud_sampler is not None:
+            return
+        self.hud_sampler = PerfSampler(controller)
+        self.resize(self.controller_size[0], self.controller_size[1] + hud_height)
+        self.hud_timer.start(hud_update_interval)
+        self.update_hud()
+
+    def update_hud(self):
+        self.hud_lines = self.hud_sampler.get_report_lines(self.hud_sampler.sample())
+        self.mark_dirty(self.hud_rect)
+
+    def get_button_shapes(self) -> list[ButtonShape]:
+        def circle(name, position, diameter):
+            return ButtonShape(name, "ellipse", QRect(*position, diameter, diameter))
+
+        def square(name, position, size):
+            return ButtonShape(name, "rect", QRect(*position, size, size))
+
+        def polygon(name, outline):
+            polygon = QPolygonF([QPointF(*point) for point in outline])
+            return ButtonShape(
+                name, "polygon", polygon.boundingRect().toAlignedRect(), polygon
+            )
+
+        dpad_x, dpad_y = self.dpad_position
+        arrow = self.dpad_arrow_diameter
+        # fmt: off
+        return [
+            circle("face_up",    self.button_face_up_position, self.button_diameter),
+            circle("face_right", self.button_face_right_position, self.button_diameter),
+            circle("face_down",  self.button_face_down_position, self.button_diameter),
+            circle("face_left",  self.button_face_left_position, self.button_diameter),
+
+            square("dpad_up",    (dpad_x + arrow, dpad_y), arrow),
+            square("dpad_right", (dpad_x + 2 * arrow, dpad_y + arrow), arrow),
+            square("dpad_down",  (dpad_x + arrow, dpad_y + 2 * arrow), arrow),
+            square("dpad_left",  (dpad_x, dpad_y + arrow), arrow),
+
+            polygon("shoulder_l",  self.button_shoulder_left_outline),
+            polygon("shoulder_r",  self.button_shoulder_right_outline),
+            polygon("shoulder_zl", self.button_shoulder_bottom_left_outline),
+            polygon("shoulder_zr", self.button_shoulder_bottom_right_outline),
+
+            circle("stick_left",  self.joystick_left_position, self.joystick_diameter),
+            circle("stick_right", self.joystick_right_position, self.joystick_diameter),
+        ]
         # fmt: on
 
+    def get_shape_rect(self, shape: ButtonShape) -> QRect:
+        """Return the rectangle a button currently covers, including the joystick offset and antialiasing."""
+        rect = shape.rect.adjusted(-1, -1, 1, 1)
+        offset = self.joystick_offsets.get(shape.name, None)
+        if offset is not None:
+            rect.translate(int(offset[0]), int(offset[1]))
+            rect.adjust(-1, -1, 1, 1)
+        return rect
+
     def mousePressEvent(self, event: QMouseEvent):
         if event.button() == Qt.MouseButton.LeftButton:
             self.old_pos = event.globalPosition().toPoint()
@@ -177,41 +204,179 @@ class ControllerOverlay(QWidget):
             self.old_pos = None
 
     def paintEvent(self, event: QPaintEvent):
+        dirty_region = event.region()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.drawImage(0, 0, QImage(self.controller_image))
+        for dirty_rect in dirty_region:
+            painter.drawPixmap(dirty_rect, self.background, dirty_rect)
+        for shape in self.shapes:
+            if not dirty_region.intersects(self.get_shape_rect(shape)):
+                continue
+            if shape.name in self.pressed_buttons:
+                color = button_pressed_color
+            elif shape.name in self.highlighted_buttons:
+                color = button_highlight_color
+            else:
+                color = button_default_color
+            painter.setBrush(color)
+            painter.setPen(color)
+            if shape.kind == "polygon":
+                painter.drawPolygon(shape.outline)
+            elif shape.kind == "rect":
+                painter.drawRect(shape.rect)
+            else:
+                offset_x, offset_y = self.joystick_offsets.get(shape.name, (0, 0))
+                painter.drawEllipse(shape.rect.translated(int(offset_x), int(offset_y)))
+        if self.hud_lines and dirty_region.intersects(self.hud_rect):
+            painter.fillRect(self.hud_rect, hud_background_color)
+            painter.setPen(hud_text_color)
+            painter.drawText(
+                self.hud_rect.adjusted(6, 4, -6, -4),
+                Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                "\n".join(self.hud_lines),
+            )
+
+    def mark_dirty(self, rect: QRect):
+        """Repaint the area with the next frame. Can be called from any thread."""
+        with self.dirty_lock:
+            self.dirty_region = self.dirty_region.united(rect)
+            if self.is_frame_requested:
+                return
+            self.is_frame_requested = True
+        self.frame_requested.emit()
+
+    def schedule_frame(self):
+        """Start the frame timer so the next frame is not rendered before frame_interval passed since the last one."""
+        if self.frame_timer.isActive():
+            return
+        delay = self.last_frame_time + self.frame_interval - time.monotonic()
+        self.frame_timer.start(max(0, round(delay * 1000)))
+
+    def take_dirty_region(self) -> QRegion:
+        """Return and reset the areas changed since the last frame, including the last painted and the current area of moved joysticks."""
+        with self.dirty_lock:
+            dirty_region = self.dirty_region
+            self.dirty_region = QRegion()
+            self.is_frame_requested = False
+        for joystick_name, painted_rect in self.painted_joystick_rects.items():
+            joystick_rect = self.get_shape_rect(self.shapes_by_name[joystick_name])
+            if joystick_rect != painted_rect:
+                dirty_region = dirty_region.united(painted_rect.united(joystick_rect))
+                self.painted_joystick_rects[joystick_name] = joystick_rect
+        return dirty_region
+
+    def render_frame(self):
+        self.last_frame_time = time.monotonic()
+        dirty_region = self.take_dirty_region()
+        if not dirty_region.isEmpty():
+            self.update(dirty_region)
+
+    def render_to_image(
+        self, image: QImage | None = None, region: QRegion | None = None
+    ) -> QImage:
+        """
+        Render the overlay into an image without showing it, e.g. with QT_QPA_PLATFORM=offscreen.
+        If an image from a previous call is passed, only the given region is repainted.
+        """
+        if image is None:
+            image = QImage(self.size(), QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(Qt.GlobalColor.transparent)
+            region = None
+        if region is None:
+            region = QRegion(self.rect())
+        else:
+            # The overlay is translucent, like the window it is cleared before repainting
+            painter = QPainter(image)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Clear)
+            for rect in region:
+                painter.fillRect(rect, Qt.GlobalColor.transparent)
+            painter.end()
+        bounding_rect = region.boundingRect()
+        self.render(
+            image,
+            bounding_rect.topLeft(),
+            region,
+            QWidget.RenderFlag.DrawChildren,
+        )
+        return image
+
+    def update_button(self, button_name: ControllerButtonName):
+        """Repaint the area of a button with the next frame."""
+        shape = self.shapes_by_name.get(button_name, None)
+        if shape is not None:
+            self.mark_dirty(self.get_shape_rect(shape))
+
+    def set_pressed(self, button_name: ControllerButtonName, pressed: bool):
+        if pressed:
+            self.pressed_buttons.add(button_name)
+        else:
+            self.pressed_buttons.discard(button_name)
+        self.update_button(button_name)
+
+    def apply_snapshot(self, snapshot: ControllerSnapshot):
+        """Show the pressed buttons and stick positions of a controller snapshot."""
+        for i, button_name in enumerate(BUTTON_NAMES):
+            pressed = bool(snapshot.pressed_mask & (1 << i))
+            if pressed != (button_name in self.pressed_buttons):
+                self.set_pressed(button_name, pressed)
+        for i, stick_name in enumerate(STICK_NAMES):
+            if stick_name in self.joystick_offsets:
+                self.move_joystick(
+                    stick_name, snapshot.axes[2 * i], snapshot.axes[2 * i + 1]
+                )
+
+    def move_joystick(self, joystick_name: ControllerButtonName, x: float, y: float):
+        """Move the joystick relative to its resting position to the given x, y stick values."""
+        self.joystick_offsets[joystick_name] = (
+            x * joystick_scale_factor,
+            y * joystick_scale_factor,
+        )
+        # The area is computed from the latest offset when the frame is rendered
+        self.mark_dirty(QRect())
 
     def init_controller_event_listeners(self, controller: Controller):
-        for button_widget in self.buttons.values():
-            controller.buttons[button_widget.name].add_event_listener(
+        for shape in self.shapes:
+            button = controller.buttons.get(shape.name, None)
+            if button is None:
+                # The button is not part of the button mapping, e.g. after a reload removed it
+                continue
+            button.add_event_listener(
                 "down",
-                lambda button, button_widget=button_widget: button_widget.set_pressed(
-                    True
-                ),
+                lambda button: self.set_pressed(button.name, True),
+                f"overlay button={shape.name} event=down",
             )
-            controller.buttons[button_widget.name].add_event_listener(
+            button.add_event_listener(
                 "up",
-                lambda button, button_widget=button_widget: button_widget.set_pressed(
-                    False
-                ),
+                lambda button: self.set_pressed(button.name, False),
+                f"overlay button={shape.name} event=up",
             )
 
-        controller.sticks["stick_left"].add_event_listener(
-            "move", lambda joystick: self.joystick_left.move_to(joystick.x, joystick.y)
-        )
-        controller.sticks["stick_right"].add_event_listener(
-            "move", lambda joystick: self.joystick_right.move_to(joystick.x, joystick.y)
-        )
+        # Only the latest position of a joystick is drawn, so its moves are delivered once per poll cycle
+        for joystick, listener_id in self.joystick_batch_listeners:
+            joystick.remove_event_listener(listener_id)
+        self.joystick_batch_listeners = []
+        for joystick_name in self.joystick_offsets:
+            joystick = controller.sticks.get(joystick_name, None)
+            if joystick is None:
+                continue
+            listener_id = joystick.add_batch_listener(
+                ["move"],
+                lambda events, joystick=joystick: self.move_joystick(
+                    joystick.name, joystick.x, joystick.y
+                ),
+                coalesce=True,
+            )
+            self.joystick_batch_listeners.append((joystick, listener_id))
 
     def highlight_buttons(self, button_names: list[ControllerButtonName]):
         """
         Highlight the buttons with the given names and unhighlight
         all other buttons
         """
-        for button_widget in self.buttons.values():
-            button_widget.set_highlighted(False)
-        for button_name in button_names:
-            self.buttons[button_name].set_highlighted(True)
+        changed_buttons = self.highlighted_buttons.symmetric_difference(button_names)
+        self.highlighted_buttons = set(button_names)
+        for button_name in changed_buttons:
+            self.update_button(button_name)
 
 
 if __name__ == "__main__":
@@ -230,6 +395,7 @@ if __name__ == "__main__":
 
     window.init_controller_event_listeners(controller)
 
+    Controller.init_pygame()
     controller_thread = threading.Thread(target=controller.run)
     controller_thread.start()
 
@@ -0,0 +1,301 @@
+"""
+Polls the controller in a child process, so a busy GUI thread or the GIL of the main process can not delay input capture.
+
+The child process only runs pygame. It writes every button, axis, hat and connection transition with its
+time.monotonic() timestamp into a ring buffer in shared memory, and keeps the complete current state in a
+snapshot block next to it. The controller thread of the main process reads the ring and feeds the transitions
+into the usual Button and Stick objects, so listeners can not tell the difference. If the reader falls so far
+behind that the ring overflows, it resynchronizes from the snapshot block.
+
+Shared memory layout: HEADER, SNAPSHOT, then capacity RECORDs.
+"""
+
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING
+
+from perf_counters import perf_counters
+import log
+
+if TYPE_CHECKING:
+    from controller import Controller
+
+HEADER = struct.Struct("<QQ")
+"""number of records written, snapshot version (odd while the snapshot is written)"""
+MAX_AXES = 8
+SNAPSHOT = struct.Struct(f"<IIQbbxxxxxx{MAX_AXES}d")
+"""connected, number of axes, pressed mask of the raw button indices, hat x, hat y, raw axis values"""
+RECORD = struct.Struct("<BbbxIfd")
+"""kind, button or axis index or hat x, hat y, unused, axis value, time.monotonic() of the child"""
+DISCONNECTED_SNAPSHOT = SNAPSHOT.unpack(bytes(SNAPSHOT.size))
+"""Snapshot without a controller, no buttons pressed and all axes centered"""
+SNAPSHOT_OFFSET = HEADER.size
+RECORDS_OFFSET = SNAPSHOT_OFFSET + SNAPSHOT.size
+
+RECORD_BUTTON_DOWN = 0
+RECORD_BUTTON_UP = 1
+RECORD_AXIS = 2
+RECORD_HAT = 3
+RECORD_CONNECTED = 4
+RECORD_DISCONNECTED = 5
+
+ring_capacity = 4096
+"""Records the ring holds before unread records are overwritten"""
+poll_timeout = 10
+"""Milliseconds the child waits for a pygame event before it checks whether it should stop"""
+snapshot_timeout = 0.1
+"""Seconds to retry reading a snapshot the child is writing before it is considered dead or stuck"""
+
+
+class SharedStateWriter:
+    """Writes records and the snapshot. Used in the child process."""
+
+    def __init__(self, shared_memory_block: shared_memory.SharedMemory, capacity: int):
+        self.buffer = shared_memory_block.buf
+        self.capacity = capacity
+        self.write_count = 0
+        self.snapshot_version = 0
+        self.connected = 0
+        self.pressed_mask = 0
+        self.hat = (0, 0)
+        self.axes = [0.0] * MAX_AXES
+        self.axis_count = 0
+
+    def write(self, kind: int, index: int = 0, hat_y: int = 0, value: float = 0.0):
+        RECORD.pack_into(
+            self.buffer,
+            RECORDS_OFFSET + self.write_count % self.capacity * RECORD.size,
+            kind,
+            index,
+            hat_y,
+            0,
+            value,
+            time.monotonic(),
+        )
+        # The record is complete before the reader can see it
+        self.write_count += 1
+        HEADER.pack_into(self.buffer, 0, self.write_count, self.snapshot_version)
+
+    def write_snapshot(self):
+        self.snapshot_version += 1
+        HEADER.pack_into(self.buffer, 0, self.write_count, self.snapshot_version)
+        SNAPSHOT.pack_into(
+            self.buffer,
+            SNAPSHOT_OFFSET,
+            self.connected,
+            self.axis_count,
+            self.pressed_mask,
+            self.hat[0],
+            self.hat[1],
+            *self.axes,
+        )
+        self.snapshot_version += 1
+        HEADER.pack_into(self.buffer, 0, self.write_count, self.snapshot_version)
+
+
+def poll_controller(
+    shared_memory_name: str, capacity: int, stop_event: "multiprocessing.Event"
+):
+    """Entry point of the child process."""
+    from controller import load_pygame
+
+    pygame = load_pygame()
+    shared_memory_block = shared_memory.SharedMemory(shared_memory_name)
+    writer = SharedStateWriter(shared_memory_block, capacity)
+    joystick = None
+    last_connection_check = 0.0
+    try:
+        while not stop_event.is_set():
+            if joystick is None and time.monotonic() - last_connection_check > 1:
+                last_connection_check = time.monotonic()
+                if pygame.joystick.get_count() > 0:
+                    joystick = pygame.joystick.Joystick(0)
+                    joystick.init()
+                    log.info(
+                        "controller", "Controller connected", name=joystick.get_name()
+                    )
+                    writer.connected = 1
+                    writer.axis_count = min(joystick.get_numaxes(), MAX_AXES)
+                    writer.write(RECORD_CONNECTED)
+                    writer.write_snapshot()
+            event = pygame.event.wait(poll_timeout)
+            while event.type != pygame.NOEVENT:
+                if event.type == pygame.JOYAXISMOTION and event.axis < MAX_AXES:
+                    writer.axes[event.axis] = event.value
+                    writer.write(RECORD_AXIS, event.axis, 0, event.value)
+                elif event.type == pygame.JOYBUTTONDOWN:
+                    writer.pressed_mask |= 1 << event.button
+                    writer.write(RECORD_BUTTON_DOWN, event.button)
+                elif event.type == pygame.JOYBUTTONUP:
+                    writer.pressed_mask &= ~(1 << event.button)
+                    writer.write(RECORD_BUTTON_UP, event.button)
+                elif event.type == pygame.JOYHATMOTION:
+                    writer.hat = event.value
+                    writer.write(RECORD_HAT, event.value[0], event.value[1])
+                elif event.type == pygame.JOYDEVICEREMOVED:
+                    log.info("controller", "Controller disconnected")
+                    joystick = None
+                    writer.connected = 0
+                    writer.pressed_mask = 0
+                    writer.hat = (0, 0)
+                    writer.write(RECORD_DISCONNECTED)
+                elif event.type == pygame.JOYDEVICEADDED:
+                    last_connection_check = 0.0
+                writer.write_snapshot()
+                event = pygame.event.poll()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pygame.quit()
+        shared_memory_block.close()
+
+
+class ControllerProcess:
+    """
+    Runs the pygame poll loop in a child process and feeds its transitions into a Controller.
+    Pass it to Controller.run to use it instead of polling pygame in the controller thread.
+    """
+
+    def __init__(self, capacity: int = ring_capacity):
+        self.capacity = capacity
+        self.shared_memory_block: shared_memory.SharedMemory | None = None
+        self.process: multiprocessing.Process | None = None
+        self.stop_event = None
+        self.read_count = 0
+        """Number of records read by the controller thread"""
+
+    def start(self):
+        """Start the child process. Returns immediately, the child initializes pygame in parallel."""
+        if self.process is not None:
+            return
+        self.shared_memory_block = shared_memory.SharedMemory(
+            create=True, size=RECORDS_OFFSET + self.capacity * RECORD.size
+        )
+        self.shared_memory_block.buf[:RECORDS_OFFSET] = bytes(RECORDS_OFFSET)
+        # spawn does not inherit the pygame and Qt state of the main process
+        context = multiprocessing.get_context("spawn")
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=poll_controller,
+            args=(self.shared_memory_block.name, self.capacity, self.stop_event),
+            daemon=True,
+        )
+        self.process.start()
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.stop_event.set()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.shared_memory_block.close()
+        self.shared_memory_block.unlink()
+        self.shared_memory_block = None
+
+    def read_snapshot(self) -> tuple:
+        """
+        Return the snapshot block, retrying while the child writes it. Returns the snapshot of a disconnected
+        controller if the child does not finish writing within snapshot_timeout, e.g. because it died mid-write.
+        """
+        buffer = self.shared_memory_block.buf
+        deadline = time.monotonic() + snapshot_timeout
+        while True:
+            _, version = HEADER.unpack_from(buffer, 0)
+            if version % 2 == 0:
+                snapshot = SNAPSHOT.unpack_from(buffer, SNAPSHOT_OFFSET)
+                if HEADER.unpack_from(buffer, 0)[1] == version:
+                    return snapshot
+            if time.monotonic() > deadline:
+                log.error(
+                    "controller",
+                    "Controller process did not finish writing the snapshot",
+                    alive=self.process is not None and self.process.is_alive(),
+                )
+                return DISCONNECTED_SNAPSHOT
+            time.sleep(0)
+
+    def is_connected(self) -> bool:
+        return (
+            self.shared_memory_block is not None
+            and self.process is not None
+            and self.process.is_alive()
+            and bool(self.read_snapshot()[0])
+        )
+
+    def handle_records(self, controller: "Controller"):
+        """
+        Feed the records written since the last call into the controller. Button, hat and connection records are
+        handled in order, axis records are collapsed to the latest value of each axis like Controller.handle_events.
+        """
+        buffer = self.shared_memory_block.buf
+        write_count, _ = HEADER.unpack_from(buffer, 0)
+        if write_count == self.read_count:
+            return
+        if write_count - self.read_count > self.capacity:
+            log.warning(
+                "controller",
+                "Controller process ring overflowed",
+                lost=write_count - self.read_count - self.capacity,
+            )
+            self.read_count = write_count
+            self.resync(controller)
+            return
+        perf_counters.controller_events += write_count - self.read_count
+        latest_axis_values: dict[int, float] = {}
+        for record_index in range(self.read_count, write_count):
+            kind, index, hat_y, _, value, _ = RECORD.unpack_from(
+                buffer, RECORDS_OFFSET + record_index % self.capacity * RECORD.size
+            )
+            if kind == RECORD_AXIS:
+                if index in latest_axis_values:
+                    perf_counters.collapsed_axis_events += 1
+                latest_axis_values[index] = value
+            elif kind == RECORD_BUTTON_DOWN:
+                controller._handle_button(index, True)
+            elif kind == RECORD_BUTTON_UP:
+                controller._handle_button(index, False)
+            elif kind == RECORD_HAT:
+                controller._handle_hat(index, hat_y)
+            elif kind == RECORD_CONNECTED:
+                log.debug("controller", "Controller process reported a connection")
+            elif kind == RECORD_DISCONNECTED:
+                # Released buttons were not reported by the removed device
+                self.resync(controller)
+        self.read_count = write_count
+        for axis, value in latest_axis_values.items():
+            controller._handle_axis(axis, value)
+
+    def resync(self, controller: "Controller"):
+        """Apply the snapshot block to the controller, releasing and pressing buttons as needed."""
+        _, axis_count, pressed_mask, hat_x, hat_y, *axes = self.read_snapshot()
+        for button in list(controller.buttons.values()):
+            if isinstance(button.index, int):
+                pressed = bool(pressed_mask >> button.index & 1)
+                if pressed != button.pressed:
+                    controller._handle_button(button.index, pressed)
+        controller._handle_hat(hat_x, hat_y)
+        for axis in range(axis_count):
+            controller._handle_axis(axis, axes[axis])
+
+
+if __name__ == "__main__":
+    from compiled_config import load_compiled_config
+    from controller import Controller
+
+    controller = Controller(load_compiled_config())
+    for button in controller.buttons.values():
+        for event_type in ["down", "up"]:
+            button.add_event_listener(
+                event_type,
+                lambda button, event_type=event_type: print(
+                    f"Button {button} {event_type}"
+                ),
+            )
+    try:
+        controller.run(ControllerProcess())
+    except KeyboardInterrupt:
+        pass
@@ -1,8 +1,16 @@
-from pynput.keyboard import Controller as KeyboardController, Key
-from pynput.mouse import Controller as MouseController, Button
-from typing import Literal
+from typing import Literal, TYPE_CHECKING
+import json
+import os
+import platform
+import shutil
 import subprocess
 import sys
+import threading
+from app_dirs import get_cache_dir
+
+if TYPE_CHECKING:
+    # pynput is imported on first use, since it connects to the display server on import
+    from pynput.keyboard import Key
 
 # fmt: off
 KeyboardKey = Literal[
@@ -17,8 +25,10 @@ KeyboardKey = Literal[
 # fmt: on
 
 
-def string_to_pynput_compatible(key: KeyboardKey) -> Key | str:
+def string_to_pynput_compatible(key: KeyboardKey) -> "Key | str":
     """Convert a string to a pynput compatible key."""
+    from pynput.keyboard import Key
+
     if key == "space":
         return Key.space
     elif key == "enter":
@@ -75,48 +85,156 @@ SPECIAL_KEYS: list[KeyboardKey] = [
 
 MouseButtonName = Literal["left", "middle", "right"]
 
-has_xdotool = False
 
+def check_xdotool_installation() -> bool:
+    """Run xdotool to check whether it is installed. Blocks until xdotool exited."""
+    if sys.platform != "linux":
+        return False
+    try:
+        subprocess.run(
+            ["xdotool", "--version"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return True
+    except Exception:
+        return False
+
+
+class BackendProbe:
+    """
+    Checks which optional typing backends are available in a background thread.
+    The result is cached on disk per machine and only probed again if the xdotool executable changes.
+    Until the probe has finished, has_xdotool is False, so keystrokes use pynput which is always ready.
+    """
+
+    cache_file_name = "backends.json"
+
+    def __init__(self):
+        self.has_xdotool = False
+        self.thread: threading.Thread | None = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start probing in the background. Does nothing if the probe was already started."""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def get_cache_path(self) -> str:
+        return os.path.join(get_cache_dir(), self.cache_file_name)
 
-def check_xdotool_installation():
-    global has_xdotool
-    if has_xdotool:
-        return
+    def read_cache(self) -> dict:
+        try:
+            with open(self.get_cache_path(), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
-    if sys.platform == "linux":
+    def write_cache(self, cache: dict):
         try:
-            subprocess.run(["xdotool", "--version"], check=True)
-            has_xdotool = True
-        except Exception:
-            print(
-                "xdotool not found. Please install for better special character typing support by running 'sudo apt install xdotool'"
-            )
+            with open(self.get_cache_path(), "w") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+
+    def run(self):
+        if sys.platform != "linux":
+            return
+        xdotool_path = shutil.which("xdotool")
+        fingerprint = None
+        if xdotool_path is not None:
+            fingerprint = [xdotool_path, os.stat(xdotool_path).st_mtime]
+
+        cache = self.read_cache()
+        machine = cache.get(platform.node(), {})
+        if "has_xdotool" in machine and machine.get("xdotool") == fingerprint:
+            has_xdotool = machine["has_xdotool"]
+        else:
+            has_xdotool = fingerprint is not None and check_xdotool_installation()
+            cache[platform.node()] = {
+                "xdotool": fingerprint,
+                "has_xdotool": has_xdotool,
+            }
+            self.write_cache(cache)
+            # Only reported when probed, not on every start with a cached result
+            if not has_xdotool:
+                print(
+                    "xdotool not found. Please install for better special character typing support by running 'sudo apt install xdotool'"
+                )
+
+        self.has_xdotool = has_xdotool
+
+
+backend_probe = BackendProbe()
 
 
 class Keyboard:
     def __init__(self):
-        check_xdotool_installation()
-        self.keyboard = KeyboardController()
+        self._keyboard = None
+        self.pressed_backends: dict[KeyboardKey, Literal["pynput", "xdotool"]] = {}
+        """Backend each pressed key was pressed with, so it is released with the same backend"""
+
+    @property
+    def keyboard(self):
+        """The pynput keyboard controller, created on first use."""
+        if self._keyboard is None:
+            from pynput.keyboard import Controller as KeyboardController
+
+            self._keyboard = KeyboardController()
+        return self._keyboard
+
+    def prepare(self):
+        """Start detecting the available backends in the background. Called automatically on the first keystroke."""
+        backend_probe.start()
 
     def type(self, text: str):
         self.keyboard.type(text)
 
+    def get_backend(self, key: KeyboardKey) -> Literal["pynput", "xdotool"]:
+        if key in MODIFIERS or key in SPECIAL_KEYS or not backend_probe.has_xdotool:
+            return "pynput"
+        return "xdotool"
+
     def press(self, key: KeyboardKey):
-        if key in MODIFIERS or key in SPECIAL_KEYS or not has_xdotool:
+        if backend_probe.thread is None:
+            self.prepare()
+        # The probe may finish while the key is held, so the backend is fixed on press
+        backend = self.get_backend(key)
+        self.pressed_backends[key] = backend
+        if backend == "pynput":
             self.keyboard.press(string_to_pynput_compatible(key))
         else:
             subprocess.run(["xdotool", "type", key])
 
     def release(self, key: KeyboardKey):
-        if key in MODIFIERS or key in SPECIAL_KEYS or not has_xdotool:
+        backend = self.pressed_backends.pop(key, None)
+        if backend is None:
+            backend = self.get_backend(key)
+        # xdotool type already released the key
+        if backend == "pynput":
             self.keyboard.release(string_to_pynput_compatible(key))
 
 
 class Mouse:
     def __init__(self):
-        self.mouse = MouseController()
+        self._mouse = None
+
+    @property
+    def mouse(self):
+        """The pynput mouse controller, created on first use."""
+        if self._mouse is None:
+            from pynput.mouse import Controller as MouseController
+
+            self._mouse = MouseController()
+        return self._mouse
 
     def press(self, button: MouseButtonName):
+        from pynput.mouse import Button
+
         if button == "left":
             button = Button.left
         elif button == "middle":
@@ -126,6 +244,8 @@ class Mouse:
         self.mouse.press(button)
 
     def release(self, button: MouseButtonName):
+        from pynput.mouse import Button
+
         if button == "left":
             button = Button.left
         elif button == "middle":
@@ -0,0 +1,326 @@
+"""
+Output backend that injects keyboard and mouse input through a virtual uinput device on Linux.
+
+Works on X11 and Wayland alike, since the events are injected at kernel level.
+"""
+
+import fcntl
+import os
+import stat
+import struct
+from costick_input import KeyboardKey, MouseButtonName
+import log
+
+DEFAULT_DEVICE_PATH = "/dev/uinput"
+
+# Event types and codes from linux/input-event-codes.h
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_REL = 0x02
+SYN_REPORT = 0
+REL_X = 0x00
+REL_Y = 0x01
+REL_HWHEEL = 0x06
+REL_WHEEL = 0x08
+REL_WHEEL_HI_RES = 0x0B
+REL_HWHEEL_HI_RES = 0x0C
+BTN_LEFT = 0x110
+BTN_RIGHT = 0x111
+BTN_MIDDLE = 0x112
+
+WHEEL_HI_RES_UNITS = 120
+"""Number of high resolution wheel units per wheel detent."""
+
+# ioctls from linux/uinput.h
+UI_DEV_CREATE = 0x5501
+UI_DEV_DESTROY = 0x5502
+UI_DEV_SETUP = 0x405C5503
+UI_SET_EVBIT = 0x40045564
+UI_SET_KEYBIT = 0x40045565
+UI_SET_RELBIT = 0x40045566
+BUS_VIRTUAL = 0x06
+
+INPUT_EVENT = struct.Struct("llHHi")
+"""struct input_event: timeval (seconds, microseconds), type, code, value."""
+UINPUT_SETUP = struct.Struct("HHHH80sI")
+"""struct uinput_setup: input_id (bustype, vendor, product, version), name, ff_effects_max."""
+
+KEY_LEFTSHIFT = 42
+
+# fmt: off
+KEY_CODES: dict[str, int] = {
+    "esc": 1, "1": 2, "2": 3, "3": 4, "4": 5, "5": 6, "6": 7, "7": 8, "8": 9, "9": 10, "0": 11,
+    "-": 12, "=": 13, "backspace": 14, "tab": 15,
+    "q": 16, "w": 17, "e": 18, "r": 19, "t": 20, "y": 21, "u": 22, "i": 23, "o": 24, "p": 25,
+    "[": 26, "]": 27, "enter": 28, "ctrl": 29,
+    "a": 30, "s": 31, "d": 32, "f": 33, "g": 34, "h": 35, "j": 36, "k": 37, "l": 38,
+    ";": 39, "'": 40, "`": 41, "shift": KEY_LEFTSHIFT, "\\": 43,
+    "z": 44, "x": 45, "c": 46, "v": 47, "b": 48, "n": 49, "m": 50,
+    ",": 51, ".": 52, "/": 53, "alt": 56, "space": 57,
+    "pos1": 102, "up": 103, "left": 105, "right": 106, "end": 107, "down": 108, "cmd": 125,
+}
+"""Linux key codes of the keys. Characters follow the US keyboard layout."""
+SHIFTED_KEYS: dict[str, str] = {
+    "!": "1", "@": "2", "#": "3", "$": "4", "%": "5", "^": "6", "&": "7", "*": "8", "(": "9", ")": "0",
+    "_": "-", "+": "=", "{": "[", "}": "]", "|": "\\", ":": ";", '"': "'", "~": "`",
+    "<": ",", ">": ".", "?": "/",
+}
+"""Characters that are typed by holding shift and pressing the given key."""
+TEXT_KEYS: dict[str, KeyboardKey] = {" ": "space", "\n": "enter", "\t": "tab"}
+"""Characters in a text that correspond to a special key."""
+MOUSE_BUTTON_CODES: dict[MouseButtonName, int] = {
+    "left": BTN_LEFT,
+    "middle": BTN_MIDDLE,
+    "right": BTN_RIGHT,
+}
+# fmt: on
+
+
+def key_to_codes(key: str) -> tuple[int, bool] | None:
+    """
+    Convert a key or character to its key code and whether shift has to be held.
+    Returns None if the key can not be typed with the US keyboard layout.
+    """
+    key = TEXT_KEYS.get(key, key)
+    if key in KEY_CODES:
+        return KEY_CODES[key], False
+    if key in SHIFTED_KEYS:
+        return KEY_CODES[SHIFTED_KEYS[key]], True
+    if len(key) == 1 and key.lower() != key and key.lower() in KEY_CODES:
+        return KEY_CODES[key.lower()], True
+    return None
+
+
+class UinputDevice:
+    """
+    A virtual keyboard and mouse device.
+    Events are queued with emit and written in one batch followed by a single SYN_REPORT on flush.
+
+    If the device path is not a character device (e.g. a FIFO or a regular file used as a stand-in),
+    the uinput setup is skipped and the raw input_event structs are written to it.
+    """
+
+    def __init__(self, path: str = DEFAULT_DEVICE_PATH, name: str = "CoStick"):
+        self.path = path
+        self.name = name
+        self.fd = os.open(path, os.O_WRONLY)
+        self.is_uinput = stat.S_ISCHR(os.fstat(self.fd).st_mode)
+        self.pending = bytearray()
+        """Events that are written on the next flush"""
+        if self.is_uinput:
+            self.setup()
+
+    def setup(self):
+        """Register the supported events and create the virtual device."""
+        fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_KEY)
+        fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_REL)
+        for code in sorted(set(KEY_CODES.values()) | set(MOUSE_BUTTON_CODES.values())):
+            fcntl.ioctl(self.fd, UI_SET_KEYBIT, code)
+        for code in [
+            REL_X,
+            REL_Y,
+            REL_WHEEL,
+            REL_HWHEEL,
+            REL_WHEEL_HI_RES,
+            REL_HWHEEL_HI_RES,
+        ]:
+            fcntl.ioctl(self.fd, UI_SET_RELBIT, code)
+        fcntl.ioctl(
+            self.fd,
+            UI_DEV_SETUP,
+            UINPUT_SETUP.pack(BUS_VIRTUAL, 0, 0, 1, self.name.encode(), 0),
+        )
+        fcntl.ioctl(self.fd, UI_DEV_CREATE)
+
+    def emit(self, event_type: int, code: int, value: int):
+        """Queue an event. The kernel fills in the timestamp."""
+        self.pending += INPUT_EVENT.pack(0, 0, event_type, code, value)
+
+    def flush(self):
+        """Write all queued events followed by a single SYN_REPORT."""
+        if not self.pending:
+            return
+        self.emit(EV_SYN, SYN_REPORT, 0)
+        os.write(self.fd, self.pending)
+        self.pending.clear()
+
+    def close(self):
+        if self.fd < 0:
+            return
+        if self.is_uinput:
+            fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+        os.close(self.fd)
+        self.fd = -1
+
+
+class UinputKeyboard:
+    """Same API as costick_input.Keyboard, backed by a UinputDevice."""
+
+    def __init__(self, device: UinputDevice):
+        self.device = device
+        self.unsupported_keys: set[str] = set()
+        """Keys which could not be typed, used to only warn once per key"""
+        self.held_codes: set[int] = set()
+        """Key codes currently held down through this keyboard"""
+        self.shifted_keys: set[str] = set()
+        """Held keys whose press also pressed shift, shift is released with the last of them"""
+
+    def get_codes(self, key: str) -> tuple[int, bool] | None:
+        codes = key_to_codes(key)
+        if codes is None and key not in self.unsupported_keys:
+            self.unsupported_keys.add(key)
+            log.warning("input", "Key can not be typed through uinput", key=key)
+        return codes
+
+    def prepare(self):
+        """The uinput device is ready as soon as it is created."""
+
+    def type(self, text: str):
+        for char in text:
+            codes = self.get_codes(char)
+            if codes is None:
+                continue
+            code, shift = codes
+            # A held shift is kept held
+            shift = shift and KEY_LEFTSHIFT not in self.held_codes
+            if shift:
+                self.device.emit(EV_KEY, KEY_LEFTSHIFT, 1)
+            self.device.emit(EV_KEY, code, 1)
+            self.device.flush()
+            self.device.emit(EV_KEY, code, 0)
+            if shift:
+                self.device.emit(EV_KEY, KEY_LEFTSHIFT, 0)
+            self.device.flush()
+
+    def press(self, key: KeyboardKey):
+        codes = self.get_codes(key)
+        if codes is None:
+            return
+        code, shift = codes
+        if code == KEY_LEFTSHIFT:
+            # Shift is held on purpose now, releasing a shifted key must not release it
+            self.shifted_keys.clear()
+        elif shift and KEY_LEFTSHIFT not in self.held_codes:
+            self.device.emit(EV_KEY, KEY_LEFTSHIFT, 1)
+            self.held_codes.add(KEY_LEFTSHIFT)
+            self.shifted_keys.add(key)
+        elif shift and self.shifted_keys:
+            # Shift is held for another shifted key and has to stay held for this one too
+            self.shifted_keys.add(key)
+        self.device.emit(EV_KEY, code, 1)
+        self.held_codes.add(code)
+        self.device.flush()
+
+    def release(self, key: KeyboardKey):
+        codes = self.get_codes(key)
+        if codes is None:
+            return
+        code, _ = codes
+        self.device.emit(EV_KEY, code, 0)
+        self.held_codes.discard(code)
+        if key in self.shifted_keys:
+            self.shifted_keys.discard(key)
+            if not self.shifted_keys:
+                self.device.emit(EV_KEY, KEY_LEFTSHIFT, 0)
+                self.held_codes.discard(KEY_LEFTSHIFT)
+        self.device.flush()
+
+
+class UinputMouse:
+    """Same API as costick_input.Mouse, backed by a UinputDevice."""
+
+    def __init__(self, device: UinputDevice):
+        self.device = device
+        self.hi_res_remainder_x = 0.0
+        """Wheel movement smaller than one high resolution unit, sent once it adds up to a unit"""
+        self.hi_res_remainder_y = 0.0
+        self.wheel_remainder_x = 0
+        """High resolution wheel units not yet sent as a full detent"""
+        self.wheel_remainder_y = 0
+
+    def press(self, button: MouseButtonName):
+        self.device.emit(EV_KEY, MOUSE_BUTTON_CODES[button], 1)
+        self.device.flush()
+
+    def release(self, button: MouseButtonName):
+        self.device.emit(EV_KEY, MOUSE_BUTTON_CODES[button], 0)
+        self.device.flush()
+
+    def move(self, x: int, y: int):
+        if x != 0:
+            self.device.emit(EV_REL, REL_X, x)
+        if y != 0:
+            self.device.emit(EV_REL, REL_Y, y)
+        self.device.flush()
+
+    def scroll(self, x: int, y: int):
+        self.scroll_hi_res(x, y)
+
+    def scroll_hi_res(self, x: float, y: float):
+        """
+        Scroll by fractions of a wheel detent.
+        Sends high resolution wheel events and the legacy wheel events once a full detent is reached.
+        """
+        self.hi_res_remainder_x += x * WHEEL_HI_RES_UNITS
+        self.hi_res_remainder_y += y * WHEEL_HI_RES_UNITS
+        hi_res_x = int(self.hi_res_remainder_x)
+        hi_res_y = int(self.hi_res_remainder_y)
+        self.hi_res_remainder_x -= hi_res_x
+        self.hi_res_remainder_y -= hi_res_y
+        if hi_res_x != 0:
+            self.wheel_remainder_x += hi_res_x
+            self.device.emit(EV_REL, REL_HWHEEL_HI_RES, hi_res_x)
+            detents_x = int(self.wheel_remainder_x / WHEEL_HI_RES_UNITS)
+            if detents_x != 0:
+                self.wheel_remainder_x -= detents_x * WHEEL_HI_RES_UNITS
+                self.device.emit(EV_REL, REL_HWHEEL, detents_x)
+        if hi_res_y != 0:
+            self.wheel_remainder_y += hi_res_y
+            self.device.emit(EV_REL, REL_WHEEL_HI_RES, hi_res_y)
+            detents_y = int(self.wheel_remainder_y / WHEEL_HI_RES_UNITS)
+            if detents_y != 0:
+                self.wheel_remainder_y -= detents_y * WHEEL_HI_RES_UNITS
+                self.device.emit(EV_REL, REL_WHEEL, detents_y)
+        self.device.flush()
+
+
+def create_uinput_keyboard_and_mouse(
+    path: str = DEFAULT_DEVICE_PATH,
+) -> tuple[UinputKeyboard, UinputMouse]:
+    """Create one virtual device and return a keyboard and a mouse sharing it."""
+    device = UinputDevice(path)
+    return UinputKeyboard(device), UinputMouse(device)
+
+
+def read_events(path: str) -> list[tuple[int, int, int]]:
+    """Read the (type, code, value) of the input_event structs written to a stand-in file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return [
+        (event_type, code, value)
+        for _, _, event_type, code, value in INPUT_EVENT.iter_unpack(data)
+    ]
+
+
+if __name__ == "__main__":
+    # Writes to a regular file standing in for the device node and prints the events, no uinput access needed
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events")
+        open(path, "wb").close()
+        keyboard, mouse = create_uinput_keyboard_and_mouse(path)
+        keyboard.press("shift")
+        keyboard.press("!")
+        keyboard.release("!")
+        keyboard.type("A")
+        keyboard.release("shift")
+        keyboard.press("!")
+        keyboard.press("@")
+        keyboard.release("!")
+        keyboard.release("@")
+        for _ in range(5):
+            mouse.scroll_hi_res(0, 0.25)
+        keyboard.device.close()
+        for event_type, code, value in read_events(path):
+            print(f"type={event_type} code={code} value={value}")
@@ -1,24 +1,42 @@
-from controller import Controller
+from controller import Button, Controller
 import time
-from controller_overlay import ControllerOverlay
-from config import *
-from costick_input import Keyboard, Mouse, KeyboardKey, MouseButtonName
+from typing import TYPE_CHECKING, Sequence
+from compiled_config import CompiledConfig, CompiledMode, Opcode, mask_to_button_names
+from config_types import (
+    BUTTON_EVENT_NAMES,
+    BUTTON_NAMES,
+    STICK_EVENT_NAMES,
+    STICK_NAMES,
+    ControllerButtonEventName,
+    ControllerButtonName,
+    ControllerStickEventName,
+    ControllerStickName,
+)
+from costick_input import MODIFIERS, Keyboard, Mouse, KeyboardKey, MouseButtonName
+from perf_counters import perf_counters
+import log
+
+if TYPE_CHECKING:
+    from controller_overlay import ControllerOverlay
 
 keyboard = Keyboard()
 mouse = Mouse()
 
 
 class Cursor:
-    mode: Mode
+    mode: CompiledMode
+    """The current mode including the actions inserted from the global mode"""
+    mode_name: str
 
     def __init__(
         self,
-        window: ControllerOverlay,
+        window: "ControllerOverlay | None",
         controller: Controller,
-        config: Config,
+        config: CompiledConfig,
         skip_setup=False,
     ):
         self.window = window
+        """Overlay showing the controller, None when running headless"""
         self.controller = controller
         self.config = config
         self.last_time = time.time()
@@ -28,176 +46,330 @@ class Cursor:
         self.target_distance_x = 0  # used for mouse movement
         self.target_distance_y = 0  # used for mouse movement
         self.pressed_keys: list[KeyboardKey] = []
+        self.tapped_keys: set[KeyboardKey] = set()
+        """Pressed keys which are repeated by tapping them and are therefore no longer held"""
+        self.stick_navigation: list[tuple[ControllerStickName, Opcode]] = []
+        """Continuous navigation actions of the current mode, executed every frame"""
+        self.keyboard = keyboard
+        self.mouse = mouse
+        if config is not None and config.settings.output_settings.backend == "uinput":
+            from costick_uinput import create_uinput_keyboard_and_mouse
+
+            self.keyboard, self.mouse = create_uinput_keyboard_and_mouse(
+                config.settings.output_settings.uinput_device_path
+            )
+        self.scroll_hi_res = getattr(self.mouse, "scroll_hi_res", None)
+        """Scrolls by fractions of a wheel detent if the backend supports it, otherwise None"""
+        # Indexed by Opcode
+        self.instruction_handlers = [
+            self.switch_mode_instruction,
+            self.key_down_instruction,
+            self.key_up_instruction,
+            self.key_press_instruction,
+            self.mouse_down_instruction,
+            self.mouse_up_instruction,
+            self.type_instruction,
+            self.navigation_instruction,
+            self.navigation_instruction,
+        ]
         if not skip_setup:
             self.setup()
 
-    def execute_action(self, action: ComputerAction | SwitchModeAction):
-        if action.action == "switch_mode":
-            self.toggle_mode(action.mode)
-        elif action.action == "key_down":
-            if action.key not in self.pressed_keys:
-                self.pressed_keys.append(action.key)
-                keyboard.press(action.key)
-        elif action.action == "key_up":
-            if action.key in self.pressed_keys:
-                self.pressed_keys.remove(action.key)
-                keyboard.release(action.key)
-        elif action.action == "mouse_down":
-            mouse.press(action.button)
-        elif action.action == "mouse_up":
-            mouse.release(action.button)
-        elif action.action == "type":
-            keyboard.type(action.text)
-        elif action.action == "key_press":
-            keyboard.press(action.key)
-            keyboard.release(action.key)
+    def switch_mode_instruction(self, mode_name: str):
+        self.toggle_mode(mode_name)
+
+    def key_down_instruction(self, key: KeyboardKey):
+        if key not in self.pressed_keys:
+            self.pressed_keys.append(key)
+            self.keyboard.press(key)
+
+    def key_up_instruction(self, key: KeyboardKey):
+        if key in self.pressed_keys:
+            self.pressed_keys.remove(key)
+            if key in self.tapped_keys:
+                self.tapped_keys.discard(key)
+            else:
+                self.keyboard.release(key)
+
+    def key_press_instruction(self, key: KeyboardKey):
+        self.keyboard.press(key)
+        self.keyboard.release(key)
+
+    def mouse_down_instruction(self, button: MouseButtonName):
+        self.mouse.press(button)
+
+    def mouse_up_instruction(self, button: MouseButtonName):
+        self.mouse.release(button)
+
+    def type_instruction(self, text: str):
+        self.keyboard.type(text)
+
+    def navigation_instruction(self, value: None):
+        """Navigation actions are executed every frame in update"""
+
+    def execute_range(self, config: CompiledConfig, start: int, end: int):
+        """
+        Execute the instructions in the range [start, end) of the given compiled config.
+        Listeners pass the config they were created for, so they keep working while a reloaded config is swapped in.
+        """
+        opcodes = config.opcodes
+        values = config.operand_values
+        for instruction in range(start, end):
+            self.instruction_handlers[opcodes[instruction]](values[instruction])
+
+    def repeat_instruction(self, config: CompiledConfig, instruction: int):
+        """
+        Repeat a single instruction. A repeated key down taps the held key, like the key repeat of a keyboard.
+        The held key is released before the first tap and stays released, so the key repeat of the system does not repeat it as well.
+        """
+        opcode = config.opcodes[instruction]
+        value = config.operand_values[instruction]
+        if opcode == Opcode.KEY_DOWN:
+            # Held modifiers are not repeated, releasing them would change the keys pressed with them
+            if value in self.pressed_keys and value not in MODIFIERS:
+                if value not in self.tapped_keys:
+                    self.tapped_keys.add(value)
+                    self.keyboard.release(value)
+                self.keyboard.press(value)
+                self.keyboard.release(value)
         else:
-            print(f"Action {action.action} not found")
+            self.instruction_handlers[opcode](value)
+
+    def on_button_event(
+        self,
+        button: Button,
+        config: CompiledConfig,
+        start: int,
+        end: int,
+        repeats: list[tuple[int, float, float]],
+    ):
+        mode = self.mode
+        self.execute_range(config, start, end)
+        if self.mode is not mode:
+            # The range switched the mode, its repeats belong to the previous mode
+            return
+        for instruction, delay, interval in repeats:
+            button.start_repeat(
+                delay,
+                interval,
+                lambda instruction=instruction: self.repeat_instruction(
+                    config, instruction
+                ),
+            )
+
+    def on_multi_button_event(
+        self,
+        buttons: Sequence[Button],
+        config: CompiledConfig,
+        start: int,
+        end: int,
+        repeats: list[tuple[int, float, float]],
+    ):
+        mode = self.mode
+        self.execute_range(config, start, end)
+        if self.mode is not mode:
+            return
+        for instruction, delay, interval in repeats:
+            self.controller.multi_button_events.start_repeat(
+                buttons,
+                delay,
+                interval,
+                lambda instruction=instruction: self.repeat_instruction(
+                    config, instruction
+                ),
+            )
 
     def add_button_action_listeners(
         self,
         controller_button_name: ControllerButtonName,
         controller_button_event_name: ControllerButtonEventName,
-        actions: list[ComputerAction | SwitchModeAction],
+        start: int,
+        end: int,
     ):
         # Find the button on the controller
         button = self.controller.buttons.get(controller_button_name, None)
         if button is None:
-            print(f"Button {controller_button_name} not found")
+            log.warning("mode", "Button not found", button=controller_button_name)
             return
 
-        # Add the listeners
-        for action in actions:
-            button.add_event_listener(
+        # Add the listener
+        repeats = self.config.get_repeats(start, end)
+        button.add_event_listener(
+            controller_button_event_name,
+            lambda button, config=self.config: self.on_button_event(
+                button, config, start, end, repeats
+            ),
+            self.get_listener_origin(
+                f"button={controller_button_name}",
                 controller_button_event_name,
-                lambda button, action=action: self.execute_action(action),
-            )
+                start,
+                end,
+            ),
+        )
 
     def add_stick_action_listeners(
         self,
         controller_stick_name: ControllerStickName,
         controller_stick_event_name: ControllerStickEventName,
-        actions: list[ComputerNavigationAction, SwitchModeAction],
+        start: int,
+        end: int,
     ):
         stick = self.controller.sticks.get(controller_stick_name, None)
         if stick is None:
-            print(f"Stick {controller_stick_name} not found")
+            log.warning("mode", "Stick not found", stick=controller_stick_name)
             return
 
-        for action in actions:
-            if action.action == "switch_mode":
-                stick.add_event_listener(
+        if any(
+            self.config.opcodes[instruction] == Opcode.SWITCH_MODE
+            for instruction in range(start, end)
+        ):
+            stick.add_event_listener(
+                controller_stick_event_name,
+                lambda stick, config=self.config, start=start, end=end: self.execute_range(
+                    config, start, end
+                ),
+                self.get_listener_origin(
+                    f"stick={controller_stick_name}",
                     controller_stick_event_name,
-                    lambda stick, action=action: self.toggle_mode(action.mode),
-                )
-            elif action.action == "mouse_move":
-                pass
-            elif action.action == "scroll":
-                pass
-            else:
-                print(f"Action {action.action} not found")
+                    start,
+                    end,
+                ),
+            )
 
-    def on_multi_button_event(
-        self,
-        actions: list[ComputerAction | SwitchModeAction],
-    ):
-        for action in actions:
-            self.execute_action(action)
+    def get_listener_origin(
+        self, trigger: str, event: str, start: int, end: int
+    ) -> str:
+        """Describe the binding of a listener for the listener profiler."""
+        actions = []
+        for instruction in range(start, end):
+            action = Opcode(self.config.opcodes[instruction]).name.lower()
+            value = self.config.operand_values[instruction]
+            actions.append(action if value is None else f"{action}({value})")
+        actions = ",".join(actions)
+        return f"mode={self.mode_name} {trigger} event={event} actions={actions}"
 
     def release_all_keyboard_buttons(self):
         """
         Used to release all keyboard buttons when switching modes. This will prevent buttons from being stuck.
         """
         for key in self.pressed_keys:
-            keyboard.release(key)
+            if key not in self.tapped_keys:
+                self.keyboard.release(key)
         self.pressed_keys = []
+        self.tapped_keys.clear()
 
     def toggle_mode(self, mode_name: str):
-        print(f"Switching to mode {mode_name}")
+        log.info("mode", "Switching mode", mode=mode_name)
         self.release_all_keyboard_buttons()
+        self.apply_mode(mode_name)
+
+    def apply_mode(self, mode_name: str):
+        """Replace all controller listeners with the ones of the given mode. Pressed keys are not released."""
+        mode_index = self.config.get_mode_index(mode_name)
+        if mode_index is None:
+            log.warning(
+                "mode", "Mode not found, falling back to default mode", mode=mode_name
+            )
+            mode_name = "default"
+            mode_index = self.config.get_mode_index(mode_name)
+        if mode_index is None:
+            # Compiled configs always have a default mode, the listeners of the current mode are kept
+            log.error("mode", "Default mode not found, mode not changed")
+            return
+
         self.controller.remove_all_event_listeners()
-        self.window.init_controller_event_listeners(
-            self.controller
-        )  # TODO make this better by not removing the listeners in the first place
-
-        self.mode = self.config.modes.get(mode_name, None)
-        if self.mode is None:
-            print(f"Mode {self.mode} not found. Falling back to default mode")
-            self.mode = self.config.modes["default"]
-        # insert all actions from global mode which are not defined in the current mode
-        global_mode = self.config.modes["global"]
-        if self.mode.button_actions is None:
-            self.mode.button_actions = {}
-        if self.mode.stick_actions is None:
-            self.mode.stick_actions = {}
-        if self.mode.multi_button_actions is None:
-            self.mode.multi_button_actions = []
-        if global_mode.button_actions is not None:
-            for (
-                controller_button_name,
-                action_details,
-            ) in global_mode.button_actions.items():
-                if controller_button_name not in self.mode.button_actions:
-                    self.mode.button_actions[controller_button_name] = action_details
-        if global_mode.stick_actions is not None:
-            for (
-                controller_stick_name,
-                action_details,
-            ) in global_mode.stick_actions.items():
-                if controller_stick_name not in self.mode.stick_actions:
-                    self.mode.stick_actions[controller_stick_name] = action_details
-
-        for controller_button_name, action_details in self.mode.button_actions.items():
-            for controller_button_event_name, actions in action_details.items():
-                if not isinstance(actions, list):
-                    actions = [actions]
-                self.add_button_action_listeners(
-                    controller_button_name, controller_button_event_name, actions
-                )
+        if self.window is not None:
+            self.window.init_controller_event_listeners(
+                self.controller
+            )  # TODO make this better by not removing the listeners in the first place
 
-        for controller_stick_name, action_details in self.mode.stick_actions.items():
-            for controller_stick_event_name, actions in action_details.items():
-                if not isinstance(actions, list):
-                    actions = [actions]
+        self.mode_name = mode_name
+        self.mode = self.config.modes[mode_index]
+
+        for button, controller_button_name in enumerate(BUTTON_NAMES):
+            for event, controller_button_event_name in enumerate(BUTTON_EVENT_NAMES):
+                start, end = self.mode.get_button_range(button, event)
+                if start != end:
+                    self.add_button_action_listeners(
+                        controller_button_name, controller_button_event_name, start, end
+                    )
+
+        stick_navigation = []
+        for stick, controller_stick_name in enumerate(STICK_NAMES):
+            for event, controller_stick_event_name in enumerate(STICK_EVENT_NAMES):
+                start, end = self.mode.get_stick_range(stick, event)
+                if start == end:
+                    continue
                 self.add_stick_action_listeners(
-                    controller_stick_name, controller_stick_event_name, actions
+                    controller_stick_name, controller_stick_event_name, start, end
                 )
+                for instruction in range(start, end):
+                    opcode = self.config.opcodes[instruction]
+                    if opcode == Opcode.MOUSE_MOVE or opcode == Opcode.SCROLL:
+                        stick_navigation.append((controller_stick_name, opcode))
+        self.stick_navigation = stick_navigation
 
-        for multi_button_action in self.mode.multi_button_actions:
-            for (
-                controller_button_event_name,
-                actions,
-            ) in multi_button_action.actions.items():
-                if not isinstance(actions, list):
-                    actions = [actions]
+        for chord, mask in enumerate(self.mode.chord_masks):
+            button_names = mask_to_button_names(mask)
+            for event, controller_button_event_name in enumerate(BUTTON_EVENT_NAMES):
+                start, end = self.mode.get_chord_range(chord, event)
+                if start == end:
+                    continue
+                repeats = self.config.get_repeats(start, end)
                 self.controller.multi_button_events.add_event_listener(
                     controller_button_event_name,
-                    multi_button_action.buttons,
-                    lambda buttons, actions=actions: self.on_multi_button_event(
-                        actions
+                    button_names,
+                    lambda buttons, args=(
+                        self.config,
+                        start,
+                        end,
+                        repeats,
+                    ): self.on_multi_button_event(buttons, *args),
+                    self.get_listener_origin(
+                        f"chord={'+'.join(button_names)}",
+                        controller_button_event_name,
+                        start,
+                        end,
                     ),
                 )
 
     def setup(self):
+        self.keyboard.prepare()
         self.toggle_mode("default")
 
-    def on_update_stick_move_event(
-        self,
-        delta_time: float,
-        controller_stick_name: ControllerStickName,
-        action: ComputerNavigationAction,
-    ):
-        stick = self.controller.sticks.get(controller_stick_name, None)
-        if stick is None:
-            print(f"Stick {controller_stick_name} not found")
-            return
+    def reload_config(self, config: CompiledConfig):
+        """
+        Swap in a changed config. Only the parts which changed are rebuilt and pressed keys are kept.
+        Has to be called on the controller thread, e.g. through Controller.call_soon.
+        """
+        old_config = self.config
+        self.config = config
 
-        if action.action == "mouse_move":
-            self.move_cursor(stick.x, stick.y, delta_time)
-        elif action.action == "scroll":
-            self.scroll(stick.y, stick.x, delta_time)
-        else:
-            print(f"Action {action.action} not found")
+        is_mapping_changed = (
+            config.button_mapping != old_config.button_mapping
+            or config.stick_mapping != old_config.stick_mapping
+        )
+        if is_mapping_changed or config.settings != old_config.settings:
+            self.controller.apply_config(config)
+        if (
+            self.window is not None
+            and config.settings.overlay_settings != old_config.settings.overlay_settings
+        ):
+            self.window.set_max_fps(config.settings.overlay_settings.max_fps)
+        if config.settings.output_settings != old_config.settings.output_settings:
+            log.warning(
+                "config", "Output settings changed, restart CoStick to apply them"
+            )
+
+        # The compiled modes already contain the actions of the global mode
+        old_mode_index = old_config.get_mode_index(self.mode_name)
+        new_mode_index = config.get_mode_index(self.mode_name)
+        is_mode_changed = new_mode_index is None or old_config.describe_mode(
+            old_mode_index
+        ) != config.describe_mode(new_mode_index)
+        if is_mapping_changed or is_mode_changed:
+            self.apply_mode(self.mode_name)
+        log.info("config", "Config reloaded", mode=self.mode_name)
 
     def update(self):
         """
@@ -207,21 +379,14 @@ class Cursor:
         delta_time = current_time - self.last_time
         self.last_time = current_time
 
-        for controller_stick_name, action_details in self.mode.stick_actions.items():
-            for controller_stick_event_name, actions in action_details.items():
-                if not isinstance(actions, list):
-                    actions = [actions]
-                for action in [
-                    actions for actions in actions if actions.action != "switch_mode"
-                ]:
-                    if controller_stick_event_name == "move":
-                        self.on_update_stick_move_event(
-                            delta_time,
-                            controller_stick_name,
-                            action,
-                        )
-                    else:
-                        print(f"Event {controller_stick_event_name} not found")
+        for controller_stick_name, opcode in self.stick_navigation:
+            stick = self.controller.sticks.get(controller_stick_name, None)
+            if stick is None:
+                continue
+            if opcode == Opcode.MOUSE_MOVE:
+                self.move_cursor(stick.x, stick.y, delta_time)
+            else:
+                self.scroll(stick.y, stick.x, delta_time)
 
     def get_cursor_speed(self, x_value, y_value):
         """
@@ -296,7 +461,9 @@ class Cursor:
         if abs(self.target_distance_y) >= 1:
             target_distance_y = int(self.target_distance_y)
             self.target_distance_y -= target_distance_y
-        mouse.move(target_distance_x, target_distance_y)
+        if target_distance_x or target_distance_y:
+            perf_counters.cursor_moves += 1
+        self.mouse.move(target_distance_x, target_distance_y)
 
     def scroll(self, y_value, x_value, delta_time):
         if (y_value > 0) != (self.target_scroll > 0):
@@ -304,10 +471,15 @@ class Cursor:
         self.target_scroll += (
             y_value * self.config.settings.cursor_settings.scroll_speed
         )
-        if abs(self.target_scroll) >= 1:
+        if self.scroll_hi_res is not None:
+            # Scroll smoothly instead of waiting for a whole detent
+            if self.target_scroll:
+                self.scroll_hi_res(0, -self.target_scroll)
+                self.target_scroll = 0
+        elif abs(self.target_scroll) >= 1:
             scroll_amount = int(self.target_scroll)
             self.target_scroll -= scroll_amount
-            mouse.scroll(0, -scroll_amount)
+            self.mouse.scroll(0, -scroll_amount)
 
 
 if __name__ == "__main__":
@@ -315,4 +487,4 @@ if __name__ == "__main__":
     cursor = Cursor(None, None, None, True)
     for char in chars:
         print(f"keyboard.press('{char}')")
-        cursor.execute_action(ComputerTypeAction(text=char))
+        cursor.keyboard.type(char)
@@ -0,0 +1,283 @@
+"""
+Runs CoStick without the Qt overlay, e.g. on kiosk or remote machines.
+
+The controller, the actions and the cursor movement run on the controller thread, which is the event loop of
+the daemon: cursor updates are timers of the controller scheduler. A local control socket accepts one command
+per line and answers each with one line of JSON, so tools and a later overlay can attach to a running daemon.
+
+Usage:
+    python daemon.py [--event-bus] [--controller-process]
+                                          run the daemon, see event_bus.py and controller_process.py
+    python daemon.py --send COMMAND       send a command to a running daemon and print the answer
+
+Commands:
+    status                                mode, connected controller and pressed buttons
+    snapshot                              pressed button mask and stick values
+    switch_mode MODE                      switch to a mode
+    reload                                reload config.json
+    profile [on [BUDGET_MS]|off|reset]    switch the listener profiler and return its report, see listener_profiler.py
+    quit                                  stop the daemon
+"""
+
+import argparse
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from app_dirs import get_runtime_dir
+from compiled_config import load_compiled_config, mask_to_button_names
+from controller import Controller
+from cursor import Cursor
+from listener_profiler import listener_profiler
+
+cursor_update_interval = 1 / 60
+"""Seconds between two cursor updates, the overlay drives the cursor at the same rate"""
+command_timeout = 2.0
+"""Seconds a control command waits for the controller thread"""
+
+
+def get_control_socket_path() -> str:
+    return os.path.join(get_runtime_dir(), "costick.sock")
+
+
+class ControlServer:
+    """
+    Serves the control socket in a background thread. Commands which read or change the state of the
+    controller or the cursor are run on the controller thread through Controller.call_soon.
+    """
+
+    def __init__(
+        self, path: str, controller: Controller, cursor: Cursor, config_path: str
+    ):
+        self.path = path
+        self.controller = controller
+        self.cursor = cursor
+        self.config_path = config_path
+        self.running = False
+        self.thread: threading.Thread | None = None
+        self.server_socket: socket.socket | None = None
+        self.buffers: dict[socket.socket, bytes] = {}
+        """Received bytes of each connection which do not form a complete line yet"""
+
+    def start(self):
+        if os.path.exists(self.path):
+            # Left over from a daemon which did not shut down cleanly
+            os.unlink(self.path)
+        self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server_socket.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.server_socket.listen()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.server_socket, selectors.EVENT_READ)
+        while self.running:
+            for key, _ in selector.select(timeout=0.2):
+                if key.fileobj is self.server_socket:
+                    connection, _ = self.server_socket.accept()
+                    selector.register(connection, selectors.EVENT_READ)
+                    self.buffers[connection] = b""
+                    continue
+                connection = key.fileobj
+                try:
+                    data = connection.recv(4096)
+                except OSError:
+                    data = b""
+                if not data:
+                    selector.unregister(connection)
+                    connection.close()
+                    del self.buffers[connection]
+                    continue
+                *lines, self.buffers[connection] = (
+                    self.buffers[connection] + data
+                ).split(b"\n")
+                for line in lines:
+                    answer = self.handle_command(line.decode(errors="replace"))
+                    try:
+                        connection.sendall(json.dumps(answer).encode() + b"\n")
+                    except OSError:
+                        pass
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+    def run_on_controller_thread(self, callback: Callable[[], Any]) -> Any:
+        """Run the callback on the controller thread and return its result."""
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(callback())
+            except Exception as e:
+                future.set_exception(e)
+
+        self.controller.call_soon(run)
+        return future.result(timeout=command_timeout)
+
+    def handle_command(self, line: str) -> dict:
+        command, _, argument = line.strip().partition(" ")
+        try:
+            if command == "status":
+                return self.run_on_controller_thread(self.get_status)
+            if command == "snapshot":
+                snapshot = self.controller.get_snapshot()
+                return {
+                    "ok": True,
+                    "pressed_mask": snapshot.pressed_mask,
+                    "axes": snapshot.axes,
+                    "time": snapshot.time,
+                }
+            if command == "switch_mode":
+                if not argument:
+                    return {"ok": False, "error": "switch_mode needs a mode name"}
+                self.run_on_controller_thread(
+                    lambda: self.cursor.toggle_mode(argument.strip())
+                )
+                return {"ok": True, "mode": self.cursor.mode_name}
+            if command == "reload":
+                config = load_compiled_config(self.config_path)
+                self.run_on_controller_thread(lambda: self.cursor.reload_config(config))
+                return {"ok": True}
+            if command == "profile":
+                return self.run_on_controller_thread(
+                    lambda: self.handle_profile_command(argument.split())
+                )
+            if command == "quit":
+                self.controller.running = False
+                return {"ok": True}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": False, "error": f"Unknown command {command!r}"}
+
+    def handle_profile_command(self, arguments: list[str]) -> dict:
+        """profile on [budget_ms], profile off, profile reset or profile (report)"""
+        if arguments and arguments[0] == "on":
+            listener_profiler.enable(
+                float(arguments[1]) / 1000 if len(arguments) > 1 else None
+            )
+        elif arguments and arguments[0] == "off":
+            listener_profiler.disable()
+        elif arguments and arguments[0] == "reset":
+            listener_profiler.reset()
+        elif arguments and arguments[0] != "report":
+            return {"ok": False, "error": f"Unknown profile command {arguments[0]!r}"}
+        return {
+            "ok": True,
+            "enabled": listener_profiler.enabled,
+            "budget_ms": listener_profiler.budget * 1000,
+            "listeners": listener_profiler.get_report(),
+        }
+
+    def get_status(self) -> dict:
+        return {
+            "ok": True,
+            "mode": self.cursor.mode_name,
+            "connected": self.controller.is_connected(),
+            "pressed": mask_to_button_names(self.controller.get_pressed_mask()),
+        }
+
+
+def send_command(command: str, path: str | None = None) -> dict:
+    """Send a command to a running daemon and return its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(get_control_socket_path() if path is None else path)
+        client.sendall(command.encode() + b"\n")
+        answer = b""
+        while not answer.endswith(b"\n"):
+            data = client.recv(4096)
+            if not data:
+                break
+            answer += data
+    return json.loads(answer)
+
+
+def run_daemon(
+    config_path: str = "config.json",
+    event_bus: bool = False,
+    controller_process: bool = False,
+):
+    config = load_compiled_config(config_path)
+    controller = Controller(config)
+    if event_bus:
+        controller.start_event_bus()
+    cursor = Cursor(None, controller, config)
+
+    # The cursor is updated by the controller thread, so stick values are read on the thread writing them
+    controller.scheduler.call_repeating(
+        time.monotonic(), cursor_update_interval, lambda repeat: cursor.update()
+    )
+
+    def on_config_changed(new_config):
+        controller.call_soon(lambda: cursor.reload_config(new_config))
+
+    from config_watcher import ConfigWatcher
+
+    config_watcher = ConfigWatcher(config_path, on_config_changed)
+    config_watcher.start()
+
+    control_server = ControlServer(
+        get_control_socket_path(), controller, cursor, config_path
+    )
+    control_server.start()
+    print(f"Control socket listening on {control_server.path}")
+
+    def stop(signal_number, frame):
+        controller.running = False
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        if controller_process:
+            from controller_process import ControllerProcess
+
+            controller.run(ControllerProcess())
+        else:
+            controller.run()
+    finally:
+        control_server.stop()
+        config_watcher.stop()
+        cursor.release_all_keyboard_buttons()
+        controller.stop_event_bus()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--send", metavar="COMMAND")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument(
+        "--event-bus", action="store_true", help="publish events, see event_bus.py"
+    )
+    parser.add_argument(
+        "--controller-process",
+        action="store_true",
+        help="poll the controller in a child process, see controller_process.py",
+    )
+    args = parser.parse_args()
+
+    if args.send:
+        try:
+            print(json.dumps(send_command(args.send)))
+        except OSError as e:
+            print(f"Could not connect to the daemon: {e}")
+            sys.exit(1)
+    else:
+        run_daemon(args.config, args.event_bus, args.controller_process)
@@ -0,0 +1,521 @@
+"""
+Publishes controller events to other processes over a Unix domain socket.
+
+Every event is sent as a fixed size little endian frame (see FRAME): sequence number, time.monotonic() timestamp,
+kind, event index, button mask or stick index and the stick position. A subscriber selects the events it receives
+by sending a SUBSCRIPTION, and can send a new one at any time to change it.
+
+The input thread only packs frames into the bounded buffer of each matching subscriber. A background thread
+sends the buffers with non-blocking sends. When the buffer of a slow subscriber is full, new frames for it are
+dropped and counted, and a DROPPED frame with the number of dropped frames precedes the next delivered frame.
+
+Usage:
+    python event_bus.py [--kinds button,chord,stick] [--buttons face_up,...] [--events down,up,...]
+        print the events of a running CoStick started with --event-bus
+    python event_bus.py --self-test
+        check that filtering one event kind does not deliver the other kind
+"""
+
+import argparse
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Sequence
+
+from app_dirs import get_runtime_dir
+from compiled_config import button_names_to_mask, mask_to_button_names
+from config_types import (
+    BUTTON_EVENT_NAMES,
+    STICK_EVENT_NAMES,
+    STICK_NAMES,
+    ControllerButtonEventName,
+    ControllerButtonName,
+    ControllerStickName,
+)
+
+if TYPE_CHECKING:
+    from controller import Button, Controller, Stick
+
+FRAME = struct.Struct("<IdBBIff")
+"""sequence number, timestamp, kind, event index, button mask or stick index or dropped frames, x, y"""
+SUBSCRIPTION = struct.Struct("<BHBIB")
+"""kind mask, button event mask, stick event mask, button mask, stick mask. A mask of 0 selects everything"""
+
+KIND_BUTTON = 0
+KIND_CHORD = 1
+KIND_STICK = 2
+KIND_DROPPED = 3
+KIND_NAMES = ("button", "chord", "stick", "dropped")
+
+max_buffered_frames = 1024
+"""Frames buffered per subscriber before new frames are dropped"""
+max_send_frames = 256
+"""Frames sent with one send call"""
+
+
+def get_event_bus_path() -> str:
+    return os.path.join(get_runtime_dir(), "costick-events.sock")
+
+
+class Subscription:
+    """A connected subscriber with its filter and send buffer."""
+
+    __slots__ = (
+        "connection",
+        "kind_mask",
+        "button_event_mask",
+        "stick_event_mask",
+        "button_mask",
+        "stick_mask",
+        "frames",
+        "dropped",
+        "dropped_total",
+        "pending",
+        "received",
+    )
+
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.kind_mask = 0
+        """Bit i selects the kind i, nothing is sent until the subscriber sent a subscription"""
+        self.button_event_mask = 0
+        """Bit i selects the button event i of button and chord events"""
+        self.stick_event_mask = 0
+        """Bit i selects the stick event i of stick events"""
+        self.button_mask = 0
+        self.stick_mask = 0
+        self.frames: deque[bytes] = deque()
+        """Frames waiting to be sent, appended by the input thread and taken by the publisher thread"""
+        self.dropped = 0
+        """Frames dropped since the last DROPPED frame"""
+        self.dropped_total = 0
+        self.pending = b""
+        """Bytes of the last send which were not accepted by the socket yet"""
+        self.received = b""
+        """Received bytes which do not form a complete subscription yet"""
+
+    def matches(self, kind: int, event: int, mask: int) -> bool:
+        if not self.kind_mask >> kind & 1:
+            return False
+        if kind == KIND_STICK:
+            if self.stick_event_mask and not self.stick_event_mask >> event & 1:
+                return False
+            return not self.stick_mask or bool(self.stick_mask >> mask & 1)
+        if self.button_event_mask and not self.button_event_mask >> event & 1:
+            return False
+        return not self.button_mask or bool(self.button_mask & mask)
+
+
+class EventBusPublisher:
+    """
+    Serves the event bus socket. publish is called by the input thread and never blocks it,
+    everything else runs in a background thread.
+    """
+
+    def __init__(self, path: str | None = None, max_frames: int = max_buffered_frames):
+        self.path = get_event_bus_path() if path is None else path
+        self.max_frames = max_frames
+        """Frames buffered per subscriber before new frames are dropped"""
+        self.sequence_number = 0
+        """Number of the last published event, written by the input thread"""
+        self.subscriptions: tuple[Subscription, ...] = ()
+        """Subscribers with a subscription, replaced and never mutated by the publisher thread"""
+        self.is_wake_pending = False
+        self.running = False
+        self.thread: threading.Thread | None = None
+        self.server_socket: socket.socket | None = None
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        """Wakes the publisher thread when frames were buffered"""
+        self.wake_writer.setblocking(False)
+
+    def start(self):
+        if os.path.exists(self.path):
+            # Left over from a process which did not shut down cleanly
+            os.unlink(self.path)
+        self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server_socket.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.server_socket.listen()
+        self.server_socket.setblocking(False)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake()
+        if self.thread is not None:
+            self.thread.join()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def wake(self):
+        try:
+            self.wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def publish(self, kind: int, event: int, mask: int, x: float = 0, y: float = 0):
+        """Buffer an event for all subscribers it matches. Has to be called from one thread only."""
+        self.sequence_number += 1
+        frame = None
+        for subscription in self.subscriptions:
+            if not subscription.matches(kind, event, mask):
+                continue
+            if frame is None:
+                frame = FRAME.pack(
+                    self.sequence_number, time.monotonic(), kind, event, mask, x, y
+                )
+            frames = subscription.frames
+            if len(frames) + (subscription.dropped > 0) >= self.max_frames:
+                subscription.dropped += 1
+                subscription.dropped_total += 1
+                continue
+            if subscription.dropped:
+                frames.append(
+                    FRAME.pack(
+                        self.sequence_number,
+                        time.monotonic(),
+                        KIND_DROPPED,
+                        0,
+                        subscription.dropped,
+                        0,
+                        0,
+                    )
+                )
+                subscription.dropped = 0
+            frames.append(frame)
+        if frame is not None and not self.is_wake_pending:
+            self.is_wake_pending = True
+            self.wake()
+
+    def attach(self, controller: "Controller"):
+        """Publish all button, chord and stick events of the controller."""
+        button_event_indices = {name: i for i, name in enumerate(BUTTON_EVENT_NAMES)}
+        stick_event_indices = {name: i for i, name in enumerate(STICK_EVENT_NAMES)}
+
+        def on_button_event(event_name: ControllerButtonEventName, button: "Button"):
+            self.publish(KIND_BUTTON, button_event_indices[event_name], button.bit)
+
+        def on_chord_event(
+            event_trigger: tuple[ControllerButtonEventName, frozenset],
+            buttons: "Sequence[Button]",
+        ):
+            mask = 0
+            for button in buttons:
+                mask |= button.bit
+            self.publish(KIND_CHORD, button_event_indices[event_trigger[0]], mask)
+
+        for button in controller.buttons.values():
+            button.event_tap = on_button_event
+        controller.multi_button_events.event_tap = on_chord_event
+        for stick_index, stick_name in enumerate(STICK_NAMES):
+            stick = controller.sticks.get(stick_name, None)
+            if stick is None:
+                continue
+            stick.event_tap = (
+                lambda event_name, stick, stick_index=stick_index: self.publish(
+                    KIND_STICK,
+                    stick_event_indices[event_name],
+                    stick_index,
+                    stick.x,
+                    stick.y,
+                )
+            )
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.server_socket, selectors.EVENT_READ)
+        selector.register(self.wake_reader, selectors.EVENT_READ)
+        connections: dict[socket.socket, Subscription] = {}
+        while self.running:
+            for key, mask in selector.select(timeout=1.0):
+                if key.fileobj is self.server_socket:
+                    try:
+                        connection, _ = self.server_socket.accept()
+                    except BlockingIOError:
+                        continue
+                    connection.setblocking(False)
+                    connections[connection] = Subscription(connection)
+                    selector.register(connection, selectors.EVENT_READ)
+                    continue
+                if key.fileobj is self.wake_reader:
+                    self.wake_reader.recv(4096)
+                    self.is_wake_pending = False
+                    continue
+                subscription = connections[key.fileobj]
+                if mask & selectors.EVENT_READ and not self.receive(subscription):
+                    self.disconnect(selector, connections, subscription)
+            for subscription in self.subscriptions:
+                if not self.send(subscription):
+                    self.disconnect(selector, connections, subscription)
+                    continue
+                events = selectors.EVENT_READ
+                if subscription.pending:
+                    # Continue when the socket accepts more data
+                    events |= selectors.EVENT_WRITE
+                if selector.get_key(subscription.connection).events != events:
+                    selector.modify(subscription.connection, events)
+        for connection in connections:
+            connection.close()
+        self.server_socket.close()
+        selector.close()
+
+    def receive(self, subscription: Subscription) -> bool:
+        """Apply the subscriptions sent by the subscriber. Returns False if the subscriber disconnected."""
+        try:
+            data = subscription.connection.recv(4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        subscription.received += data
+        while len(subscription.received) >= SUBSCRIPTION.size:
+            (
+                subscription.kind_mask,
+                subscription.button_event_mask,
+                subscription.stick_event_mask,
+                subscription.button_mask,
+                subscription.stick_mask,
+            ) = SUBSCRIPTION.unpack_from(subscription.received)
+            subscription.received = subscription.received[SUBSCRIPTION.size :]
+        if subscription not in self.subscriptions:
+            self.subscriptions = self.subscriptions + (subscription,)
+        return True
+
+    def send(self, subscription: Subscription) -> bool:
+        """Send buffered frames until the socket would block. Returns False if the subscriber disconnected."""
+        frames = subscription.frames
+        while subscription.pending or frames:
+            if not subscription.pending:
+                subscription.pending = b"".join(
+                    frames.popleft() for _ in range(min(len(frames), max_send_frames))
+                )
+            try:
+                sent = subscription.connection.send(subscription.pending)
+            except BlockingIOError:
+                return True
+            except OSError:
+                return False
+            subscription.pending = subscription.pending[sent:]
+        return True
+
+    def disconnect(
+        self,
+        selector: selectors.BaseSelector,
+        connections: dict[socket.socket, Subscription],
+        subscription: Subscription,
+    ):
+        self.subscriptions = tuple(
+            s for s in self.subscriptions if s is not subscription
+        )
+        selector.unregister(subscription.connection)
+        subscription.connection.close()
+        del connections[subscription.connection]
+
+
+class BusEvent(NamedTuple):
+    sequence_number: int
+    time: float
+    """time.monotonic() of the publishing process when the event was published"""
+    kind: str
+    """button, chord, stick or dropped"""
+    event: str
+    names: list[str]
+    """Buttons of button and chord events, the stick of stick events"""
+    x: float
+    y: float
+    dropped: int
+    """Number of frames dropped before this frame because the subscriber was too slow"""
+
+
+class EventBusSubscriber:
+    """Connects to the event bus of a running CoStick and yields its events."""
+
+    def __init__(
+        self,
+        kinds: Iterable[str] | None = None,
+        buttons: Iterable[ControllerButtonName] | None = None,
+        events: Iterable[str] | None = None,
+        sticks: Iterable[ControllerStickName] | None = None,
+        path: str | None = None,
+    ):
+        self.path = get_event_bus_path() if path is None else path
+        self.connection: socket.socket | None = None
+        self.subscribe(kinds, buttons, events, sticks, send=False)
+
+    def subscribe(
+        self,
+        kinds: Iterable[str] | None = None,
+        buttons: Iterable[ControllerButtonName] | None = None,
+        events: Iterable[str] | None = None,
+        sticks: Iterable[ControllerStickName] | None = None,
+        send: bool = True,
+    ):
+        """
+        Select the events to receive. None selects all. Button events are selected by name for buttons and chords,
+        stick events for sticks. Kinds without a selected event are not received.
+        """
+        kind_mask = 0
+        for kind in KIND_NAMES[:KIND_DROPPED] if kinds is None else kinds:
+            kind_mask |= 1 << KIND_NAMES.index(kind)
+        kind_mask |= 1 << KIND_DROPPED
+        button_event_mask = 0
+        stick_event_mask = 0
+        for event in events or ():
+            if event in BUTTON_EVENT_NAMES:
+                button_event_mask |= 1 << BUTTON_EVENT_NAMES.index(event)
+            if event in STICK_EVENT_NAMES:
+                stick_event_mask |= 1 << STICK_EVENT_NAMES.index(event)
+        if events is not None:
+            # A mask of 0 selects every event, so kinds without a selected event are deselected
+            if not button_event_mask:
+                kind_mask &= ~(1 << KIND_BUTTON | 1 << KIND_CHORD)
+            if not stick_event_mask:
+                kind_mask &= ~(1 << KIND_STICK)
+        stick_mask = 0
+        for stick in sticks or ():
+            stick_mask |= 1 << STICK_NAMES.index(stick)
+        self.subscription = SUBSCRIPTION.pack(
+            kind_mask,
+            button_event_mask,
+            stick_event_mask,
+            button_names_to_mask(list(buttons or ())),
+            stick_mask,
+        )
+        if send and self.connection is not None:
+            self.connection.sendall(self.subscription)
+
+    def connect(self):
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(self.path)
+        self.connection.sendall(self.subscription)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __iter__(self) -> Iterator[BusEvent]:
+        if self.connection is None:
+            self.connect()
+        data = b""
+        while True:
+            received = self.connection.recv(FRAME.size * max_send_frames)
+            if not received:
+                return
+            data += received
+            frame_count = len(data) // FRAME.size
+            for offset in range(0, frame_count * FRAME.size, FRAME.size):
+                yield decode_frame(FRAME.unpack_from(data, offset))
+            data = data[frame_count * FRAME.size :]
+
+
+def decode_frame(frame: tuple[int, float, int, int, int, float, float]) -> BusEvent:
+    sequence_number, timestamp, kind, event, mask, x, y = frame
+    if kind == KIND_DROPPED:
+        return BusEvent(sequence_number, timestamp, "dropped", "", [], 0, 0, mask)
+    if kind == KIND_STICK:
+        return BusEvent(
+            sequence_number,
+            timestamp,
+            "stick",
+            STICK_EVENT_NAMES[event],
+            [STICK_NAMES[mask]],
+            x,
+            y,
+            0,
+        )
+    return BusEvent(
+        sequence_number,
+        timestamp,
+        KIND_NAMES[kind],
+        BUTTON_EVENT_NAMES[event],
+        mask_to_button_names(mask),
+        x,
+        y,
+        0,
+    )
+
+
+def self_test():
+    """Check that filtering one event kind does not deliver the events of the other kind."""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        publisher = EventBusPublisher(os.path.join(directory, "events.sock"))
+        publisher.start()
+        button_subscriber = EventBusSubscriber(events=["down"], path=publisher.path)
+        stick_subscriber = EventBusSubscriber(events=["move"], path=publisher.path)
+        button_subscriber.connect()
+        stick_subscriber.connect()
+        deadline = time.monotonic() + 5
+        while len(publisher.subscriptions) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # down and move are both event 0 of their kind
+        publisher.publish(KIND_STICK, STICK_EVENT_NAMES.index("move"), 0, 0.5, 0.5)
+        publisher.publish(KIND_BUTTON, BUTTON_EVENT_NAMES.index("up"), 1)
+        publisher.publish(KIND_BUTTON, BUTTON_EVENT_NAMES.index("down"), 1)
+        publisher.publish(KIND_STICK, STICK_EVENT_NAMES.index("move"), 1, 0.5, 0.5)
+        button_event = next(iter(button_subscriber))
+        stick_events = iter(stick_subscriber)
+        first_stick_event, second_stick_event = next(stick_events), next(stick_events)
+        publisher.stop()
+        button_subscriber.close()
+        stick_subscriber.close()
+    assert (button_event.kind, button_event.event) == ("button", "down"), button_event
+    assert button_event.sequence_number == 3, button_event
+    assert [first_stick_event.kind, second_stick_event.kind] == ["stick", "stick"]
+    assert [
+        first_stick_event.sequence_number,
+        second_stick_event.sequence_number,
+    ] == [1, 4]
+    print("Event bus filters ok")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--kinds", help="comma separated: button, chord, stick")
+    parser.add_argument("--buttons", help="comma separated button names")
+    parser.add_argument("--events", help="comma separated event names")
+    parser.add_argument(
+        "--self-test",
+        action="store_true",
+        help="check the event filters on a temporary bus and exit",
+    )
+    args = parser.parse_args()
+    if args.self_test:
+        self_test()
+        raise SystemExit
+
+    def split(value: str | None) -> list[str] | None:
+        return None if value is None else value.split(",")
+
+    subscriber = EventBusSubscriber(
+        split(args.kinds), split(args.buttons), split(args.events)
+    )
+    try:
+        for bus_event in subscriber:
+            latency = (time.monotonic() - bus_event.time) * 1000
+            if bus_event.kind == "dropped":
+                print(f"{bus_event.sequence_number:8d} dropped {bus_event.dropped}")
+            elif bus_event.kind == "stick":
+                print(
+                    f"{bus_event.sequence_number:8d} {latency:6.2f} ms stick {bus_event.names[0]} {bus_event.event} {bus_event.x:.3f}, {bus_event.y:.3f}"
+                )
+            else:
+                print(
+                    f"{bus_event.sequence_number:8d} {latency:6.2f} ms {bus_event.kind} {'+'.join(bus_event.names)} {bus_event.event}"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
@@ -1,43 +1,187 @@
+import threading
+import time
 import uuid
-from typing import Callable, TypeVar, Generic
+from typing import Callable, Hashable, Iterable, TypeVar, Generic
+from listener_profiler import listener_profiler
 
 CallbackParameter = TypeVar("CallbackParameter")
 EventTrigger = TypeVar("EventTrigger")
 
 
+class EventBatch(Generic[EventTrigger, CallbackParameter]):
+    """Events collected for a batch listener since it was last called."""
+
+    __slots__ = (
+        "event_triggers",
+        "listener",
+        "min_interval",
+        "coalesce",
+        "events",
+        "last_delivery_time",
+    )
+
+    def __init__(
+        self,
+        event_triggers: list[EventTrigger] | None,
+        listener: Callable[[list[tuple[EventTrigger, CallbackParameter]]], None],
+        max_rate: float | None,
+        coalesce: bool,
+    ):
+        self.event_triggers = event_triggers
+        """Events collected for the listener or None to collect all events"""
+        self.listener = listener
+        self.min_interval = 0 if max_rate is None else 1 / max_rate
+        """Minimum time in seconds between two calls of the listener"""
+        self.coalesce = coalesce
+        """Only keep the latest event of each trigger"""
+        self.events: list[tuple[EventTrigger, CallbackParameter]] = []
+        self.last_delivery_time = 0.0
+
+    def add(self, event_trigger: EventTrigger, instance: CallbackParameter):
+        if self.event_triggers is not None and event_trigger not in self.event_triggers:
+            return
+        if self.coalesce:
+            for i, (e_trigger, _) in enumerate(self.events):
+                if e_trigger == event_trigger:
+                    del self.events[i]
+                    break
+        self.events.append((event_trigger, instance))
+
+    def flush(self, now: float):
+        """Call the listener with the collected events if there are any and the max rate allows it."""
+        if not self.events or now - self.last_delivery_time < self.min_interval:
+            return
+        events = self.events
+        self.events = []
+        self.last_delivery_time = now
+        self.listener(events)
+
+
 class EventListener(Generic[EventTrigger, CallbackParameter]):
+    """
+    Calls listeners registered for events.
+
+    Listeners can be added and removed from any thread. Mutations copy the listeners under a lock and publish
+    new immutable snapshots, so dispatching an event reads the current snapshot without taking a lock.
+    """
+
+    __slots__ = (
+        "_write_lock",
+        "_event_listeners",
+        "_listener_index",
+        "_event_batches",
+        "version",
+        "event_tap",
+    )
+
     def __init__(self):
+        self._write_lock = threading.Lock()
+        """Serializes mutations of the listeners, dispatch does not take it"""
         self._event_listeners: dict[
             uuid.UUID, tuple[EventTrigger, Callable[[CallbackParameter], None]]
         ] = {}
+        """Snapshot of all listeners, replaced and never mutated"""
+        self._listener_index: dict[
+            Hashable, tuple[Callable[[CallbackParameter], None], ...]
+        ] = {}
+        """Snapshot of the listeners of each event in the order they were added, replaced and never mutated"""
+        self._event_batches: dict[
+            uuid.UUID, EventBatch[EventTrigger, CallbackParameter]
+        ] = {}
+        """Snapshot of the batch listeners, see add_batch_listener. Replaced and never mutated, kept by remove_all_event_listeners"""
+        self.version = 0
+        """Increased whenever a listener is added or removed, used to invalidate data derived from the listeners"""
+        self.event_tap: Callable[[EventTrigger, CallbackParameter], None] | None = None
+        """Called with every event after its listeners. It is not a listener and is kept by remove_all_event_listeners, e.g. to publish all events to other processes."""
+
+    def _get_index_key(self, event_trigger: EventTrigger) -> Hashable:
+        """Key of an event trigger in the listener index. Triggers with the same key call the same listeners."""
+        return event_trigger
+
+    def _publish_event_listeners(
+        self,
+        event_listeners: dict[
+            uuid.UUID, tuple[EventTrigger, Callable[[CallbackParameter], None]]
+        ],
+    ) -> None:
+        """Build the listener index for new listeners and swap both in. Has to be called with the write lock held."""
+        listener_index: dict[Hashable, list[Callable[[CallbackParameter], None]]] = {}
+        for event_trigger, listener in event_listeners.values():
+            listener_index.setdefault(self._get_index_key(event_trigger), []).append(
+                listener
+            )
+        self._event_listeners = event_listeners
+        self._listener_index = {
+            key: tuple(listeners) for key, listeners in listener_index.items()
+        }
+        self.version += 1
 
     def add_event_listener(
-        self, event_trigger: EventTrigger, listener: Callable[[CallbackParameter], None]
+        self,
+        event_trigger: EventTrigger,
+        listener: Callable[[CallbackParameter], None],
+        origin: str | None = None,
     ) -> uuid.UUID:
         """
         Add a listener for the given event.
+        The origin describes where the listener comes from, e.g. the binding of a mode, and is shown by the listener profiler.
         Returns the listener_id which can be used to remove the listener.
         """
-        listener_id = uuid.uuid4()
-        while listener_id in self._event_listeners:
+        if origin is not None:
+            listener_profiler.tag(listener, origin)
+        with self._write_lock:
+            listener_id = uuid.uuid4()
+            while listener_id in self._event_listeners:
+                listener_id = uuid.uuid4()
+            event_listeners = dict(self._event_listeners)
+            event_listeners[listener_id] = (event_trigger, listener)
+            self._publish_event_listeners(event_listeners)
+        return listener_id
+
+    def add_batch_listener(
+        self,
+        event_triggers: Iterable[EventTrigger] | None,
+        listener: Callable[[list[tuple[EventTrigger, CallbackParameter]]], None],
+        max_rate: float | None = None,
+        coalesce: bool = False,
+    ) -> uuid.UUID:
+        """
+        Add a listener which is called with the list of (event_trigger, instance) of all events since its last call,
+        instead of once per event. The listener is called from flush_event_batches, at most max_rate times per second.
+        If coalesce is True, only the latest event of each trigger is kept, for listeners only interested in the latest state.
+        Collects all events if event_triggers is None.
+        Returns the listener_id which can be used to remove the listener with remove_event_listener.
+        """
+        event_batch = EventBatch(
+            None if event_triggers is None else list(event_triggers),
+            listener,
+            max_rate,
+            coalesce,
+        )
+        with self._write_lock:
             listener_id = uuid.uuid4()
-        self._event_listeners[listener_id] = (event_trigger, listener)
+            while listener_id in self._event_batches:
+                listener_id = uuid.uuid4()
+            self._event_batches = self._event_batches | {listener_id: event_batch}
         return listener_id
 
     def remove_event_listener(self, listener_id: uuid.UUID) -> None:
-        """Remove a listener using the listener_id."""
-        if listener_id in self._event_listeners:
-            del self._event_listeners[listener_id]
+        """Remove a listener or batch listener using the listener_id."""
+        with self._write_lock:
+            if listener_id in self._event_listeners:
+                event_listeners = dict(self._event_listeners)
+                del event_listeners[listener_id]
+                self._publish_event_listeners(event_listeners)
+            if listener_id in self._event_batches:
+                event_batches = dict(self._event_batches)
+                del event_batches[listener_id]
+                self._event_batches = event_batches
 
     def get_event_listeners(
         self, event_trigger: EventTrigger
     ) -> list[Callable[[CallbackParameter], None]]:
         """Get all listeners for the given event."""
-        return [
-            listener
-            for e_name, listener in self._event_listeners.values()
-            if e_name == event_trigger
-        ]
+        return list(self._listener_index.get(self._get_index_key(event_trigger), ()))
 
     def call_event_listeners(
         self, event_trigger: EventTrigger, instance: CallbackParameter | None = None
@@ -45,9 +189,35 @@ class EventListener(Generic[EventTrigger, CallbackParameter]):
         """Call all listeners for the given event."""
         if instance is None:
             instance = self
-        for listener in self.get_event_listeners(event_trigger):
-            listener(instance)
+        listeners = self._listener_index.get(self._get_index_key(event_trigger), ())
+        if listener_profiler.enabled:
+            listener_profiler.call_listeners(listeners, instance, event_trigger)
+        else:
+            for listener in listeners:
+                listener(instance)
+        for event_batch in self._event_batches.values():
+            event_batch.add(event_trigger, instance)
+        if self.event_tap is not None:
+            self.event_tap(event_trigger, instance)
+
+    def flush_event_batches(self, now: float | None = None) -> None:
+        """Call the batch listeners with the events collected since their last call."""
+        if not self._event_batches:
+            return
+        if now is None:
+            now = time.monotonic()
+        for event_batch in self._event_batches.values():
+            event_batch.flush(now)
 
     def remove_all_event_listeners(self) -> None:
-        """Remove all event listeners."""
-        self._event_listeners.clear()
+        """
+        Remove all event listeners. Batch listeners are kept like the event_tap, since they observe all events
+        instead of implementing a mode. Use remove_all_batch_listeners to remove them.
+        """
+        with self._write_lock:
+            self._publish_event_listeners({})
+
+    def remove_all_batch_listeners(self) -> None:
+        """Remove all batch listeners."""
+        with self._write_lock:
+            self._event_batches = {}
@@ -0,0 +1,141 @@
+"""
+Opt-in timing of event listeners, to find the binding responsible for slow actions.
+
+While the profiler is enabled, EventListener.call_event_listeners measures every listener call and records the
+call count, total and maximum time per listener origin, e.g. the mode, button, event and actions of a binding, which
+is given when the listener is added. The listeners recreated for a binding by a mode switch share its statistics.
+Calls slower than the latency budget are counted and logged in the listener category.
+
+Enable it with the COSTICK_PROFILE_LISTENERS environment variable, set to the budget in milliseconds or to any other
+value like "on" for the default budget, or at runtime with the profile command of the daemon control socket.
+"""
+
+import os
+import time
+import weakref
+from typing import Any, Callable
+
+import log
+
+default_budget = 0.002
+"""Seconds a single listener call may take before it is flagged"""
+
+
+class ListenerStats:
+    __slots__ = ("origin", "count", "total_time", "max_time", "over_budget")
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.over_budget = 0
+        """Number of calls which took longer than the budget"""
+
+
+class ListenerProfiler:
+    def __init__(self):
+        self.enabled = False
+        """Checked on every event dispatch, listeners are only timed while it is True"""
+        self.budget = default_budget
+        self.origins: weakref.WeakKeyDictionary[Callable, str] = (
+            weakref.WeakKeyDictionary()
+        )
+        """Origin of each tagged listener, entries disappear with their listener"""
+        self.stats: dict[str, ListenerStats] = {}
+        """Statistics of the called listeners by their origin, holds no reference to the listeners"""
+
+    def enable(self, budget: float | None = None):
+        if budget is not None:
+            self.budget = budget
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.stats = {}
+
+    def tag(self, listener: Callable, origin: str):
+        """Set the origin the listener is reported with."""
+        try:
+            self.origins[listener] = origin
+        except TypeError:
+            # Listeners which do not support weak references are reported by their name
+            pass
+
+    def get_origin(self, listener: Callable, event_trigger: Any) -> str:
+        origin = self.origins.get(listener, None)
+        if origin is not None:
+            return origin
+        name = getattr(listener, "__qualname__", type(listener).__qualname__)
+        module = getattr(listener, "__module__", "")
+        return f"{module}.{name} on {event_trigger}"
+
+    def call_listeners(
+        self, listeners: tuple[Callable, ...], instance: Any, event_trigger: Any
+    ):
+        """Call the listeners like EventListener.call_event_listeners and record their timing."""
+        for listener in listeners:
+            start_time = time.perf_counter()
+            try:
+                listener(instance)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                self.record(listener, event_trigger, elapsed)
+
+    def record(self, listener: Callable, event_trigger: Any, elapsed: float):
+        origin = self.get_origin(listener, event_trigger)
+        stats = self.stats.get(origin, None)
+        if stats is None:
+            stats = ListenerStats(origin)
+            self.stats[origin] = stats
+        stats.count += 1
+        stats.total_time += elapsed
+        if elapsed > self.budget:
+            stats.over_budget += 1
+            if elapsed > stats.max_time:
+                log.warning(
+                    "listener",
+                    "Listener exceeded the latency budget",
+                    ms=round(elapsed * 1000, 2),
+                    origin=stats.origin,
+                )
+        if elapsed > stats.max_time:
+            stats.max_time = elapsed
+
+    def get_report(self, limit: int = 20) -> list[dict]:
+        """Return the statistics of the listeners with the largest total time."""
+        slowest = sorted(self.stats.values(), key=lambda s: s.total_time, reverse=True)
+        return [
+            {
+                "origin": stats.origin,
+                "count": stats.count,
+                "total_ms": stats.total_time * 1000,
+                "mean_ms": stats.total_time / stats.count * 1000,
+                "max_ms": stats.max_time * 1000,
+                "over_budget": stats.over_budget,
+            }
+            for stats in slowest[:limit]
+        ]
+
+    def get_report_lines(self, limit: int = 20) -> list[str]:
+        lines = [
+            f"Listener profile (budget {self.budget * 1000:.1f} ms):",
+            f"  {'calls':>7}{'total ms':>10}{'mean ms':>9}{'max ms':>9}{'slow':>6}  origin",
+        ]
+        for entry in self.get_report(limit):
+            lines.append(
+                f"  {entry['count']:>7}{entry['total_ms']:>10.2f}{entry['mean_ms']:>9.3f}{entry['max_ms']:>9.2f}{entry['over_budget']:>6}  {entry['origin']}"
+            )
+        return lines
+
+
+listener_profiler = ListenerProfiler()
+
+profile_listeners = os.environ.get("COSTICK_PROFILE_LISTENERS", "")
+if profile_listeners and profile_listeners != "0":
+    try:
+        listener_profiler.enable(float(profile_listeners) / 1000)
+    except ValueError:
+        listener_profiler.enable()
@@ -0,0 +1,168 @@
+"""
+Non-blocking logging for the input path.
+
+Logging a record only checks the level of its category and stores the unformatted record in a preallocated
+ring buffer. A background thread formats the records and writes them to stdout, so a slow terminal or a full
+pipe never blocks the controller thread. If the writer falls behind, the oldest records are overwritten and
+the number of lost records is reported.
+
+Every record has a timestamp, a category, a level, an event message and optional fields, e.g.
+log.info("mode", "Switching mode", mode="typing").
+
+The level of each category can be set with the COSTICK_LOG environment variable, e.g.
+COSTICK_LOG=trainer=debug,config=warning. Categories without a level log INFO and above, the chatty
+categories in quiet_categories only WARNING and above.
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from typing import Any, TextIO
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+default_level = INFO
+quiet_categories = {"trainer": WARNING}
+"""Categories which log on every input event, disabled by default"""
+ring_capacity = 1024
+"""Records buffered before the oldest unwritten records are overwritten"""
+
+
+class Logger:
+    def __init__(
+        self,
+        levels: dict[str, int] | None = None,
+        capacity: int = ring_capacity,
+        stream: TextIO | None = None,
+    ):
+        self.levels = dict(quiet_categories) if levels is None else levels
+        """Minimum level of each category, categories without an entry use default_level"""
+        self.capacity = capacity
+        self.records: list[tuple | None] = [None] * capacity
+        """Ring of (time, category, level, message, fields), preallocated"""
+        self.write_count = 0
+        """Number of records logged, the next record is stored at write_count % capacity"""
+        self.read_count = 0
+        """Number of records handled by the writer thread"""
+        self.lock = threading.Lock()
+        """Held while a record is stored or taken, never while writing to the stream"""
+        self.records_available = threading.Event()
+        self.stream = stream
+        """Stream the records are written to, sys.stdout at the time of writing if None"""
+        self.thread: threading.Thread | None = None
+
+    def set_level(self, category: str, level: int):
+        self.levels[category] = level
+
+    def is_enabled(self, category: str, level: int) -> bool:
+        return level >= self.levels.get(category, default_level)
+
+    def log(self, category: str, level: int, message: str, fields: dict[str, Any]):
+        if level < self.levels.get(category, default_level):
+            return
+        record = (time.time(), category, level, message, fields)
+        with self.lock:
+            self.records[self.write_count % self.capacity] = record
+            self.write_count += 1
+        if self.thread is None:
+            self.start()
+        if not self.records_available.is_set():
+            self.records_available.set()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def take_records(self) -> tuple[list[tuple], int]:
+        """Return the records logged since the last call and the number of records which were overwritten before."""
+        with self.lock:
+            dropped = max(0, self.write_count - self.read_count - self.capacity)
+            start = self.read_count + dropped
+            records = [
+                self.records[i % self.capacity] for i in range(start, self.write_count)
+            ]
+            self.read_count = self.write_count
+        return records, dropped
+
+    def run(self):
+        while True:
+            self.records_available.wait()
+            self.records_available.clear()
+            self.write_records()
+
+    def write_records(self):
+        records, dropped = self.take_records()
+        if not records and not dropped:
+            return
+        lines = []
+        if dropped:
+            lines.append(f"{format_time(time.time())} log      {dropped} records lost")
+        for record in records:
+            lines.append(format_record(*record))
+        stream = sys.stdout if self.stream is None else self.stream
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    def flush(self):
+        """Write all logged records now, e.g. when the process exits."""
+        self.write_records()
+
+
+def format_time(timestamp: float) -> str:
+    return (
+        time.strftime("%H:%M:%S", time.localtime(timestamp))
+        + f".{int(timestamp % 1 * 1000):03d}"
+    )
+
+
+def format_record(
+    timestamp: float, category: str, level: int, message: str, fields: dict[str, Any]
+) -> str:
+    level_prefix = "" if level == INFO else f"{LEVEL_NAMES.get(level, level)}: "
+    line = f"{format_time(timestamp)} {category:<8} {level_prefix}{message}"
+    if fields:
+        line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+    return line
+
+
+def parse_levels(value: str) -> dict[str, int]:
+    """Parse category levels like trainer=debug,config=warning."""
+    levels = {}
+    level_values = {name: level for level, name in LEVEL_NAMES.items()}
+    for item in value.split(","):
+        category, _, level_name = item.strip().partition("=")
+        if category and level_name.lower() in level_values:
+            levels[category] = level_values[level_name.lower()]
+    return levels
+
+
+logger = Logger(quiet_categories | parse_levels(os.environ.get("COSTICK_LOG", "")))
+atexit.register(logger.flush)
+
+
+def debug(category: str, message: str, **fields: Any):
+    logger.log(category, DEBUG, message, fields)
+
+
+def info(category: str, message: str, **fields: Any):
+    logger.log(category, INFO, message, fields)
+
+
+def warning(category: str, message: str, **fields: Any):
+    logger.log(category, WARNING, message, fields)
+
+
+def error(category: str, message: str, **fields: Any):
+    logger.log(category, ERROR, message, fields)
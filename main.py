@@ -1,35 +1,117 @@
+import time
+
+start_time = time.perf_counter()
+
 import sys
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QTimer
-from PySide6.QtCore import Qt
-from controller import Controller
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from controller_overlay import ControllerOverlay
-from config import Config
-from cursor import Cursor
-
+from startup_profiler import StartupProfiler
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ControllerOverlay()
-    config = Config.load_config()
-    window.show()
+    profile_startup = "--profile-startup" in sys.argv
+    use_controller_process = "--controller-process" in sys.argv
+    profiler = StartupProfiler(start_time)
+
+    # Independent startup work runs concurrently to creating the window
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    def load_config():
+        from compiled_config import load_compiled_config
+
+        return load_compiled_config()
+
+    def init_joysticks():
+        from controller import Controller
+
+        return Controller.init_pygame()
+
+    config_future = executor.submit(profiler.wrap("load config", load_config))
+    controller_process = None
+    joystick_future = None
+    if use_controller_process:
+        from controller_process import ControllerProcess
+
+        # The child process initializes pygame while the window is created
+        controller_process = ControllerProcess()
+        controller_process.start()
+    else:
+        joystick_future = executor.submit(
+            profiler.wrap("init joysticks", init_joysticks)
+        )
+
+    with profiler.phase("import qt"):
+        from PySide6.QtWidgets import QApplication
+        from PySide6.QtCore import QTimer
+        from PySide6.QtCore import Qt
+        from controller_overlay import ControllerOverlay
+
+    with profiler.phase("create window"):
+        app = QApplication(sys.argv)
+        window = ControllerOverlay()
+        window.show()
 
-    controller = Controller(config)
+    with profiler.phase("wait for config"):
+        config = config_future.result()
 
-    window.init_controller_event_listeners(controller)
+    with profiler.phase("create controller"):
+        from controller import Controller
 
-    controller_thread = threading.Thread(target=controller.run)
+        controller = Controller(config)
+        window.set_max_fps(config.settings.overlay_settings.max_fps)
+        if config.settings.overlay_settings.show_hud:
+            window.enable_hud(controller)
+        window.init_controller_event_listeners(controller)
+        if "--event-bus" in sys.argv:
+            controller.start_event_bus()
+
+    if joystick_future is not None:
+        with profiler.phase("wait for joysticks"):
+            joystick_future.result()
+        # The worker only enumerated the joysticks, the display subsystem is initialized on the main thread
+        with profiler.phase("init display"):
+            Controller.init_pygame()
+    executor.shutdown(wait=False)
+
+    controller_thread = threading.Thread(
+        target=controller.run, args=(controller_process,)
+    )
     controller_thread.start()
 
-    cursor = Cursor(window, controller, config)
+    with profiler.phase("create cursor"):
+        from cursor import Cursor
+
+        cursor = Cursor(window, controller, config)
+
+    def on_config_changed(new_config):
+        controller.call_soon(lambda: cursor.reload_config(new_config))
+
+    from config_watcher import ConfigWatcher
+
+    config_watcher = ConfigWatcher("config.json", on_config_changed)
+    config_watcher.start()
 
     timer = QTimer()
     timer.setTimerType(Qt.TimerType.PreciseTimer)
     timer.timeout.connect(cursor.update)
     timer.start(16)  # Approximately 60 FPS
 
+    if profile_startup:
+
+        def on_first_frame():
+            profiler.mark("first frame")
+            profiler.print_report()
+            app.quit()
+
+        QTimer.singleShot(0, on_first_frame)
+
     app.exec()
+    config_watcher.stop()
     controller.running = False
     controller_thread.join()
+    controller.stop_event_bus()
+
+    from listener_profiler import listener_profiler
+
+    if listener_profiler.stats:
+        print("\n".join(listener_profiler.get_report_lines()))
@@ -0,0 +1,159 @@
+"""
+Measures the rendering cost of the controller overlay without a display.
+
+Usage:
+    python overlay_benchmark.py [--frames N]                 synthetic controller state stream
+    python overlay_benchmark.py --replay recording.jsonl     recorded controller state stream
+    python overlay_benchmark.py --record recording.jsonl     record the connected controller at 60 Hz until Ctrl+C
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from typing import Iterator
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from config_types import BUTTON_NAMES
+from controller import ControllerSnapshot
+
+record_rate = 60
+"""Snapshots per second written by --record"""
+
+
+def get_synthetic_stream(frames: int) -> Iterator[ControllerSnapshot]:
+    """Both sticks circle continuously while buttons are pressed and released one after another."""
+    for frame in range(frames):
+        angle = frame * 2 * math.pi / 90
+        axes = (
+            math.cos(angle),
+            math.sin(angle),
+            math.sin(angle * 0.7),
+            -math.cos(angle * 0.7),
+        )
+        # Each button is held for 15 frames, then the next one is pressed
+        pressed_mask = 1 << (frame // 15 % len(BUTTON_NAMES))
+        yield ControllerSnapshot(pressed_mask, axes, frame / record_rate)
+
+
+def read_recording(path: str) -> Iterator[ControllerSnapshot]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                yield ControllerSnapshot(
+                    data["pressed_mask"], tuple(data["axes"]), data["time"]
+                )
+
+
+def record(path: str):
+    from compiled_config import load_compiled_config
+    from controller import Controller
+    import threading
+
+    controller = Controller(load_compiled_config())
+    Controller.init_pygame()
+    controller_thread = threading.Thread(target=controller.run)
+    controller_thread.start()
+    print(f"Recording to {path}, press Ctrl+C to stop")
+    start_time = time.monotonic()
+    frames = 0
+    try:
+        with open(path, "w") as f:
+            while True:
+                snapshot = controller.get_snapshot()
+                f.write(
+                    json.dumps(
+                        {
+                            "pressed_mask": snapshot.pressed_mask,
+                            "axes": snapshot.axes,
+                            "time": snapshot.time - start_time,
+                        }
+                    )
+                    + "\n"
+                )
+                frames += 1
+                time.sleep(max(0, start_time + frames / record_rate - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.running = False
+        controller_thread.join()
+    print(f"Recorded {frames} snapshots")
+
+
+def run_benchmark(stream: Iterator[ControllerSnapshot]) -> dict[str, float]:
+    """Render every snapshot of the stream as one frame and return frame rate, paint time and dirty area statistics."""
+    from PySide6.QtWidgets import QApplication
+    from controller_overlay import ControllerOverlay
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    overlay = ControllerOverlay()
+    image = overlay.render_to_image()
+    widget_area = overlay.width() * overlay.height()
+
+    paint_times: list[float] = []
+    dirty_areas: list[int] = []
+    skipped_frames = 0
+    start_time = time.perf_counter()
+    for snapshot in stream:
+        overlay.apply_snapshot(snapshot)
+        dirty_region = overlay.take_dirty_region().intersected(overlay.rect())
+        if dirty_region.isEmpty():
+            skipped_frames += 1
+            continue
+        paint_start_time = time.perf_counter()
+        overlay.render_to_image(image, dirty_region)
+        paint_times.append(time.perf_counter() - paint_start_time)
+        dirty_areas.append(sum(rect.width() * rect.height() for rect in dirty_region))
+    total_time = time.perf_counter() - start_time
+    app.processEvents()
+
+    frames = len(paint_times) + skipped_frames
+    if not paint_times:
+        paint_times = [0.0]
+        dirty_areas = [0]
+    return {
+        "frames": frames,
+        "painted_frames": len(dirty_areas),
+        "skipped_frames": skipped_frames,
+        "fps": frames / total_time if total_time > 0 else 0.0,
+        "paint_ms_mean": statistics.fmean(paint_times) * 1000,
+        "paint_ms_p95": (
+            statistics.quantiles(paint_times, n=20)[-1] * 1000
+            if len(paint_times) > 1
+            else paint_times[0] * 1000
+        ),
+        "paint_ms_max": max(paint_times) * 1000,
+        "dirty_px_mean": statistics.fmean(dirty_areas),
+        "dirty_px_max": max(dirty_areas),
+        "dirty_fraction_mean": statistics.fmean(dirty_areas) / widget_area,
+    }
+
+
+def print_report(results: dict[str, float]):
+    print("Overlay rendering benchmark:")
+    for name, value in results.items():
+        if isinstance(value, float):
+            print(f"  {name:<22}{value:>12.3f}")
+        else:
+            print(f"  {name:<22}{value:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--replay", metavar="PATH")
+    parser.add_argument("--record", metavar="PATH")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+    elif args.replay:
+        print_report(run_benchmark(read_recording(args.replay)))
+    else:
+        print_report(run_benchmark(get_synthetic_stream(args.frames)))
@@ -0,0 +1,104 @@
+"""
+Counters updated by the input pipeline to show where time goes, e.g. in the overlay HUD.
+
+Each counter is only written by one thread and only ever increases, so updating it is a plain attribute
+increment without a lock. Readers sample all counters and compute rates from the difference to the previous sample.
+"""
+
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from controller import Controller
+
+
+class PerfCounters:
+    __slots__ = (
+        "controller_events",
+        "collapsed_axis_events",
+        "chords",
+        "chord_wait_time",
+        "cursor_moves",
+    )
+
+    def __init__(self):
+        self.controller_events = 0
+        """Events received from pygame, written by the controller thread"""
+        self.collapsed_axis_events = 0
+        """Axis events dropped because a newer event of the same axis was queued, written by the controller thread"""
+        self.chords = 0
+        """Multi button events fired, written by the controller thread"""
+        self.chord_wait_time = 0.0
+        """Total seconds between the first button press of a multi button event and its down event, written by the controller thread"""
+        self.cursor_moves = 0
+        """Frames in which the cursor was moved, written by the thread updating the cursor"""
+
+
+perf_counters = PerfCounters()
+
+
+class PerfSample(NamedTuple):
+    """Rates and gauges of the pipeline since the previous sample."""
+
+    events_per_second: float
+    chord_wait_ms: float
+    """Mean wait of the multi button events fired since the previous sample"""
+    queue_depth: int
+    """Scheduled timers and pending calls of the controller thread"""
+    cursor_moves_per_second: float
+    collapsed_axis_events_per_second: float
+    cpu_percent: float
+    """CPU time of the whole process relative to the wall time, can exceed 100 with several threads"""
+
+
+class PerfSampler:
+    """Computes PerfSamples from the global perf_counters."""
+
+    def __init__(self, controller: "Controller | None" = None):
+        self.controller = controller
+        """Controller whose queues are measured"""
+        self.last_time = time.monotonic()
+        self.last_process_time = time.process_time()
+        self.last_counters = self.read_counters()
+
+    def read_counters(self) -> tuple:
+        return (
+            perf_counters.controller_events,
+            perf_counters.collapsed_axis_events,
+            perf_counters.chords,
+            perf_counters.chord_wait_time,
+            perf_counters.cursor_moves,
+        )
+
+    def sample(self) -> PerfSample:
+        now = time.monotonic()
+        process_time = time.process_time()
+        counters = self.read_counters()
+        elapsed = max(now - self.last_time, 1e-9)
+        events, collapsed, chords, chord_wait_time, cursor_moves = (
+            current - last for current, last in zip(counters, self.last_counters)
+        )
+        queue_depth = 0
+        if self.controller is not None:
+            queue_depth = len(self.controller.scheduler) + len(
+                self.controller.pending_calls
+            )
+        perf_sample = PerfSample(
+            events_per_second=events / elapsed,
+            chord_wait_ms=chord_wait_time / chords * 1000 if chords else 0.0,
+            queue_depth=queue_depth,
+            cursor_moves_per_second=cursor_moves / elapsed,
+            collapsed_axis_events_per_second=collapsed / elapsed,
+            cpu_percent=(process_time - self.last_process_time) / elapsed * 100,
+        )
+        self.last_time = now
+        self.last_process_time = process_time
+        self.last_counters = counters
+        return perf_sample
+
+    def get_report_lines(self, perf_sample: PerfSample) -> list[str]:
+        return [
+            f"events/s {perf_sample.events_per_second:7.0f}   collapsed/s {perf_sample.collapsed_axis_events_per_second:5.0f}",
+            f"chord wait {perf_sample.chord_wait_ms:5.0f} ms   queue {perf_sample.queue_depth:4d}",
+            f"cursor moves/s {perf_sample.cursor_moves_per_second:4.0f}   cpu {perf_sample.cpu_percent:5.1f} %",
+        ]
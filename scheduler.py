@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import threading
+import math
+import time
+import traceback
+from typing import Callable
+
+import log
+
+
+class ScheduledCall:
+    """A callback waiting for its deadline in a Scheduler. Can be cancelled until it ran."""
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        """time.monotonic value at which the callback runs"""
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class RepeatingCall(ScheduledCall):
+    """
+    A callback running at first_deadline and then every interval seconds until it is cancelled.
+    Deadlines are computed from the first deadline, so they do not drift.
+    """
+
+    __slots__ = ("interval", "repeat", "next_call")
+
+    def __init__(
+        self,
+        deadline: float,
+        interval: float | None,
+        callback: Callable[[int], None],
+    ):
+        super().__init__(deadline, callback)
+        self.interval = interval
+        """Seconds between two runs or None to run only once"""
+        self.repeat = 0
+        """Number of runs so far"""
+        self.next_call: ScheduledCall | None = None
+
+    def cancel(self):
+        super().cancel()
+        if self.next_call is not None:
+            self.next_call.cancel()
+
+
+class Scheduler:
+    """
+    Runs callbacks at deadlines.
+    Deadlines are kept in a heap and served by the loop owning the scheduler calling run_due,
+    so no thread is created per timer and callbacks run on the thread of that loop.
+    """
+
+    def __init__(self):
+        self.heap: list[tuple[float, int, ScheduledCall]] = []
+        self.counter = itertools.count()
+        """Tie breaker for calls with the same deadline, keeps them in the order they were scheduled"""
+        self.lock = threading.Lock()
+
+    def call_at(self, deadline: float, callback: Callable[[], None]) -> ScheduledCall:
+        """Run the callback once time.monotonic() reached the deadline. Can be called from any thread."""
+        scheduled_call = ScheduledCall(deadline, callback)
+        with self.lock:
+            heapq.heappush(self.heap, (deadline, next(self.counter), scheduled_call))
+        return scheduled_call
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> ScheduledCall:
+        """Run the callback after the delay in seconds. Can be called from any thread."""
+        return self.call_at(time.monotonic() + delay, callback)
+
+    def call_repeating(
+        self,
+        first_deadline: float,
+        interval: float | None,
+        callback: Callable[[int], None],
+    ) -> RepeatingCall:
+        """
+        Run the callback at first_deadline and then every interval seconds until the returned call is cancelled.
+        The callback receives the number of previous runs. Deadlines missed by a stalled loop are skipped instead of run in a burst.
+        """
+        repeating_call = RepeatingCall(first_deadline, interval, callback)
+
+        def run():
+            callback(repeating_call.repeat)
+            repeating_call.repeat += 1
+            if repeating_call.cancelled or repeating_call.interval is None:
+                return
+            missed = math.floor(
+                (time.monotonic() - first_deadline) / repeating_call.interval
+            )
+            repeating_call.repeat = max(repeating_call.repeat, missed + 1)
+            repeating_call.next_call = self.call_at(
+                first_deadline + repeating_call.repeat * repeating_call.interval, run
+            )
+
+        repeating_call.next_call = self.call_at(first_deadline, run)
+        return repeating_call
+
+    def get_next_deadline(self) -> float | None:
+        with self.lock:
+            while self.heap and self.heap[0][2].cancelled:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def __len__(self) -> int:
+        """Number of scheduled calls, including cancelled calls which were not removed yet."""
+        return len(self.heap)
+
+    def run_due(self) -> None:
+        """Run all callbacks whose deadline has passed, in the order of their deadlines."""
+        if not self.heap:
+            return
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                if not self.heap or self.heap[0][0] > now:
+                    return
+                _, _, scheduled_call = heapq.heappop(self.heap)
+            if not scheduled_call.cancelled:
+                scheduled_call.cancelled = True
+                try:
+                    scheduled_call.callback()
+                except Exception as e:
+                    # A failing action must not stop the loop running the scheduler
+                    log.error(
+                        "scheduler",
+                        "Scheduled callback failed",
+                        error=repr(e),
+                        traceback=traceback.format_exc().strip(),
+                    )
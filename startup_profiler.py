@@ -0,0 +1,58 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+Result = TypeVar("Result")
+
+
+class StartupProfiler:
+    """
+    Records the start and end time of startup phases.
+    Phases may run concurrently on different threads.
+    """
+
+    def __init__(self, start_time: float | None = None):
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        """perf_counter value all phase times are relative to"""
+        self.phases: list[tuple[str, float, float, str]] = []
+        """Recorded phases as (name, start, end, thread name)"""
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measure the duration of the code inside the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.phases.append((name, start, end, threading.current_thread().name))
+
+    def wrap(self, name: str, function: Callable[[], Result]) -> Callable[[], Result]:
+        """Return a function which runs the given function as a phase. Used to measure phases run in other threads."""
+
+        def measured_function() -> Result:
+            with self.phase(name):
+                return function()
+
+        return measured_function
+
+    def mark(self, name: str):
+        """Record a point in time, e.g. the first frame being shown."""
+        with self.phase(name):
+            pass
+
+    def print_report(self):
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        print("Startup profile (times in ms since start):")
+        print(f"  {'phase':<28}{'start':>9}{'end':>9}{'duration':>10}  thread")
+        for name, start, end, thread_name in phases:
+            print(
+                f"  {name:<28}"
+                f"{(start - self.start_time) * 1000:>9.1f}"
+                f"{(end - self.start_time) * 1000:>9.1f}"
+                f"{(end - start) * 1000:>10.1f}  {thread_name}"
+            )
@@ -1,12 +1,166 @@
 import sys
+import os
+import random
+import struct
+import time
+from array import array
 from PySide6.QtWidgets import QApplication
 from controller import Controller
 import threading
 import asyncio
 
+import log
+from app_dirs import get_data_dir
+from compiled_config import (
+    CompiledConfig,
+    button_names_to_mask,
+    mask_to_button_names,
+    read_array,
+    write_array,
+)
 from controller_overlay import ControllerOverlay
-from config import Config
-from controller import ControllerButtonName
+from config_types import ControllerButtonName
+
+REACTION_TIMES_FORMAT_VERSION = 1
+"""Has to be increased whenever the binary format of the reaction times changes."""
+REACTION_TIMES_MAGIC = b"CSTKRT\0\0"
+REACTION_TIMES_HEADER = struct.Struct("<8sI")
+"""magic, format version"""
+
+recent_samples = 10
+"""Number of the latest reaction times of a chord used to schedule drills"""
+min_samples = 3
+"""Chords with fewer reaction times are drilled as if they were the slowest chord"""
+
+
+def get_reaction_times_path() -> str:
+    return os.path.join(get_data_dir(), "trainer_reaction_times.bin")
+
+
+class ReactionTimes:
+    """
+    Reaction times of all drilled chords in the order they were recorded.
+    Each record takes 8 bytes: the button mask of the chord and the reaction time in seconds.
+    """
+
+    def __init__(
+        self, chord_masks: array | None = None, reaction_times: array | None = None
+    ):
+        self.chord_masks = array("I") if chord_masks is None else chord_masks
+        self.reaction_times = array("f") if reaction_times is None else reaction_times
+        """Seconds from highlighting a chord until it was pressed, measured with time.monotonic()"""
+
+    def __len__(self) -> int:
+        return len(self.chord_masks)
+
+    def record(self, chord_mask: int, reaction_time: float):
+        self.chord_masks.append(chord_mask)
+        self.reaction_times.append(reaction_time)
+
+    def get_recent_means(
+        self, samples: int = recent_samples
+    ) -> dict[int, tuple[float, int]]:
+        """Return the mean of the latest reaction times and the number of reaction times of each chord."""
+        recent: dict[int, list[float]] = {}
+        counts: dict[int, int] = {}
+        for i in range(len(self.chord_masks) - 1, -1, -1):
+            chord_mask = self.chord_masks[i]
+            counts[chord_mask] = counts.get(chord_mask, 0) + 1
+            chord_reaction_times = recent.setdefault(chord_mask, [])
+            if len(chord_reaction_times) < samples:
+                chord_reaction_times.append(self.reaction_times[i])
+        return {
+            chord_mask: (sum(reaction_times) / len(reaction_times), counts[chord_mask])
+            for chord_mask, reaction_times in recent.items()
+        }
+
+    def get_report_lines(self, limit: int = 10) -> list[str]:
+        """Return the slowest chords with their recent mean reaction time."""
+        means = sorted(
+            self.get_recent_means().items(), key=lambda item: item[1][0], reverse=True
+        )
+        return [
+            f"  {mean * 1000:5.0f} ms  ({count} times)  {'+'.join(mask_to_button_names(chord_mask))}"
+            for chord_mask, (mean, count) in means[:limit]
+        ]
+
+    def save(self, path: str):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(
+                REACTION_TIMES_HEADER.pack(
+                    REACTION_TIMES_MAGIC, REACTION_TIMES_FORMAT_VERSION
+                )
+            )
+            write_array(f, self.chord_masks)
+            write_array(f, self.reaction_times)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ReactionTimes":
+        """Load the reaction times. Returns empty reaction times if the file is missing or outdated."""
+        try:
+            with open(path, "rb") as f:
+                magic, version = REACTION_TIMES_HEADER.unpack(
+                    f.read(REACTION_TIMES_HEADER.size)
+                )
+                if (
+                    magic != REACTION_TIMES_MAGIC
+                    or version != REACTION_TIMES_FORMAT_VERSION
+                ):
+                    return cls()
+                chord_masks = read_array(f)
+                reaction_times = read_array(f)
+        except (OSError, ValueError, struct.error):
+            return cls()
+        if len(chord_masks) != len(reaction_times):
+            return cls()
+        return cls(chord_masks, reaction_times)
+
+
+class DrillScheduler:
+    """
+    Picks the next chord to drill. Chords are picked at random, weighted by the square of their recent
+    mean reaction time, so the chords that are slowest for the user are drilled most often.
+    """
+
+    def __init__(
+        self,
+        chord_masks: list[int],
+        reaction_times: ReactionTimes,
+        rng: random.Random | None = None,
+    ):
+        self.chord_masks = list(dict.fromkeys(chord_masks))
+        self.reaction_times = reaction_times
+        self.rng = random.Random() if rng is None else rng
+        self.last_chord_mask: int | None = None
+        """Chord of the previous drill, not picked twice in a row"""
+
+    def get_weights(self) -> list[float]:
+        means = self.reaction_times.get_recent_means()
+        known_means = [
+            mean
+            for chord_mask, (mean, count) in means.items()
+            if count >= min_samples and chord_mask in self.chord_masks
+        ]
+        slowest_mean = max(known_means, default=1.0)
+        weights = []
+        for chord_mask in self.chord_masks:
+            mean, count = means.get(chord_mask, (slowest_mean, 0))
+            if count < min_samples:
+                mean = slowest_mean
+            weights.append(mean**2)
+        return weights
+
+    def next_chord(self) -> int:
+        candidates = self.chord_masks
+        weights = self.get_weights()
+        if len(candidates) > 1 and self.last_chord_mask in candidates:
+            i = candidates.index(self.last_chord_mask)
+            candidates = candidates[:i] + candidates[i + 1 :]
+            weights = weights[:i] + weights[i + 1 :]
+        self.last_chord_mask = self.rng.choices(candidates, weights)[0]
+        return self.last_chord_mask
 
 
 class Trainer:
@@ -15,57 +169,142 @@ class Trainer:
     unhighlight them when they are pressed
     """
 
-    def __init__(self, controller_overlay: ControllerOverlay, controller: Controller):
+    def __init__(
+        self,
+        controller_overlay: ControllerOverlay,
+        controller: Controller,
+        reaction_times: ReactionTimes | None = None,
+    ):
         self.controller_overlay = controller_overlay
         self.controller = controller
+        self.reaction_times = (
+            ReactionTimes() if reaction_times is None else reaction_times
+        )
 
-    async def next(self, *button_names: ControllerButtonName):
+    async def next(self, *button_names: ControllerButtonName) -> float:
         """
-        Set the buttons to be highlighted. Run async. Return when the buttons are pressed
+        Set the buttons to be highlighted. Run async. Return the reaction time in seconds when the buttons are pressed
         """
-        self.controller_overlay.highlight_buttons(button_names)
-        future = asyncio.get_event_loop().create_future()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
 
-        def on_button_press(buttons):
-            print("Pressed")
-            self.controller_overlay.highlight_buttons([])
-            self.controller.multi_button_events.remove_event_listener(listener_id)
-            future.set_result(None)
+        def set_reaction_time(reaction_time: float):
+            if not future.done():
+                future.set_result(reaction_time)
 
-        listener_id = self.controller.multi_button_events.add_event_listener(
-            "down",
-            button_names,
-            on_button_press,
+        chord_mask = button_names_to_mask(button_names)
+
+        # Called on the controller thread, the future may only be resolved on the thread of its loop.
+        # The multi button down event of a chord which is part of a longer chord only fires after the
+        # multi click duration, so the reaction time is taken on the press completing the chord.
+        def on_button_press(button):
+            pressed_mask = self.controller.get_pressed_mask() & (
+                self.controller.get_multi_button_mask() | chord_mask
+            )
+            # Exactly the chord is held, and none of its buttons is still held from before the highlight
+            if pressed_mask == chord_mask and all(
+                chord_button.pressed_time_start >= highlight_wall_time
+                for chord_button in buttons
+            ):
+                loop.call_soon_threadsafe(
+                    set_reaction_time, time.monotonic() - highlight_time
+                )
+
+        self.controller_overlay.highlight_buttons(list(button_names))
+        highlight_time = time.monotonic()
+        # Button.pressed_time_start is measured with time.time()
+        highlight_wall_time = time.time()
+        buttons = [
+            self.controller.buttons[button_name]
+            for button_name in button_names
+            if button_name in self.controller.buttons
+        ]
+        listener_ids = [
+            button.add_event_listener(
+                "down",
+                on_button_press,
+                f"trainer chord={'+'.join(button_names)} button={button.name} event=down",
+            )
+            for button in buttons
+        ]
+        try:
+            reaction_time = await future
+        finally:
+            for button, listener_id in zip(buttons, listener_ids):
+                button.remove_event_listener(listener_id)
+            self.controller_overlay.highlight_buttons([])
+        log.debug(
+            "trainer", "Pressed", chord="+".join(button_names), seconds=reaction_time
         )
+        self.reaction_times.record(chord_mask, reaction_time)
+        return reaction_time
+
 
-        await future
+async def drill(trainer: Trainer, drill_scheduler: DrillScheduler, rounds: int):
+    """Drill the chords of the scheduler, the chords which are slowest for the user most often."""
+    print(f"Drill started with {len(drill_scheduler.chord_masks)} chords")
+    for _ in range(rounds):
+        chord_mask = drill_scheduler.next_chord()
+        await trainer.next(*mask_to_button_names(chord_mask))
+    print("Slowest chords:")
+    print("\n".join(trainer.reaction_times.get_report_lines()))
 
 
-async def train(trainer: Trainer):
-    print("Training started")
-    await trainer.next("face_right", "shoulder_l")
-    print("Training next")
-    await trainer.next("face_left", "shoulder_l")
+def get_mode_chord_masks(config: CompiledConfig, mode_name: str) -> list[int]:
+    for mode in config.modes:
+        if mode.name == mode_name:
+            return list(mode.chord_masks)
+    raise ValueError(f"Mode {mode_name} does not exist")
 
 
 if __name__ == "__main__":
+    from compiled_config import load_compiled_config
+
+    mode_name = sys.argv[1] if len(sys.argv) > 1 else "typing"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
     app = QApplication(sys.argv)
     window = ControllerOverlay()
-    config = Config.load_config()
+    config = load_compiled_config()
     window.show()
 
     controller = Controller(config)
 
     window.init_controller_event_listeners(controller)
 
-    trainer = Trainer(window, controller)
+    reaction_times_path = get_reaction_times_path()
+    trainer = Trainer(window, controller, ReactionTimes.load(reaction_times_path))
+    drill_scheduler = DrillScheduler(
+        get_mode_chord_masks(config, mode_name), trainer.reaction_times
+    )
 
+    # pygame has to be initialized on the main thread before the controller runs on its own thread
+    Controller.init_pygame()
     controller_thread = threading.Thread(target=controller.run)
     controller_thread.start()
 
-    trainer_thread = threading.Thread(target=asyncio.run, args=(train(trainer),))
+    drill_loop = asyncio.new_event_loop()
+    drill_task = drill_loop.create_task(drill(trainer, drill_scheduler, rounds))
+
+    def run_drill():
+        try:
+            drill_loop.run_until_complete(drill_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            drill_loop.close()
+
+    trainer_thread = threading.Thread(target=run_drill, daemon=True)
     trainer_thread.start()
 
     app.exec()
     controller.running = False
     controller_thread.join()
+    # Stop an unfinished drill, so the reaction times are only saved here and no longer change
+    try:
+        drill_loop.call_soon_threadsafe(drill_task.cancel)
+    except RuntimeError:
+        # The drill finished and closed its loop
+        pass
+    trainer_thread.join()
+    trainer.reaction_times.save(reaction_times_path)